@@ -20,6 +20,14 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str = ""
     GEMINI_MODEL: str = "gemini-pro"
     
+    # LLM Provider (gemini, or fake for offline load and latency testing)
+    LLM_PROVIDER: str = "gemini"
+    FAKE_LLM_LATENCY_DISTRIBUTION: str = "lognormal"  # fixed, uniform, normal or lognormal
+    FAKE_LLM_LATENCY_MS: float = 800.0
+    FAKE_LLM_LATENCY_JITTER_MS: float = 300.0
+    FAKE_LLM_TOKENS_PER_SECOND: float = 50.0
+    FAKE_LLM_SEED: int = 42
+    
     # Vector Database (FAISS)
     VECTOR_DB_PATH: str = "./vector_db"
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
@@ -34,13 +42,83 @@ class Settings(BaseSettings):
     WESTLAW_API_KEY: str = ""
     LEXISNEXIS_API_KEY: str = ""
     
+    # Reference Index (offline Wikipedia / legal encyclopedia dump used by the wikipedia tool when present)
+    REFERENCE_INDEX_PATH: str = "./reference_index.sqlite"
+    REFERENCE_TOP_K: int = 3
+    REFERENCE_SUMMARY_CHARS: int = 1500
+    REFERENCE_MAX_CHARS: int = 4000
+    
     # File Storage
     UPLOAD_DIR: str = "./uploads"
     UPLOAD_DIRECTORY: str = "./uploads"
     MAX_FILE_SIZE: str = "50MB"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    CONTENT_DEDUP_ENABLED: bool = True
+    EXTRACTED_TEXT_CACHE_ENABLED: bool = True
+    NEAR_DUPLICATE_ENABLED: bool = True
+    NEAR_DUPLICATE_THRESHOLD: float = 0.85
+    NEAR_DUPLICATE_SHINGLE_SIZE: int = 5
+    MINHASH_PERMUTATIONS: int = 64
+    LSH_BANDS: int = 16
+    
+    # Chunking (legal: structure-aware, no overlap; recursive: LangChain splitter with CHUNK_OVERLAP)
+    TEXT_SPLITTER: str = "legal"
+    CHUNK_SIZE: int = 1000
+    CHUNK_OVERLAP: int = 200
+    
+    # Chunk Store (chunk text kept in SQLite next to the index and resolved by offset)
+    CHUNK_STORE_ENABLED: bool = True
+    PARENT_CONTEXT_MAX_CHARS: int = 4000  # 0 sends only the matched chunks to the LLM
     
     # Vector Store
     VECTORSTORE_PATH: str = "./vectorstore"
+    VECTORSTORE_RAM_BUDGET_MB: int = 1024
+    VECTORSTORE_IDLE_SECONDS: int = 1800
+    # Deleted chunks are filtered from searches until compaction drops their vectors
+    VECTORSTORE_COMPACTION_RATIO: float = 0.2
+    VECTORSTORE_COMPACTION_MAX_TOMBSTONES: int = 1000
+    VECTORSTORE_COMPACTION_INTERVAL_SECONDS: int = 60
+    
+    # Ingestion Queue (inprocess: API workers run jobs; external: run ingestion_worker.py)
+    INGESTION_MODE: str = "inprocess"
+    INGESTION_WORKERS: int = 2
+    INGESTION_MAX_QUEUE_DEPTH: int = 100
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_RETRY_BACKOFF_SECONDS: float = 5.0
+    INGESTION_LEASE_SECONDS: int = 1800
+    INGESTION_POLL_SECONDS: float = 2.0
+    INGESTION_JOB_DB_PATH: str = "./ingestion_jobs.sqlite"
+    
+    # Semantic Answer Cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    
+    # QA Context Assembly
+    CONTEXT_COMPRESSION_ENABLED: bool = True
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_MMR_LAMBDA: float = 0.7
+    
+    # Conversation Memory
+    MEMORY_BACKEND: str = "memory"  # memory or redis
+    MEMORY_WINDOW_TURNS: int = 5
+    MEMORY_MAX_SESSIONS: int = 1000
+    MEMORY_SESSION_TTL_SECONDS: int = 3600
+    
+    # Agent Tools (direct: call the tool or LLM once; agent: let the ReAct agent choose tools)
+    AGENT_TOOL_MODE: str = "direct"
+    AGENT_TOOL_CONCURRENCY: int = 3
+    AGENT_TOOL_TIMEOUT_SECONDS: float = 60.0
+    TOOL_CACHE_ENABLED: bool = True
+    TOOL_CACHE_TTL_SECONDS: int = 3600
+    TOOL_CACHE_MAX_ENTRIES: int = 1000
+    
+    # Agent Budgets (per-request limits may be lower, never higher)
+    AGENT_MAX_STEPS: int = 5
+    AGENT_MAX_SECONDS: float = 30.0
+    AGENT_MAX_TOKENS: int = 8000
+    AGENT_PARTIAL_ANSWER_CHARS: int = 1500
     
     # Logging
     LOG_LEVEL: str = "INFO"
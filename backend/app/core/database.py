@@ -16,7 +16,7 @@ engine = create_async_engine(
 
 # Create sync engine for auth operations
 sync_engine = create_engine(
-    settings.DATABASE_URL.replace("aiosqlite", "sqlite"),
+    settings.DATABASE_URL.replace("+aiosqlite", ""),
     echo=settings.DEBUG
 )
 
@@ -60,11 +60,30 @@ async def close_db():
     """Close database connections"""
     await engine.dispose()
 
+# Columns added to existing tables after their first release; create_all only creates missing tables
+ADDED_COLUMNS = {
+    "legal_documents": [
+        ("content_hash", "VARCHAR(64)", "ix_legal_documents_content_hash"),
+        ("namespace", "VARCHAR(100)", "ix_legal_documents_namespace"),
+    ],
+}
+
+def _add_missing_columns(connection):
+    """Add columns (and their indexes) that an older database's tables lack; safe to run repeatedly"""
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+        for column, column_type, index in columns:
+            if column not in existing:
+                connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+                logger.info(f"Added column {table}.{column}")
+            connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})")
+
 async def init_db():
     """Initialize database tables"""
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_add_missing_columns)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
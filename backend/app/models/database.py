@@ -45,6 +45,8 @@ class LegalDocument(Base):
     citations = Column(JSON, default=list)
     document_metadata = Column(JSON, default=dict)
     file_path = Column(String(500))
+    content_hash = Column(String(64), index=True)
+    namespace = Column(String(100), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
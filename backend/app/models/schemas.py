@@ -165,30 +165,53 @@ class DocumentUploadResponse(BaseModel):
     message: str
     documents: List[Dict[str, Any]]
     total_uploaded: int
+    job_id: Optional[str] = None
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    namespace: str
+    status: str
+    attempts: int
+    max_attempts: int
+    progress: Dict[str, Any] = {}
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    next_attempt_at: Optional[datetime] = None
 
 class RAGQueryRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=1000)
     use_conversation: bool = False
     use_agent: bool = False
+    # Conversation session within the caller's namespace; one is generated for a conversational query without it
+    session_id: Optional[str] = Field(None, min_length=1, max_length=100)
+    # Agent budget for this request, capped by AGENT_MAX_STEPS / _SECONDS / _TOKENS
+    agent_max_steps: Optional[int] = Field(None, gt=0)
+    agent_max_seconds: Optional[float] = Field(None, gt=0)
+    agent_max_tokens: Optional[int] = Field(None, gt=0)
 
 class RAGQueryResponse(BaseModel):
     query: str
     answer: str
+    session_id: Optional[str] = None
     source_documents: List[Dict[str, Any]] = []
     chat_history: List[Dict[str, Any]] = []
     tools_used: List[str] = []
+    agent_trace: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
 class AgentToolRequest(BaseModel):
     tool_name: str
     query: str
     parameters: Optional[Dict[str, Any]] = {}
+    timeout_seconds: Optional[float] = Field(None, gt=0)
 
 class AgentToolResponse(BaseModel):
     tool_name: str
     result: str
     success: bool
     error: Optional[str] = None
+    duration_seconds: Optional[float] = None
 
 # Response Models
 class StandardResponse(BaseModel):
@@ -1,73 +1,117 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+import asyncio
+import json
 import logging
+import time
 from datetime import datetime
 
 from app.models.schemas import AgentToolRequest, AgentToolResponse
+from app.services.agent_budget import AgentBudget
 from app.services.rag_pipeline import rag_pipeline
+from app.services.tool_cache import tool_cache
 from app.core.config import settings
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def use_agent(mode: Optional[str] = None) -> bool:
+    """Whether a tool call goes through the ReAct agent instead of straight to its tool"""
+    return (mode or settings.AGENT_TOOL_MODE) == "agent"
+
+async def cached_agent_query(tool: str, query: str, prompt: str, **params) -> Dict[str, Any]:
+    """Agent answer for a lookup, shared with identical lookups through the tool cache"""
+    return await tool_cache.aget_or_compute(
+        tool, query, lambda: rag_pipeline.aagent_query(prompt),
+        # Partial answers from runs stopped by their budget are not shared
+        cache_if=lambda response: "error" not in response and not response.get("stopped_reason"),
+        **params
+    )
+
+async def run_lookup(tool: str, pipeline_tool: str, query: str, prompt: str, mode: str = None, **params) -> Dict[str, Any]:
+    """Run a search tool directly, or let the agent answer ``prompt`` in agent mode"""
+    if use_agent(mode):
+        return await cached_agent_query(tool, query, prompt, **params)
+    details = ", ".join(f"{name}: {value}" for name, value in params.items() if value)
+    return {"answer": await rag_pipeline.arun_tool(pipeline_tool, f"{query} ({details})" if details else query)}
+
+async def run_prompt(prompt: str, mode: str = None) -> Dict[str, Any]:
+    """Answer a self-contained task with one LLM call, or with the agent in agent mode"""
+    if use_agent(mode):
+        return await rag_pipeline.aagent_query(prompt)
+    return await rag_pipeline.agenerate(prompt)
+
 class LegalAgentTools:
-    """Collection of AI agent tools for legal research"""
+    """Collection of AI agent tools for legal research
+    
+    Each tool calls its search tool, or the LLM once, directly; the ReAct
+    agent is only used by ``research_assistant`` or when ``mode`` (or
+    ``AGENT_TOOL_MODE``) is "agent". Text tools also accept their text as
+    ``query``, as sent by /execute and /batch-execute.
+    """
     
     @staticmethod
-    def wikipedia_search(query: str, **kwargs) -> str:
+    async def wikipedia_search(query: str, mode: str = None, **kwargs) -> str:
         """Search Wikipedia for legal topics"""
         try:
             # This will use the Wikipedia tool from the RAG pipeline
-            response = rag_pipeline.agent_query(f"Search Wikipedia for: {query}")
+            response = await run_lookup("wikipedia_search", "wikipedia", query, f"Search Wikipedia for: {query}", mode)
             return response.get("answer", "No Wikipedia results found")
         except Exception as e:
             logger.error(f"Wikipedia search error: {e}")
             return f"Error searching Wikipedia: {e}"
     
     @staticmethod
-    def legal_case_search(query: str, jurisdiction: str = None, **kwargs) -> str:
+    async def legal_case_search(query: str, jurisdiction: str = None, mode: str = None, **kwargs) -> str:
         """Search for legal cases and precedents"""
         try:
             search_query = f"Find legal cases about: {query}"
             if jurisdiction:
                 search_query += f" in {jurisdiction} jurisdiction"
             
-            # Use the agent to search for cases
-            response = rag_pipeline.agent_query(search_query)
+            response = await run_lookup(
+                "legal_case_search", "Legal Case Search", query, search_query, mode, jurisdiction=jurisdiction
+            )
             return response.get("answer", "No legal cases found")
         except Exception as e:
             logger.error(f"Legal case search error: {e}")
             return f"Error searching legal cases: {e}"
     
     @staticmethod
-    def statute_search(query: str, jurisdiction: str = None, **kwargs) -> str:
+    async def statute_search(query: str, jurisdiction: str = None, mode: str = None, **kwargs) -> str:
         """Search for statutes and regulations"""
         try:
             search_query = f"Find statutes and regulations about: {query}"
             if jurisdiction:
                 search_query += f" in {jurisdiction}"
             
-            response = rag_pipeline.agent_query(search_query)
+            response = await run_lookup(
+                "statute_search", "Statute Search", query, search_query, mode, jurisdiction=jurisdiction
+            )
             return response.get("answer", "No statutes found")
         except Exception as e:
             logger.error(f"Statute search error: {e}")
             return f"Error searching statutes: {e}"
     
     @staticmethod
-    def citation_format(text: str, style: str = "bluebook", **kwargs) -> str:
+    async def citation_format(text: str = None, style: str = "bluebook", mode: str = None, query: str = None, **kwargs) -> str:
         """Format legal citations"""
         try:
-            format_query = f"Format this legal citation in {style} style: {text}"
-            response = rag_pipeline.agent_query(format_query)
+            format_query = f"Format this legal citation in {style} style: {text or query}"
+            response = await run_prompt(format_query, mode)
             return response.get("answer", "Could not format citation")
         except Exception as e:
             logger.error(f"Citation formatting error: {e}")
             return f"Error formatting citation: {e}"
     
     @staticmethod
-    def legal_analysis(text: str, analysis_type: str = "general", **kwargs) -> str:
+    async def legal_analysis(
+        text: str = None, analysis_type: str = "general", mode: str = None, query: str = None, **kwargs
+    ) -> str:
         """Perform legal analysis on text"""
         try:
+            text = text or query
             if analysis_type == "precedent":
                 analysis_query = f"Analyze this legal text for precedents and case law: {text}"
             elif analysis_type == "conflict":
@@ -77,44 +121,61 @@ class LegalAgentTools:
             else:
                 analysis_query = f"Perform a comprehensive legal analysis of: {text}"
             
-            response = rag_pipeline.agent_query(analysis_query)
+            response = await run_prompt(analysis_query, mode)
             return response.get("answer", "Could not perform analysis")
         except Exception as e:
             logger.error(f"Legal analysis error: {e}")
             return f"Error performing legal analysis: {e}"
     
     @staticmethod
-    def document_summary(text: str, **kwargs) -> str:
+    async def document_summary(text: str = None, mode: str = None, query: str = None, **kwargs) -> str:
         """Summarize legal documents"""
         try:
-            summary_query = f"Provide a comprehensive summary of this legal document: {text}"
-            response = rag_pipeline.agent_query(summary_query)
+            summary_query = f"Provide a comprehensive summary of this legal document: {text or query}"
+            response = await run_prompt(summary_query, mode)
             return response.get("answer", "Could not summarize document")
         except Exception as e:
             logger.error(f"Document summary error: {e}")
             return f"Error summarizing document: {e}"
     
     @staticmethod
-    def deadline_analysis(text: str, **kwargs) -> str:
+    async def deadline_analysis(text: str = None, mode: str = None, query: str = None, **kwargs) -> str:
         """Extract and analyze deadlines from legal text"""
         try:
-            deadline_query = f"Extract and analyze all deadlines, time limits, and important dates from this legal text: {text}"
-            response = rag_pipeline.agent_query(deadline_query)
+            deadline_query = f"Extract and analyze all deadlines, time limits, and important dates from this legal text: {text or query}"
+            response = await run_prompt(deadline_query, mode)
             return response.get("answer", "No deadlines found")
         except Exception as e:
             logger.error(f"Deadline analysis error: {e}")
             return f"Error analyzing deadlines: {e}"
     
     @staticmethod
-    def contract_analysis(text: str, **kwargs) -> str:
+    async def contract_analysis(text: str = None, mode: str = None, query: str = None, **kwargs) -> str:
         """Analyze contracts for key terms and risks"""
         try:
-            contract_query = f"Analyze this contract for key terms, obligations, risks, and important clauses: {text}"
-            response = rag_pipeline.agent_query(contract_query)
+            contract_query = f"Analyze this contract for key terms, obligations, risks, and important clauses: {text or query}"
+            response = await run_prompt(contract_query, mode)
             return response.get("answer", "Could not analyze contract")
         except Exception as e:
             logger.error(f"Contract analysis error: {e}")
             return f"Error analyzing contract: {e}"
+    
+    @staticmethod
+    async def research_assistant(
+        query: str,
+        max_steps: int = None,
+        max_seconds: float = None,
+        max_tokens: int = None,
+        **kwargs
+    ) -> str:
+        """Answer an open-ended research request with the tool-using agent"""
+        try:
+            budget = AgentBudget(max_steps=max_steps, max_seconds=max_seconds, max_tokens=max_tokens)
+            response = await rag_pipeline.aagent_query(query, budget=budget)
+            return response.get("answer", "Could not answer the research request")
+        except Exception as e:
+            logger.error(f"Research assistant error: {e}")
+            return f"Error answering research request: {e}"
 
 # Available tools mapping
 AVAILABLE_TOOLS = {
@@ -126,8 +187,48 @@ AVAILABLE_TOOLS = {
     "document_summary": LegalAgentTools.document_summary,
     "deadline_analysis": LegalAgentTools.deadline_analysis,
     "contract_analysis": LegalAgentTools.contract_analysis,
+    "research_assistant": LegalAgentTools.research_assistant,
 }
 
+async def run_step(
+    name: str,
+    step: Callable[[], Awaitable[str]],
+    semaphore: asyncio.Semaphore,
+    timeout: float = None
+) -> Dict[str, Any]:
+    """Run one tool call or workflow step under a concurrency limit and a timeout, timing it
+    
+    Returns its ``result``, ``status`` (completed, timeout or failed), ``error``
+    and ``seconds``; a timed-out step is cancelled.
+    """
+    timeout = min(timeout or settings.AGENT_TOOL_TIMEOUT_SECONDS, settings.AGENT_TOOL_TIMEOUT_SECONDS)
+    async with semaphore:
+        started = time.perf_counter()
+        error = None
+        try:
+            result = await asyncio.wait_for(step(), timeout)
+            status = "completed"
+        except asyncio.TimeoutError:
+            logger.warning(f"Agent step {name} timed out after {timeout:g}s")
+            error = f"Timed out after {timeout:g}s"
+            status = "timeout"
+        except Exception as e:
+            logger.error(f"Agent step {name} failed: {e}")
+            error = str(e)
+            status = "failed"
+        seconds = time.perf_counter() - started
+    return {
+        "name": name,
+        "result": result if error is None else f"Error in {name} step: {error}",
+        "status": status,
+        "error": error,
+        "seconds": round(seconds, 3)
+    }
+
+def batch_key(request: AgentToolRequest) -> Tuple[str, str, str]:
+    """Identity of a batch item; identical items run once"""
+    return request.tool_name, request.query, json.dumps(request.parameters or {}, sort_keys=True, default=str)
+
 @router.get("/tools")
 async def list_available_tools():
     """List all available agent tools"""
@@ -141,7 +242,11 @@ async def list_available_tools():
                 "query": "string (required)",
                 "jurisdiction": "string (optional, for legal searches)",
                 "style": "string (optional, for citation formatting)",
-                "analysis_type": "string (optional, for legal analysis)"
+                "analysis_type": "string (optional, for legal analysis)",
+                "mode": "string (optional, direct or agent; default from AGENT_TOOL_MODE)",
+                "max_steps": "integer (optional, for research_assistant; capped by AGENT_MAX_STEPS)",
+                "max_seconds": "number (optional, for research_assistant; capped by AGENT_MAX_SECONDS)",
+                "max_tokens": "integer (optional, for research_assistant; capped by AGENT_MAX_TOKENS)"
             }
         })
     
@@ -150,6 +255,11 @@ async def list_available_tools():
         "total_tools": len(tools_info)
     }
 
+@router.get("/tools/cache")
+async def get_tool_cache_stats():
+    """Tool result cache size and per-tool hit rates"""
+    return tool_cache.get_stats()
+
 @router.post("/execute", response_model=AgentToolResponse)
 async def execute_tool(request: AgentToolRequest):
     """Execute a specific agent tool"""
@@ -171,7 +281,7 @@ async def execute_tool(request: AgentToolRequest):
         tool_func = AVAILABLE_TOOLS[request.tool_name]
         
         # Execute the tool with parameters
-        result = tool_func(
+        result = await tool_func(
             query=request.query,
             **(request.parameters or {})
         )
@@ -192,52 +302,97 @@ async def execute_tool(request: AgentToolRequest):
         )
 
 @router.post("/batch-execute")
-async def batch_execute_tools(requests: list[AgentToolRequest]):
-    """Execute multiple agent tools in sequence"""
+async def batch_execute_tools(requests: list[AgentToolRequest], http_request: Request, stream: bool = False):
+    """Execute multiple agent tools concurrently
+    
+    Identical (tool, query, parameters) items run once and share a result. At
+    most ``AGENT_TOOL_CONCURRENCY`` run at a time, each cancelled after its
+    ``timeout_seconds`` (at most ``AGENT_TOOL_TIMEOUT_SECONDS``). With
+    ``stream=true`` a ``result`` server-sent event is emitted for each item as
+    it finishes, naming its positions in the batch, then a ``done`` event;
+    disconnecting cancels unfinished items.
+    """
     
     if len(requests) > 10:
         raise HTTPException(status_code=400, detail="Maximum 10 tools can be executed in batch")
     
-    results = []
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(settings.AGENT_TOOL_CONCURRENCY)
+    positions: Dict[Tuple[str, str, str], List[int]] = {}
+    for index, request in enumerate(requests):
+        positions.setdefault(batch_key(request), []).append(index)
     
-    for request in requests:
-        try:
-            if request.tool_name not in AVAILABLE_TOOLS:
-                results.append(AgentToolResponse(
-                    tool_name=request.tool_name,
-                    result="",
-                    success=False,
-                    error=f"Tool '{request.tool_name}' not found"
-                ))
-                continue
-            
-            tool_func = AVAILABLE_TOOLS[request.tool_name]
-            result = tool_func(
-                query=request.query,
-                **(request.parameters or {})
-            )
-            
-            results.append(AgentToolResponse(
-                tool_name=request.tool_name,
-                result=result,
-                success=True
-            ))
-            
-        except Exception as e:
-            logger.error(f"Error in batch execution for tool {request.tool_name}: {e}")
-            results.append(AgentToolResponse(
+    async def execute(key: Tuple[str, str, str]) -> Tuple[List[int], AgentToolResponse]:
+        request = requests[positions[key][0]]
+        if request.tool_name not in AVAILABLE_TOOLS:
+            return positions[key], AgentToolResponse(
                 tool_name=request.tool_name,
                 result="",
                 success=False,
-                error=str(e)
-            ))
+                error=f"Tool '{request.tool_name}' not found"
+            )
+        
+        tool_func = AVAILABLE_TOOLS[request.tool_name]
+        step = await run_step(
+            request.tool_name,
+            lambda: tool_func(query=request.query, **(request.parameters or {})),
+            semaphore,
+            request.timeout_seconds
+        )
+        return positions[key], AgentToolResponse(
+            tool_name=request.tool_name,
+            result=step["result"] if step["status"] == "completed" else "",
+            success=step["status"] == "completed",
+            error=step["error"],
+            duration_seconds=step["seconds"]
+        )
     
-    return {
-        "results": results,
-        "total_executed": len(results),
-        "successful": len([r for r in results if r.success]),
-        "failed": len([r for r in results if not r.success])
-    }
+    tasks = [asyncio.create_task(execute(key)) for key in positions]
+    
+    def summary(results: List[AgentToolResponse]) -> Dict[str, Any]:
+        return {
+            "total_executed": len(results),
+            "unique_executed": len(tasks),
+            "successful": len([r for r in results if r.success]),
+            "failed": len([r for r in results if not r.success]),
+            "total_seconds": round(time.perf_counter() - started, 3)
+        }
+    
+    if stream:
+        async def event_stream():
+            results = []
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    indices, response = await finished
+                    if await http_request.is_disconnected():
+                        logger.info("Client disconnected, cancelling batch execution")
+                        break
+                    results.extend(response for _ in indices)
+                    event = {"type": "result", "indices": indices, **response.model_dump()}
+                    yield f"event: result\ndata: {json.dumps(event, default=str)}\n\n"
+                else:
+                    yield f"event: done\ndata: {json.dumps({'type': 'done', **summary(results)})}\n\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+        
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    results: List[Optional[AgentToolResponse]] = [None] * len(requests)
+    try:
+        for finished in asyncio.as_completed(tasks):
+            indices, response = await finished
+            for index in indices:
+                results[index] = response
+    finally:
+        for task in tasks:
+            task.cancel()
+    
+    return {"results": results, **summary(results)}
 
 @router.post("/research-workflow")
 async def execute_research_workflow(
@@ -247,43 +402,65 @@ async def execute_research_workflow(
     include_wikipedia: bool = True,
     jurisdiction: str = None
 ):
-    """Execute a complete legal research workflow"""
+    """Execute a complete legal research workflow
+    
+    The background lookups run concurrently (at most
+    ``AGENT_TOOL_CONCURRENCY`` at once, each limited to
+    ``AGENT_TOOL_TIMEOUT_SECONDS``); the analysis is then written from their
+    findings and the summary from the findings and the analysis, with one LLM
+    call each.
+    """
     
     if not query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
     try:
-        workflow_results = {}
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(settings.AGENT_TOOL_CONCURRENCY)
         
-        # Step 1: Wikipedia research for background
+        # Steps 1-3: independent background research
+        research = []
         if include_wikipedia:
-            wikipedia_result = LegalAgentTools.wikipedia_search(query)
-            workflow_results["wikipedia"] = wikipedia_result
-        
-        # Step 2: Legal case search
+            research.append(("wikipedia", lambda: LegalAgentTools.wikipedia_search(query)))
         if include_cases:
-            case_result = LegalAgentTools.legal_case_search(query, jurisdiction)
-            workflow_results["cases"] = case_result
-        
-        # Step 3: Statute search
+            research.append(("cases", lambda: LegalAgentTools.legal_case_search(query, jurisdiction)))
         if include_statutes:
-            statute_result = LegalAgentTools.statute_search(query, jurisdiction)
-            workflow_results["statutes"] = statute_result
+            research.append(("statutes", lambda: LegalAgentTools.statute_search(query, jurisdiction)))
+        steps = list(await asyncio.gather(*(run_step(name, step, semaphore) for name, step in research)))
+        
+        findings = "\n\n".join(
+            f"{step['name'].title()} research:\n{step['result']}" for step in steps if step["status"] == "completed"
+        ) or "No background research was gathered."
         
-        # Step 4: Comprehensive analysis
-        analysis_query = f"Based on the research for '{query}', provide a comprehensive legal analysis"
-        analysis_result = LegalAgentTools.legal_analysis(analysis_query)
-        workflow_results["analysis"] = analysis_result
+        # Step 4: analysis of the gathered findings, without searching again
+        async def analyze() -> str:
+            response = await rag_pipeline.agenerate(
+                f"Provide a comprehensive legal analysis of '{query}' based on this research:\n\n{findings}"
+            )
+            return response.get("answer", "Could not perform analysis")
+        
+        analysis = await run_step("analysis", analyze, semaphore)
+        steps.append(analysis)
+        
+        # Step 5: summary of the findings and the analysis, so it depends on step 4
+        research_and_analysis = findings
+        if analysis["status"] == "completed":
+            research_and_analysis += f"\n\nAnalysis:\n{analysis['result']}"
+        
+        async def summarize() -> str:
+            response = await rag_pipeline.agenerate(
+                f"Summarize the key findings from this legal research on '{query}':\n\n{research_and_analysis}"
+            )
+            return response.get("answer", "Could not generate summary")
         
-        # Step 5: Generate summary
-        summary_query = f"Summarize the key findings from this legal research on: {query}"
-        summary_result = rag_pipeline.agent_query(summary_query)
-        workflow_results["summary"] = summary_result.get("answer", "Could not generate summary")
+        steps.append(await run_step("summary", summarize, semaphore))
         
         return {
             "query": query,
-            "workflow_results": workflow_results,
-            "completed_steps": list(workflow_results.keys()),
+            "workflow_results": {step["name"]: step["result"] for step in steps},
+            "completed_steps": [step["name"] for step in steps if step["status"] == "completed"],
+            "step_timings": {step["name"]: {"seconds": step["seconds"], "status": step["status"]} for step in steps},
+            "total_seconds": round(time.perf_counter() - started, 3),
             "timestamp": datetime.utcnow().isoformat()
         }
         
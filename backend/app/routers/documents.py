@@ -1,35 +1,45 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request, Header
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import List, Optional, Tuple
 import os
-import tempfile
-import shutil
+import re
+import json
+import asyncio
+import hashlib
+import uuid
 from pathlib import Path
 import aiosqlite
 from datetime import datetime
 import logging
 
 from app.core.database import get_db
-from app.models.schemas import DocumentResponse, DocumentUploadResponse, RAGQueryRequest, RAGQueryResponse
+from app.models.schemas import DocumentResponse, DocumentUploadResponse, RAGQueryRequest, RAGQueryResponse, IngestionJobResponse
+from app.services.agent_budget import AgentBudget
 from app.services.rag_pipeline import rag_pipeline
+from app.services.ingestion_queue import ingestion_queue, QueueFullError
+from app.services.content_store import content_store
+from app.services.vectorstore_registry import DEFAULT_NAMESPACE
+from app.services.auth_service import auth_service
 from app.core.config import settings
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
+optional_security = HTTPBearer(auto_error=False)
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'.pdf', '.txt', '.doc', '.docx'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
-async def save_document_to_db(db: aiosqlite.Connection, filename: str, filepath: str, file_type: str, file_size: int, user_id: int = 1):
+async def save_document_to_db(db: aiosqlite.Connection, filename: str, filepath: str, file_type: str, file_size: int, content_hash: str = None, namespace: str = DEFAULT_NAMESPACE, user_id: int = 1):
     """Save document metadata to database"""
     try:
         await db.execute(
             """
-            INSERT INTO legal_documents (title, content, document_type, file_path, user_id, upload_date, file_size)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO legal_documents (title, content, document_type, file_path, user_id, upload_date, file_size, content_hash, namespace)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (filename, "", file_type, filepath, user_id, datetime.utcnow().isoformat(), file_size)
+            (filename, "", file_type, filepath, user_id, datetime.utcnow().isoformat(), file_size, content_hash, namespace)
         )
         await db.commit()
         
@@ -41,6 +51,28 @@ async def save_document_to_db(db: aiosqlite.Connection, filename: str, filepath:
         logger.error(f"Error saving document to database: {e}")
         raise
 
+def memory_key(namespace: str, session_id: str) -> str:
+    """Conversation memory key, scoped to the caller so sessions cannot be read or cleared across namespaces"""
+    return f"{namespace}:{session_id}"
+
+async def get_namespace(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    x_matter_id: Optional[str] = Header(default=None)
+) -> str:
+    """Resolve the caller's vectorstore namespace from the bearer token and optional matter header"""
+    namespace = DEFAULT_NAMESPACE
+    
+    if credentials:
+        payload = auth_service.verify_token(credentials.credentials, "access")
+        if payload and payload.get("user_id"):
+            namespace = f"user_{payload['user_id']}"
+    
+    if x_matter_id:
+        matter = re.sub(r"[^A-Za-z0-9_-]", "_", x_matter_id)[:50]
+        namespace = f"{namespace}_matter_{matter}"
+    
+    return namespace
+
 def validate_file(file: UploadFile) -> bool:
     """Validate uploaded file"""
     # Check file extension
@@ -54,13 +86,49 @@ def validate_file(file: UploadFile) -> bool:
     
     return True
 
+async def stream_upload(file: UploadFile, destination: Path, max_size: int = MAX_FILE_SIZE) -> Tuple[int, str]:
+    """Write an upload to ``destination`` in fixed-size chunks, returning (size, sha256 hex)
+
+    Only one chunk is held in memory at a time. Bytes go to a ``.part`` file
+    beside the destination that is renamed into place when complete; an
+    upload over ``max_size`` is rejected as soon as it crosses the limit and
+    leaves nothing behind.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    partial = destination.with_name(destination.name + ".part")
+    
+    def write_chunk(output, chunk: bytes):
+        digest.update(chunk)
+        output.write(chunk)
+    
+    try:
+        with open(partial, "wb") as output:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File {file.filename} is too large. Maximum size: {max_size // (1024*1024)}MB"
+                    )
+                await asyncio.to_thread(write_chunk, output, chunk)
+        os.replace(partial, destination)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    
+    return size, digest.hexdigest()
+
 @router.post("/upload", response_model=DocumentUploadResponse)
 async def upload_documents(
-    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
-    db: aiosqlite.Connection = Depends(get_db)
+    db: aiosqlite.Connection = Depends(get_db),
+    namespace: str = Depends(get_namespace)
 ):
-    """Upload documents for legal research"""
+    """Upload documents for legal research into the caller's namespace"""
     
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
@@ -68,14 +136,13 @@ async def upload_documents(
     if len(files) > 10:
         raise HTTPException(status_code=400, detail="Maximum 10 files allowed per upload")
     
+    # Refuse before accepting any bytes when ingestion is backed up
+    if not await asyncio.to_thread(ingestion_queue.has_capacity):
+        raise queue_full_error()
+    
     uploaded_files = []
-    temp_files = []
     
     try:
-        # Create uploads directory if it doesn't exist
-        upload_dir = Path(settings.UPLOAD_DIRECTORY)
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        
         for file in files:
             # Validate file
             if not validate_file(file):
@@ -84,118 +151,124 @@ async def upload_documents(
                     detail=f"Invalid file: {file.filename}. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
                 )
             
-            # Create temporary file
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix)
-            temp_files.append(temp_file.name)
-            
-            # Read and save file content
-            content = await file.read()
-            
-            # Check actual file size
-            if len(content) > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File {file.filename} is too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
+            # Stream to the content store, checking size and hashing as it goes; identical
+            # content already uploaded by anyone is kept once and shared
+            file_type = Path(file.filename).suffix.lower()
+            staging_path = content_store.staging_path(file_type)
+            file_size, sha256 = await stream_upload(file, staging_path)
+            async with content_store.lock(sha256):
+                file_path, is_new = await asyncio.to_thread(content_store.commit, staging_path, sha256, file_type)
+                
+                # Save to database
+                doc_id = await save_document_to_db(
+                    db, file.filename, str(file_path), 
+                    file_type, 
+                    file_size,
+                    sha256,
+                    namespace
                 )
             
-            temp_file.write(content)
-            temp_file.close()
-            
-            # Save to permanent location
-            file_path = upload_dir / f"{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-            shutil.copy2(temp_file.name, file_path)
-            
-            # Save to database
-            doc_id = await save_document_to_db(
-                db, file.filename, str(file_path), 
-                Path(file.filename).suffix.lower(), 
-                len(content)
-            )
-            
             uploaded_files.append({
                 "document_id": doc_id,
                 "filename": file.filename,
                 "file_path": str(file_path),
-                "file_size": len(content),
-                "file_type": Path(file.filename).suffix.lower()
+                "file_size": file_size,
+                "file_type": file_type,
+                "sha256": sha256,
+                "deduplicated": not is_new
             })
         
-        # Process documents in background
-        background_tasks.add_task(process_documents_for_rag, [f["file_path"] for f in uploaded_files])
+        # Queue the files for indexing; progress is reported at /jobs/{job_id}
+        try:
+            job = await asyncio.to_thread(
+                ingestion_queue.submit, [f["file_path"] for f in uploaded_files], namespace
+            )
+        except QueueFullError:
+            raise queue_full_error()
         
         return DocumentUploadResponse(
             message=f"Successfully uploaded {len(uploaded_files)} documents",
             documents=uploaded_files,
-            total_uploaded=len(uploaded_files)
+            total_uploaded=len(uploaded_files),
+            job_id=job["id"]
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading documents: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
-    
-    finally:
-        # Clean up temporary files
-        for temp_file in temp_files:
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
 
-async def process_documents_for_rag(file_paths: List[str]):
-    """Background task to process documents and add to RAG pipeline"""
-    try:
-        logger.info(f"Processing {len(file_paths)} documents for RAG pipeline")
-        
-        # Load documents
-        documents = rag_pipeline.add_documents_from_files(file_paths)
-        
-        if documents:
-            # Initialize or update vectorstore
-            if rag_pipeline.vectorstore is None:
-                rag_pipeline.initialize_vectorstore(documents)
-            else:
-                # Add new documents to existing vectorstore
-                chunks = rag_pipeline.text_splitter.split_documents(documents)
-                rag_pipeline.vectorstore.add_documents(chunks)
-            
-            # Save updated vectorstore
-            vectorstore_path = Path(settings.VECTORSTORE_PATH)
-            vectorstore_path.mkdir(parents=True, exist_ok=True)
-            rag_pipeline.save_vectorstore(str(vectorstore_path))
-            
-            logger.info(f"Successfully processed {len(documents)} documents for RAG")
-        else:
-            logger.warning("No documents were successfully loaded")
-            
-    except Exception as e:
-        logger.error(f"Error processing documents for RAG: {e}")
+def queue_full_error() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Ingestion queue is full, retry later",
+        headers={"Retry-After": str(int(settings.INGESTION_RETRY_BACKOFF_SECONDS * 2))}
+    )
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(job_id: str):
+    """Status and progress of an ingestion job"""
+    job = await asyncio.to_thread(ingestion_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    
+    return IngestionJobResponse(
+        job_id=job["id"],
+        namespace=job["namespace"],
+        status=job["status"],
+        attempts=job["attempts"],
+        max_attempts=job["max_attempts"],
+        progress=job["progress"],
+        error=job["error"],
+        created_at=datetime.utcfromtimestamp(job["created_at"]),
+        updated_at=datetime.utcfromtimestamp(job["updated_at"]),
+        next_attempt_at=datetime.utcfromtimestamp(job["next_attempt_at"]) if job["status"] == "retrying" else None
+    )
 
 @router.post("/query", response_model=RAGQueryResponse)
-async def query_documents(request: RAGQueryRequest):
-    """Query documents using RAG pipeline"""
+async def query_documents(request: RAGQueryRequest, namespace: str = Depends(get_namespace)):
+    """Query documents in the caller's namespace using RAG pipeline"""
     
     if not request.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
+    # Conversations are never shared: without a session id a new one is started
+    session_id = request.session_id
+    if session_id is None and request.use_conversation and not request.use_agent:
+        session_id = uuid.uuid4().hex
+    session_key = memory_key(namespace, session_id) if session_id else None
+    
     try:
         # Use RAG pipeline to get answer
         if request.use_agent:
-            response = rag_pipeline.agent_query(request.query)
+            budget = AgentBudget(
+                max_steps=request.agent_max_steps,
+                max_seconds=request.agent_max_seconds,
+                max_tokens=request.agent_max_tokens
+            )
+            response = await rag_pipeline.aagent_query(request.query, session_id=session_key, budget=budget)
         else:
-            response = rag_pipeline.query(
+            response = await rag_pipeline.aquery(
                 request.query, 
-                use_conversation=request.use_conversation
+                use_conversation=request.use_conversation,
+                session_id=session_key,
+                namespace=namespace
             )
         
-        # Get similarity search results
-        similar_docs = rag_pipeline.similarity_search(request.query, k=5)
+        # Reuse the QA path's scored retrieval; only other paths need a separate search
+        similar_docs = response.get("search_results")
+        if similar_docs is None:
+            similar_docs = await rag_pipeline.asimilarity_search(request.query, k=5, namespace=namespace)
         
         return RAGQueryResponse(
             query=request.query,
             answer=response.get("answer", "No answer generated"),
+            session_id=session_id,
             source_documents=similar_docs,
             chat_history=response.get("chat_history", []),
             tools_used=response.get("tools_used", []),
+            agent_trace=response.get("trace"),
             error=response.get("error")
         )
         
@@ -203,15 +276,48 @@ async def query_documents(request: RAGQueryRequest):
         logger.error(f"Error querying documents: {e}")
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
+@router.post("/query/stream")
+async def stream_query_documents(
+    request: RAGQueryRequest,
+    http_request: Request,
+    namespace: str = Depends(get_namespace)
+):
+    """Query documents using RAG pipeline, streaming the answer as server-sent events
+    
+    Emits a ``sources`` event with the retrieved documents, ``token`` events as the
+    answer is generated, and a final ``done`` (or ``error``) event.
+    """
+    
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    
+    async def event_stream():
+        events = rag_pipeline.astream_query(request.query, namespace=namespace)
+        try:
+            async for event in events:
+                if await http_request.is_disconnected():
+                    logger.info("Client disconnected, cancelling streamed query")
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            # Closing the generator cancels the upstream LLM stream
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/search/{query}")
-async def search_documents(query: str, limit: int = 5):
+async def search_documents(query: str, limit: int = 5, namespace: str = Depends(get_namespace)):
     """Search documents by similarity"""
     
     if not query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
     try:
-        results = rag_pipeline.similarity_search(query, k=limit)
+        results = await rag_pipeline.asimilarity_search(query, k=limit, namespace=namespace)
         
         return {
             "query": query,
@@ -234,11 +340,11 @@ async def get_rag_stats():
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {str(e)}")
 
 @router.post("/clear-memory")
-async def clear_conversation_memory():
-    """Clear conversation memory"""
+async def clear_conversation_memory(session_id: str, namespace: str = Depends(get_namespace)):
+    """Clear conversation memory for one of the caller's sessions"""
     try:
-        rag_pipeline.clear_memory()
-        return {"message": "Conversation memory cleared successfully"}
+        rag_pipeline.clear_memory(memory_key(namespace, session_id))
+        return {"message": f"Conversation memory cleared successfully for session {session_id}"}
     except Exception as e:
         logger.error(f"Error clearing memory: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to clear memory: {str(e)}")
@@ -247,18 +353,20 @@ async def clear_conversation_memory():
 async def list_documents(
     limit: int = 50,
     offset: int = 0,
-    db: aiosqlite.Connection = Depends(get_db)
+    db: aiosqlite.Connection = Depends(get_db),
+    namespace: str = Depends(get_namespace)
 ):
-    """List uploaded documents"""
+    """List documents uploaded to the caller's namespace"""
     try:
         cursor = await db.execute(
             """
             SELECT id, title, document_type, file_path, upload_date, file_size, user_id
             FROM legal_documents
+            WHERE COALESCE(namespace, ?) = ?
             ORDER BY upload_date DESC
             LIMIT ? OFFSET ?
             """,
-            (limit, offset)
+            (DEFAULT_NAMESPACE, namespace, limit, offset)
         )
         
         documents = await cursor.fetchall()
@@ -282,30 +390,54 @@ async def list_documents(
         raise HTTPException(status_code=500, detail=f"Failed to list documents: {str(e)}")
 
 @router.delete("/documents/{document_id}")
-async def delete_document(document_id: int, db: aiosqlite.Connection = Depends(get_db)):
-    """Delete a document"""
+async def delete_document(
+    document_id: int,
+    db: aiosqlite.Connection = Depends(get_db),
+    namespace: str = Depends(get_namespace)
+):
+    """Delete one of the caller's documents and remove its chunks from the namespace's search index"""
     try:
-        # Get document info
+        # Documents in other namespaces are reported as missing, not forbidden
         cursor = await db.execute(
-            "SELECT file_path FROM legal_documents WHERE id = ?",
-            (document_id,)
+            "SELECT file_path, content_hash FROM legal_documents WHERE id = ? AND COALESCE(namespace, ?) = ?",
+            (document_id, DEFAULT_NAMESPACE, namespace)
         )
         doc = await cursor.fetchone()
         
         if not doc:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Delete file from filesystem
-        try:
-            if os.path.exists(doc[0]):
-                os.unlink(doc[0])
-        except Exception as e:
-            logger.warning(f"Could not delete file {doc[0]}: {e}")
-        
         # Delete from database
-        await db.execute("DELETE FROM legal_documents WHERE id = ?", (document_id,))
+        await db.execute(
+            "DELETE FROM legal_documents WHERE id = ? AND COALESCE(namespace, ?) = ?",
+            (document_id, DEFAULT_NAMESPACE, namespace)
+        )
         await db.commit()
         
+        # The namespace's index keeps the content while another upload of it there remains
+        if doc[1]:
+            cursor = await db.execute(
+                "SELECT COUNT(*) FROM legal_documents WHERE content_hash = ? AND COALESCE(namespace, ?) = ?",
+                (doc[1], DEFAULT_NAMESPACE, namespace)
+            )
+            if not (await cursor.fetchone())[0]:
+                await asyncio.to_thread(rag_pipeline.delete_content, doc[1], namespace)
+        
+        # Content-addressed files are shared; remove one only with its last reference
+        if not doc[1]:
+            content_store.release(doc[0])
+        else:
+            async with content_store.lock(doc[1]):
+                cursor = await db.execute(
+                    "SELECT COUNT(*) FROM legal_documents WHERE content_hash = ?",
+                    (doc[1],)
+                )
+                if not (await cursor.fetchone())[0]:
+                    content_store.release(doc[0])
+                    await asyncio.to_thread(rag_pipeline.content_index.discard, doc[1])
+                    if rag_pipeline.text_cache:
+                        await asyncio.to_thread(rag_pipeline.text_cache.discard, doc[1])
+        
         return {"message": f"Document {document_id} deleted successfully"}
         
     except HTTPException:
@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Callable
+import logging
+from langchain_core.callbacks import BaseCallbackHandler
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Output of an AgentExecutor that hit its own iteration or time limit
+EXECUTOR_STOPPED_OUTPUT = "Agent stopped due to iteration limit or time limit."
+
+@dataclass
+class AgentBudget:
+    """Per-request limits on an agent run; unset limits default to (and may not exceed) the configured ones"""
+    max_steps: Optional[int] = None
+    max_seconds: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+    def __post_init__(self):
+        self.max_steps = min(self.max_steps or settings.AGENT_MAX_STEPS, settings.AGENT_MAX_STEPS)
+        self.max_seconds = min(self.max_seconds or settings.AGENT_MAX_SECONDS, settings.AGENT_MAX_SECONDS)
+        self.max_tokens = min(self.max_tokens or settings.AGENT_MAX_TOKENS, settings.AGENT_MAX_TOKENS)
+
+class AgentBudgetExceeded(Exception):
+    """Raised from the trace callbacks to stop an agent run that used up its budget"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Agent budget exceeded: {reason}")
+        self.reason = reason
+
+@dataclass
+class AgentStep:
+    tool: str
+    tool_input: str
+    observation: Optional[str] = None
+    seconds: float = 0.0
+
+class AgentTrace(BaseCallbackHandler):
+    """Callback handler recording one agent run's steps, LLM calls, tokens and latency
+
+    It also enforces the run's budget: before each LLM or tool call it raises
+    AgentBudgetExceeded once the step, time or token limit is used up, so a
+    run stops at the next boundary instead of looping. Tokens are taken from
+    the provider's reported usage when available, else counted from the
+    prompts and generations.
+    """
+
+    raise_error = True
+    run_inline = True
+
+    def __init__(self, budget: AgentBudget, count_tokens: Callable[[str], int]):
+        self.budget = budget
+        self.count_tokens = count_tokens
+        self.started = time.perf_counter()
+        self.steps: List[AgentStep] = []
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.stop_reason: Optional[str] = None
+        self._llm_started: Optional[float] = None
+        self._pending_prompt_tokens = 0
+        self._tool_started: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def _check(self, before_step: bool = False):
+        if before_step and len(self.steps) >= self.budget.max_steps:
+            reason = "max_steps"
+        elif self.elapsed >= self.budget.max_seconds:
+            reason = "max_seconds"
+        elif self.total_tokens >= self.budget.max_tokens:
+            reason = "max_tokens"
+        else:
+            return
+        self.stop_reason = reason
+        raise AgentBudgetExceeded(reason)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self._check()
+        self._llm_started = time.perf_counter()
+        self._pending_prompt_tokens = sum(self.count_tokens(prompt) for prompt in prompts)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        self._check()
+        self._llm_started = time.perf_counter()
+        self._pending_prompt_tokens = sum(
+            self.count_tokens(str(getattr(message, "content", message))) for batch in messages for message in batch
+        )
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        self.llm_calls += 1
+        if self._llm_started is not None:
+            self.llm_seconds += time.perf_counter() - self._llm_started
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens") is not None:
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.completion_tokens += usage.get("completion_tokens", 0)
+        else:
+            self.prompt_tokens += self._pending_prompt_tokens
+            self.completion_tokens += sum(
+                self.count_tokens(generation.text) for generations in response.generations for generation in generations
+            )
+
+    def on_agent_action(self, action: Any, **kwargs: Any) -> None:
+        self._check(before_step=True)
+        self.steps.append(AgentStep(tool=action.tool, tool_input=str(action.tool_input)))
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any) -> None:
+        self._check()
+        self._tool_started = time.perf_counter()
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        if self.steps:
+            self.steps[-1].observation = str(output)
+            if self._tool_started is not None:
+                self.steps[-1].seconds = time.perf_counter() - self._tool_started
+
+    def partial_answer(self) -> str:
+        """Best answer from the steps completed before the run was stopped"""
+        observations = [step for step in self.steps if step.observation]
+        if not observations:
+            return f"The request could not be completed within its budget ({self.stop_reason})."
+        findings = "\n\n".join(
+            f"{step.tool} ({step.tool_input}):\n{step.observation[:settings.AGENT_PARTIAL_ANSWER_CHARS]}"
+            for step in observations[-2:]
+        )
+        return f"Partial answer (stopped early: {self.stop_reason}). Findings so far:\n\n{findings}"
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "steps": [
+                {"tool": step.tool, "input": step.tool_input, "seconds": round(step.seconds, 3)}
+                for step in self.steps
+            ],
+            "llm_calls": self.llm_calls,
+            "llm_seconds": round(self.llm_seconds, 3),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "seconds": round(self.elapsed, 3),
+            "stop_reason": self.stop_reason
+        }
+
+class AgentMetrics:
+    """Aggregate agent run metrics and the most recent run traces"""
+
+    def __init__(self, recent: int = 50):
+        self._recent: deque = deque(maxlen=recent)
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.steps = 0
+        self.llm_calls = 0
+        self.tokens = 0
+        self.seconds = 0.0
+        self.stop_reasons: Dict[str, int] = {}
+        self.tool_calls: Dict[str, int] = {}
+
+    def record(self, trace: AgentTrace):
+        summary = trace.summary()
+        with self._lock:
+            self.runs += 1
+            self.steps += len(trace.steps)
+            self.llm_calls += trace.llm_calls
+            self.tokens += trace.total_tokens
+            self.seconds += trace.elapsed
+            reason = trace.stop_reason or "finished"
+            self.stop_reasons[reason] = self.stop_reasons.get(reason, 0) + 1
+            for step in trace.steps:
+                self.tool_calls[step.tool] = self.tool_calls.get(step.tool, 0) + 1
+            self._recent.append(summary)
+        logger.debug(f"Agent run: {summary}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "avg_steps": self.steps / self.runs if self.runs else 0.0,
+                "avg_llm_calls": self.llm_calls / self.runs if self.runs else 0.0,
+                "avg_tokens": self.tokens / self.runs if self.runs else 0.0,
+                "avg_seconds": self.seconds / self.runs if self.runs else 0.0,
+                "stop_reasons": dict(self.stop_reasons),
+                "tool_calls": dict(self.tool_calls),
+                "recent": list(self._recent)
+            }
@@ -0,0 +1,168 @@
+import numpy as np
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+import logging
+from app.core.config import settings
+from app.services.vectorstore_registry import DEFAULT_NAMESPACE
+
+logger = logging.getLogger(__name__)
+
+class SemanticAnswerCache:
+    """Answer cache keyed by query embedding and scoped by namespace, corpus version and k
+
+    Entries live in a small dedicated vector index (a normalized embedding
+    matrix searched by inner product). A lookup hits when a stored query for
+    the same namespace, corpus version and number of retrieved documents ``k``
+    is at least ``similarity_threshold`` cosine-similar to the incoming one. Entries expire after ``ttl_seconds`` and the least
+    recently used entry is evicted once ``max_entries`` is reached.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = None,
+        max_entries: int = None,
+        ttl_seconds: int = None
+    ):
+        self.similarity_threshold = (
+            similarity_threshold if similarity_threshold is not None
+            else settings.ANSWER_CACHE_SIMILARITY_THRESHOLD
+        )
+        self.max_entries = max_entries or settings.ANSWER_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or settings.ANSWER_CACHE_TTL_SECONDS
+
+        # entry_id -> {"question", "namespace", "corpus_version", "k", "response", "created_at"}
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        # Row i of the matrix holds the embedding of entry self._ids[i]
+        self._ids: List[int] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _remove(self, entry_id: int):
+        """Drop an entry and its row from the index (caller holds the lock)"""
+        self._entries.pop(entry_id, None)
+        row = self._ids.index(entry_id)
+        del self._ids[row]
+        self._matrix = np.delete(self._matrix, row, axis=0) if self._ids else None
+
+    def _expire(self, now: float):
+        """Remove entries whose TTL has elapsed (caller holds the lock)"""
+        expired = [
+            entry_id for entry_id, entry in self._entries.items()
+            if now - entry["created_at"] > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            self._remove(entry_id)
+
+    def lookup(
+        self,
+        embedding: List[float],
+        corpus_version: int,
+        namespace: str = DEFAULT_NAMESPACE,
+        k: int = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached response for the closest matching query, if any"""
+        query_vector = self._normalize(embedding)
+
+        with self._lock:
+            self._expire(time.monotonic())
+
+            if self._matrix is None:
+                self.misses += 1
+                return None
+
+            scores = self._matrix @ query_vector
+            for row in np.argsort(-scores):
+                if scores[row] < self.similarity_threshold:
+                    break
+                entry_id = self._ids[row]
+                entry = self._entries[entry_id]
+                if (
+                    entry["namespace"] != namespace
+                    or entry["corpus_version"] != corpus_version
+                    or entry["k"] != k
+                ):
+                    continue
+
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return {
+                    **entry["response"],
+                    "cached": True,
+                    "cache_similarity": float(scores[row])
+                }
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        question: str,
+        embedding: List[float],
+        corpus_version: int,
+        response: Dict[str, Any],
+        namespace: str = DEFAULT_NAMESPACE,
+        k: int = None
+    ):
+        """Cache a response for a query embedding"""
+        vector = self._normalize(embedding)
+
+        with self._lock:
+            while len(self._entries) >= self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self.evictions += 1
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "question": question,
+                "namespace": namespace,
+                "corpus_version": corpus_version,
+                "k": k,
+                "response": response,
+                "created_at": time.monotonic()
+            }
+            self._ids.append(entry_id)
+            row = vector.reshape(1, -1)
+            self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+
+    def invalidate(self, corpus_version: int = None, namespace: str = DEFAULT_NAMESPACE):
+        """Drop a namespace's entries that do not belong to ``corpus_version`` (all of them if None)"""
+        with self._lock:
+            stale = [
+                entry_id for entry_id, entry in self._entries.items()
+                if entry["namespace"] == namespace
+                and (corpus_version is None or entry["corpus_version"] != corpus_version)
+            ]
+            for entry_id in stale:
+                self._remove(entry_id)
+
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached answers")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
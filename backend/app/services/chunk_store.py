@@ -0,0 +1,221 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Union
+import logging
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+CHUNK_STORE_FILE = "chunks.sqlite"
+
+class ChunkStore:
+    """Source texts of a namespace in SQLite, read back by (document, offset, length)
+
+    Chunk and parent-section text is never held by the vector index; it is
+    resolved from here with ``substr`` so only the requested span is copied
+    into Python. Documents are keyed by a hash of their text, so re-ingesting
+    the same text stores it once.
+    """
+
+    _open: Dict[str, "ChunkStore"] = {}
+    _open_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        # Takes effect for new files only; lets deletes return pages to the filesystem
+        self._connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "doc_id TEXT PRIMARY KEY, source TEXT, length INTEGER NOT NULL, text TEXT NOT NULL)"
+        )
+        self._connection.commit()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str) -> "ChunkStore":
+        """Shared store for a file (snapshots of one namespace all read the same store)"""
+        key = str(Path(path).resolve())
+        with cls._open_lock:
+            if key not in cls._open:
+                cls._open[key] = cls(key)
+            return cls._open[key]
+
+    @staticmethod
+    def document_id(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+    def add_document(self, text: str, source: str = None) -> str:
+        """Store a document's text and return its id"""
+        doc_id = self.document_id(text)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO documents (doc_id, source, length, text) VALUES (?, ?, ?, ?)",
+                (doc_id, source, len(text), text)
+            )
+            self._connection.commit()
+        return doc_id
+
+    def read(self, doc_id: str, start: int, end: int) -> Optional[str]:
+        """Text of ``[start, end)`` in a stored document, or None if it is unknown"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT substr(text, ?, ?) FROM documents WHERE doc_id = ?",
+                (start + 1, max(end - start, 0), doc_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def missing(self, doc_ids: List[str]) -> List[str]:
+        """Ids among ``doc_ids`` that have no stored text"""
+        if not doc_ids:
+            return []
+        unique = list(set(doc_ids))
+        placeholders = ",".join("?" * len(unique))
+        with self._lock:
+            found = {
+                row[0] for row in self._connection.execute(
+                    f"SELECT doc_id FROM documents WHERE doc_id IN ({placeholders})", unique
+                )
+            }
+        return [doc_id for doc_id in unique if doc_id not in found]
+
+    def delete(self, doc_ids: List[str]) -> int:
+        """Remove documents' text and release the freed pages; returns the number removed"""
+        if not doc_ids:
+            return 0
+        with self._lock:
+            removed = self._connection.executemany(
+                "DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id in doc_ids]
+            ).rowcount
+            self._connection.commit()
+            self._connection.execute("PRAGMA incremental_vacuum")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            documents, characters = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents"
+            ).fetchone()
+        return {"path": str(self.path), "documents": documents, "characters": characters}
+
+def chunk_span(chunk: Document) -> Optional[Tuple[int, int]]:
+    """[start, end) of a chunk in its source text, from splitter metadata"""
+    start = chunk.metadata.get("start_offset", chunk.metadata.get("start_index"))
+    if start is None or start < 0:
+        return None
+    return start, start + len(chunk.page_content)
+
+def parent_spans(chunks: List[Document], text_length: int, max_chars: int) -> List[Optional[Tuple[int, int]]]:
+    """Parent span for each chunk of one document
+
+    The parent is the chunk's section (consecutive chunks with the same
+    division and section), narrowed to a ``max_chars`` window around the chunk
+    when the section is longer.
+    """
+    spans = [chunk_span(chunk) for chunk in chunks]
+    parents: List[Optional[Tuple[int, int]]] = [None] * len(chunks)
+
+    index = 0
+    while index < len(chunks):
+        key = (chunks[index].metadata.get("division"), chunks[index].metadata.get("section"))
+        group_end = index + 1
+        if key != (None, None):
+            while group_end < len(chunks) and (
+                chunks[group_end].metadata.get("division"), chunks[group_end].metadata.get("section")
+            ) == key:
+                group_end += 1
+
+        group = [span for span in spans[index:group_end] if span]
+        if group:
+            section_start = min(start for start, _ in group)
+            section_end = max(end for _, end in group)
+            if key == (None, None):
+                section_start, section_end = 0, text_length
+            for position in range(index, group_end):
+                if not spans[position]:
+                    continue
+                start, end = spans[position]
+                if section_end - section_start <= max_chars:
+                    parents[position] = (section_start, section_end)
+                else:
+                    pad = max((max_chars - (end - start)) // 2, 0)
+                    parent_start = max(section_start, start - pad)
+                    parent_end = min(section_end, max(end, parent_start + max_chars))
+                    parents[position] = (parent_start, parent_end)
+        index = group_end
+
+    return parents
+
+class ChunkDocstore(InMemoryDocstore):
+    """FAISS docstore that keeps ids and metadata in memory and chunk text in a ChunkStore
+
+    Documents added with a ``doc_id`` in their metadata are stored without
+    ``page_content``; ``search`` reads the text back from the chunk store by
+    offset. Documents without a ``doc_id`` (older indexes) are kept inline.
+    """
+
+    def __init__(self, _dict: Optional[Dict[str, Document]] = None, store_path: str = None):
+        super().__init__(_dict)
+        self.store_path = store_path
+        self._store: Optional[ChunkStore] = None
+
+    @property
+    def store(self) -> ChunkStore:
+        if self._store is None:
+            self._store = ChunkStore.open(self.store_path)
+        return self._store
+
+    def bind(self, directory: str):
+        """Point at the chunk store next to a (possibly moved) saved index"""
+        self.store_path = str(Path(directory) / CHUNK_STORE_FILE)
+        self._store = None
+
+    def copy(self) -> "ChunkDocstore":
+        return ChunkDocstore(dict(self._dict), self.store_path)
+
+    @staticmethod
+    def _strip(document: Document) -> Document:
+        if "doc_id" not in document.metadata or not document.page_content:
+            return document
+        return Document(page_content="", metadata=document.metadata)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        super().add({doc_id: self._strip(document) for doc_id, document in texts.items()})
+
+    def search(self, search: str) -> Union[str, Document]:
+        document = super().search(search)
+        if isinstance(document, str) or document.page_content or "doc_id" not in document.metadata:
+            return document
+
+        metadata = document.metadata
+        text = self.store.read(metadata["doc_id"], metadata["start_offset"], metadata["end_offset"])
+        if text is None:
+            logger.warning(f"Chunk text for document {metadata['doc_id']} is missing from {self.store_path}")
+            text = ""
+        return Document(page_content=text, metadata=metadata)
+
+    def read_parent(self, document: Document) -> Optional[Document]:
+        """The parent-section span of a chunk, or None if it has none"""
+        metadata = document.metadata
+        if "doc_id" not in metadata or "parent_start" not in metadata:
+            return None
+        text = self.store.read(metadata["doc_id"], metadata["parent_start"], metadata["parent_end"])
+        if text is None:
+            return None
+        return Document(
+            page_content=text,
+            metadata={**metadata, "start_offset": metadata["parent_start"], "end_offset": metadata["parent_end"]}
+        )
+
+    def __getstate__(self):
+        return {"_dict": self._dict, "store_path": self.store_path}
+
+    def __setstate__(self, state):
+        self._dict = state["_dict"]
+        self.store_path = state["store_path"]
+        self._store = None
@@ -0,0 +1,396 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_INDEX_FILE = "content_index.sqlite"
+EXTRACTED_TEXT_FILE = "extracted_text.sqlite"
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+CONTENT_LOCK_POLL_SECONDS = 0.01
+
+# (text, vector) pairs and their metadata, as produced by LegalRAGPipeline._embed_chunks
+Embedded = Tuple[List[Tuple[str, List[float]]], List[Dict]]
+
+class ContentStore:
+    """Uploaded files stored once per distinct content, keyed by SHA-256
+
+    Files live at ``objects/<first two hex digits>/<sha256><suffix>`` under
+    the upload directory. Uploads are written to ``objects/tmp`` first and
+    moved into place once their hash is known; a second upload of the same
+    bytes is dropped and shares the existing object. Objects are
+    reference-counted by the ``legal_documents`` rows that point at them and
+    removed with the last one.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = Path(root or settings.UPLOAD_DIRECTORY)
+        self.objects = self.root / "objects"
+
+    @asynccontextmanager
+    async def lock(self, sha256: str) -> AsyncIterator[None]:
+        """Exclusive lock for one content hash, shared by every process using the upload directory
+
+        Hold it from ``commit`` until the referencing row is inserted, and from
+        counting references until ``release``, so a delete cannot remove an
+        object that an upload has just been deduplicated against. Hashes are
+        striped over 256 lock files by their first two hex digits.
+        """
+        path = self.objects / "locks" / f"{sha256[:2]}.lock"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a+b") as handle:
+            # Polled so waiting neither blocks the event loop nor outlives a cancelled request;
+            # closing the file releases the lock
+            while True:
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(CONTENT_LOCK_POLL_SECONDS)
+            yield
+
+    def staging_path(self, suffix: str = "") -> Path:
+        """A fresh path to stream an upload to before its hash is known"""
+        staging = self.objects / "tmp"
+        staging.mkdir(parents=True, exist_ok=True)
+        return staging / f"{uuid.uuid4().hex}{suffix}"
+
+    def path_for(self, sha256: str, suffix: str = "") -> Path:
+        return self.objects / sha256[:2] / f"{sha256}{suffix.lower()}"
+
+    def commit(self, staging: Path, sha256: str, suffix: str = "") -> Tuple[Path, bool]:
+        """Move a staged upload to its content address; returns (path, whether it is new)"""
+        target = self.path_for(sha256, suffix)
+        if target.exists():
+            staging.unlink(missing_ok=True)
+            return target, False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staging, target)
+        return target, True
+
+    def release(self, path: str):
+        """Remove an object that no document references any more"""
+        try:
+            Path(path).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not delete content object {path}: {e}")
+
+    def find(self, sha256: str) -> Optional[Path]:
+        """The stored object for a content hash, whatever its extension"""
+        matches = sorted((self.objects / sha256[:2]).glob(f"{sha256}*"))
+        return matches[0] if matches else None
+
+    @staticmethod
+    def sha256_of(path: str) -> str:
+        """Content hash of a file; read from the name for content-addressed objects"""
+        stem = Path(path).stem
+        if SHA256_PATTERN.match(stem):
+            return stem
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(settings.UPLOAD_CHUNK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+class ContentIndex:
+    """Chunks and vectors of already-ingested content, shared by all namespaces
+
+    When content is first ingested its source texts, chunks and embedding
+    vectors are recorded under a key of the content hash and the chunking and
+    embedding configuration. Ingesting the same content into another
+    namespace reuses them instead of parsing, splitting and embedding again.
+    ``namespace_contents`` records which namespaces already hold which
+    content so repeat uploads into the same namespace are skipped.
+
+    ``namespace_chunks`` records the index chunk ids each content contributed
+    to a namespace (including representatives it was collapsed into), so a
+    delete can find them; ``tombstones`` holds deleted chunk ids until
+    compaction removes their vectors.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                "CREATE TABLE IF NOT EXISTS content_sources ("
+                "content_key TEXT NOT NULL, position INTEGER NOT NULL, source TEXT, text TEXT NOT NULL, "
+                "PRIMARY KEY (content_key, position));"
+                "CREATE TABLE IF NOT EXISTS content_chunks ("
+                "content_key TEXT NOT NULL, position INTEGER NOT NULL, text TEXT NOT NULL, "
+                "metadata TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (content_key, position));"
+                "CREATE TABLE IF NOT EXISTS namespace_contents ("
+                "namespace TEXT NOT NULL, content_sha256 TEXT NOT NULL, PRIMARY KEY (namespace, content_sha256));"
+                "CREATE TABLE IF NOT EXISTS namespace_chunks ("
+                "namespace TEXT NOT NULL, content_sha256 TEXT NOT NULL, chunk_id TEXT NOT NULL, "
+                "PRIMARY KEY (namespace, content_sha256, chunk_id)) WITHOUT ROWID;"
+                "CREATE INDEX IF NOT EXISTS idx_namespace_chunks_chunk ON namespace_chunks (namespace, chunk_id);"
+                "CREATE TABLE IF NOT EXISTS tombstones ("
+                "namespace TEXT NOT NULL, chunk_id TEXT NOT NULL, PRIMARY KEY (namespace, chunk_id)) WITHOUT ROWID;"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, content_key: str) -> Optional[Tuple[List[Tuple[str, Optional[str]]], Embedded]]:
+        """(source texts, embedded chunks) recorded for a content key, or None"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT text, metadata, vector FROM content_chunks WHERE content_key = ? ORDER BY position",
+                (content_key,)
+            ).fetchall()
+            if not rows:
+                return None
+            sources = self.connection.execute(
+                "SELECT text, source FROM content_sources WHERE content_key = ? ORDER BY position",
+                (content_key,)
+            ).fetchall()
+
+        text_embeddings, metadatas = [], []
+        for text, metadata, vector in rows:
+            values = array("f")
+            values.frombytes(vector)
+            text_embeddings.append((text, values.tolist()))
+            metadatas.append(json.loads(metadata))
+        return [(text, source) for text, source in sources], (text_embeddings, metadatas)
+
+    def put(self, content_key: str, sources: List[Tuple[str, Optional[str]]], embedded: Embedded):
+        """Record the source texts and embedded chunks of a piece of content"""
+        text_embeddings, metadatas = embedded
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM content_sources WHERE content_key = ?", (content_key,))
+            self.connection.execute("DELETE FROM content_chunks WHERE content_key = ?", (content_key,))
+            self.connection.executemany(
+                "INSERT INTO content_sources (content_key, position, source, text) VALUES (?, ?, ?, ?)",
+                [(content_key, position, source, text) for position, (text, source) in enumerate(sources)]
+            )
+            self.connection.executemany(
+                "INSERT INTO content_chunks (content_key, position, text, metadata, vector) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (content_key, position, text, json.dumps(metadata, default=str), array("f", vector).tobytes())
+                    for position, ((text, vector), metadata) in enumerate(zip(text_embeddings, metadatas))
+                ]
+            )
+
+    def discard(self, content_sha256: str):
+        """Forget the chunks and vectors of content under any configuration"""
+        pattern = f"{content_sha256}:%"
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM content_sources WHERE content_key LIKE ?", (pattern,))
+            self.connection.execute("DELETE FROM content_chunks WHERE content_key LIKE ?", (pattern,))
+
+    def is_linked(self, namespace: str, content_sha256: str) -> bool:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM namespace_contents WHERE namespace = ? AND content_sha256 = ?",
+                (namespace, content_sha256)
+            ).fetchone()
+        return row is not None
+
+    def link(self, namespace: str, content_sha256: str):
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO namespace_contents (namespace, content_sha256) VALUES (?, ?)",
+                (namespace, content_sha256)
+            )
+
+    def unlink(self, namespace: str, content_sha256: str):
+        with self._lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM namespace_contents WHERE namespace = ? AND content_sha256 = ?",
+                (namespace, content_sha256)
+            )
+
+    def contents(self, namespace: str) -> List[str]:
+        """Hashes of the content a namespace holds"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT content_sha256 FROM namespace_contents WHERE namespace = ? ORDER BY content_sha256",
+                (namespace,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def track_chunks(self, namespace: str, chunks: List[Tuple[str, str]]):
+        """Record (content hash, chunk id) pairs added to a namespace's index"""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO namespace_chunks (namespace, content_sha256, chunk_id) VALUES (?, ?, ?)",
+                [(namespace, content_sha256, chunk_id) for content_sha256, chunk_id in chunks]
+            )
+
+    def remove_content(self, namespace: str, content_sha256: str) -> List[str]:
+        """Unlink content from a namespace; returns its chunk ids that no other content shares"""
+        with self._lock, self.connection:
+            rows = self.connection.execute(
+                "SELECT c.chunk_id FROM namespace_chunks c WHERE c.namespace = ? AND c.content_sha256 = ? "
+                "AND NOT EXISTS (SELECT 1 FROM namespace_chunks o WHERE o.namespace = c.namespace "
+                "AND o.chunk_id = c.chunk_id AND o.content_sha256 != c.content_sha256)",
+                (namespace, content_sha256)
+            ).fetchall()
+            self.connection.execute(
+                "DELETE FROM namespace_chunks WHERE namespace = ? AND content_sha256 = ?", (namespace, content_sha256)
+            )
+            self.connection.execute(
+                "DELETE FROM namespace_contents WHERE namespace = ? AND content_sha256 = ?", (namespace, content_sha256)
+            )
+        return [row[0] for row in rows]
+
+    def reset_namespace(self, namespace: str):
+        """Forget a namespace's chunk ids and tombstones (its index is being replaced)"""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM namespace_chunks WHERE namespace = ?", (namespace,))
+            self.connection.execute("DELETE FROM tombstones WHERE namespace = ?", (namespace,))
+
+    def add_tombstones(self, namespace: str, chunk_ids: List[str]):
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO tombstones (namespace, chunk_id) VALUES (?, ?)",
+                [(namespace, chunk_id) for chunk_id in chunk_ids]
+            )
+
+    def tombstones(self, namespace: str) -> List[str]:
+        with self._lock:
+            rows = self.connection.execute("SELECT chunk_id FROM tombstones WHERE namespace = ?", (namespace,)).fetchall()
+        return [row[0] for row in rows]
+
+    def clear_tombstones(self, namespace: str, chunk_ids: List[str]):
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM tombstones WHERE namespace = ? AND chunk_id = ?",
+                [(namespace, chunk_id) for chunk_id in chunk_ids]
+            )
+
+    def tombstone_counts(self) -> Dict[str, int]:
+        """Tombstoned chunks awaiting compaction, per namespace"""
+        with self._lock:
+            rows = self.connection.execute("SELECT namespace, COUNT(*) FROM tombstones GROUP BY namespace").fetchall()
+        return dict(rows)
+
+    def namespaces(self) -> List[str]:
+        with self._lock:
+            rows = self.connection.execute("SELECT DISTINCT namespace FROM namespace_contents ORDER BY namespace").fetchall()
+        return [row[0] for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            contents, chunks = self.connection.execute(
+                "SELECT COUNT(DISTINCT content_key), COUNT(*) FROM content_chunks"
+            ).fetchone()
+            links = self.connection.execute("SELECT COUNT(*) FROM namespace_contents").fetchone()[0]
+            tombstones = self.connection.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0]
+        return {
+            "path": str(self.path),
+            "contents": contents,
+            "chunks": chunks,
+            "namespace_links": links,
+            "tombstones": tombstones
+        }
+
+class ExtractedTextCache:
+    """Text extracted from uploaded files, zlib-compressed, keyed by content hash
+
+    Each entry records the parser version that produced it; a lookup with a
+    different version misses, so upgrading one file type's parser re-parses
+    only files of that type. Rebuilding an index from cached text costs only
+    splitting and embedding.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or Path(settings.UPLOAD_DIRECTORY) / EXTRACTED_TEXT_FILE)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS extracted_text ("
+                "content_sha256 TEXT PRIMARY KEY, file_type TEXT NOT NULL, parser TEXT NOT NULL, "
+                "documents BLOB NOT NULL, text_bytes INTEGER NOT NULL, stored_bytes INTEGER NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, content_sha256: str, parser: str) -> Optional[List[Dict[str, Any]]]:
+        """Extracted documents (``page_content`` and ``metadata`` dicts) if cached by ``parser``"""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT documents FROM extracted_text WHERE content_sha256 = ? AND parser = ?",
+                (content_sha256, parser)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, content_sha256: str, file_type: str, parser: str, documents: List[Dict[str, Any]]):
+        raw = json.dumps(documents, default=str).encode("utf-8")
+        compressed = zlib.compress(raw, 6)
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO extracted_text "
+                "(content_sha256, file_type, parser, documents, text_bytes, stored_bytes, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (content_sha256, file_type, parser, compressed, len(raw), len(compressed), time.time())
+            )
+
+    def invalidate(self, file_type: str = None) -> int:
+        """Drop cached text for one file type (or all), forcing those files to be parsed again"""
+        with self._lock, self.connection:
+            if file_type:
+                cursor = self.connection.execute("DELETE FROM extracted_text WHERE file_type = ?", (file_type.lower(),))
+            else:
+                cursor = self.connection.execute("DELETE FROM extracted_text")
+        return cursor.rowcount
+
+    def discard(self, content_sha256: str):
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM extracted_text WHERE content_sha256 = ?", (content_sha256,))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, text_bytes, stored_bytes = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(text_bytes), 0), COALESCE(SUM(stored_bytes), 0) FROM extracted_text"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "text_bytes": text_bytes,
+            "stored_bytes": stored_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+# Global content store instance
+content_store = ContentStore()
@@ -0,0 +1,175 @@
+import re
+import tiktoken
+from typing import List, Dict, Any, Tuple, Set
+import logging
+from langchain_core.documents import Document
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?;])\s+|\n{2,}")
+TERM_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "did", "do", "does", "for",
+    "from", "has", "have", "how", "if", "in", "is", "it", "its", "of", "on", "or", "that",
+    "the", "their", "there", "this", "to", "was", "were", "what", "when", "where", "which",
+    "who", "why", "will", "with", "would", "you"
+}
+
+class ContextBuilder:
+    """Token-budgeted context assembly for the QA prompt
+
+    Retrieved chunks are de-overlapped (the splitter repeats up to
+    ``chunk_overlap`` characters between neighbouring chunks), ordered by
+    maximal marginal relevance, and reduced to their query-relevant sentences
+    until the token budget is spent.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = None,
+        mmr_lambda: float = None,
+        max_overlap: int = 200,
+        min_overlap: int = 20,
+        encoding_name: str = "cl100k_base"
+    ):
+        self.token_budget = token_budget or settings.CONTEXT_TOKEN_BUDGET
+        self.mmr_lambda = mmr_lambda if mmr_lambda is not None else settings.CONTEXT_MMR_LAMBDA
+        self.max_overlap = max_overlap
+        self.min_overlap = min_overlap
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._encoding_loaded = False
+
+    def _get_encoding(self):
+        """Load the tiktoken encoding on first use (it may need to be downloaded)"""
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            try:
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding {self.encoding_name}: {e}, estimating tokens from length")
+        return self._encoding
+
+    def count_tokens(self, text: str) -> int:
+        """Count prompt tokens in text"""
+        encoding = self._get_encoding()
+        if encoding is None:
+            return max(1, len(text) // 4)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    @staticmethod
+    def _terms(text: str) -> Set[str]:
+        return {term for term in TERM_PATTERN.findall(text.lower()) if term not in STOPWORDS}
+
+    def _overlap(self, previous: str, following: str) -> int:
+        """Length of the tail of ``previous`` that ``following`` starts with"""
+        longest = min(len(previous), len(following), self.max_overlap)
+        for size in range(longest, self.min_overlap - 1, -1):
+            if following.startswith(previous[-size:]):
+                return size
+        return 0
+
+    def _drop_overlaps(self, docs_and_scores: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+        """Drop duplicate chunks and text repeated between neighbouring chunks of the same source"""
+        kept: List[Tuple[Document, float]] = []
+        originals: List[str] = []
+
+        for doc, score in docs_and_scores:
+            original = doc.page_content.strip()
+            if not original or original in originals:
+                continue
+
+            text = original
+            source = doc.metadata.get("source")
+            for (other, _), other_text in zip(kept, originals):
+                if other.metadata.get("source") != source:
+                    continue
+                # Either chunk may come first in the source document
+                head = self._overlap(other_text, text)
+                if head:
+                    text = text[head:].lstrip()
+                tail = self._overlap(text, other_text)
+                if tail:
+                    text = text[:-tail].rstrip()
+
+            if text:
+                kept.append((Document(page_content=text, metadata=doc.metadata), score))
+                originals.append(original)
+
+        return kept
+
+    def _mmr_order(self, docs_and_scores: List[Tuple[Document, float]]) -> List[Document]:
+        """Order documents by maximal marginal relevance
+
+        Relevance comes from the vector-store distance; redundancy is the term
+        overlap (Jaccard) with already selected documents.
+        """
+        candidates = [
+            (doc, 1.0 / (1.0 + max(float(score), 0.0)), self._terms(doc.page_content))
+            for doc, score in docs_and_scores
+        ]
+        selected: List[Tuple[Document, Set[str]]] = []
+
+        while candidates:
+            best_index, best_score = 0, float("-inf")
+            for index, (doc, relevance, terms) in enumerate(candidates):
+                redundancy = max(
+                    (len(terms & other) / len(terms | other) for _, other in selected if terms | other),
+                    default=0.0
+                )
+                score = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * redundancy
+                if score > best_score:
+                    best_index, best_score = index, score
+
+            doc, _, terms = candidates.pop(best_index)
+            selected.append((doc, terms))
+
+        return [doc for doc, _ in selected]
+
+    def _relevant_sentences(self, question_terms: Set[str], text: str) -> List[Tuple[int, str, float]]:
+        """Split text into sentences scored by query-term overlap, best first"""
+        sentences = [sentence.strip() for sentence in SENTENCE_PATTERN.split(text) if sentence.strip()]
+        scored = [
+            (position, sentence, len(question_terms & self._terms(sentence)) / (len(question_terms) or 1))
+            for position, sentence in enumerate(sentences)
+        ]
+        relevant = [item for item in scored if item[2] > 0]
+        # A chunk the retriever matched purely semantically is kept in reading order
+        if not relevant:
+            return scored
+        return sorted(relevant, key=lambda item: item[2], reverse=True)
+
+    def build(self, question: str, docs_and_scores: List[Tuple[Document, float]]) -> List[Document]:
+        """Assemble prompt documents for a question within the token budget"""
+        question_terms = self._terms(question)
+        ordered = self._mmr_order(self._drop_overlaps(docs_and_scores))
+
+        remaining = self.token_budget
+        context_documents = []
+
+        for doc in ordered:
+            if remaining <= 0:
+                break
+
+            chosen = []
+            for position, sentence, _ in self._relevant_sentences(question_terms, doc.page_content):
+                tokens = self.count_tokens(sentence)
+                if tokens > remaining:
+                    continue
+                chosen.append((position, sentence))
+                remaining -= tokens
+
+            if chosen:
+                text = " ".join(sentence for _, sentence in sorted(chosen))
+                context_documents.append(Document(page_content=text, metadata=doc.metadata))
+
+        return context_documents
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get context builder configuration"""
+        return {
+            "token_budget": self.token_budget,
+            "mmr_lambda": self.mmr_lambda,
+            "tokenizer": self.encoding_name if self._encoding else "estimate"
+        }
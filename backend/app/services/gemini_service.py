@@ -1,27 +1,24 @@
-import google.generativeai as genai
 from typing import List, Dict, Any, Optional
 import logging
 from app.core.config import settings
+from app.services.llm_provider import LLMProvider, get_llm_provider
 
 logger = logging.getLogger(__name__)
 
 class GeminiService:
-    """Service for interacting with Google Gemini AI"""
+    """Service for interacting with Google Gemini AI (or the configured LLM provider)"""
     
-    def __init__(self):
+    def __init__(self, llm_provider: LLMProvider = None):
         self.model = None
+        self.llm_provider = llm_provider or get_llm_provider()
         self._initialize_gemini()
     
     def _initialize_gemini(self):
         """Initialize Gemini API"""
         try:
-            if not settings.GOOGLE_API_KEY:
-                logger.warning("GOOGLE_API_KEY not set. Gemini service will use mock responses.")
-                return
-            
-            genai.configure(api_key=settings.GOOGLE_API_KEY)
-            self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
-            logger.info("Gemini service initialized successfully")
+            self.model = self.llm_provider.generative_model()
+            if self.model is not None:
+                logger.info(f"Gemini service initialized successfully ({self.llm_provider.name} provider)")
             
         except Exception as e:
             logger.error(f"Failed to initialize Gemini: {e}")
@@ -45,7 +42,7 @@ class GeminiService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(prompt)
             return response.text.strip()
         except Exception as e:
             logger.error(f"Error generating search query: {e}")
@@ -75,7 +72,7 @@ class GeminiService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(prompt)
             # Parse JSON response
             import json
             return json.loads(response.text.strip())
@@ -118,7 +115,7 @@ class GeminiService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(prompt)
             import json
             result = json.loads(response.text.strip())
             return result.get("conflicts", [])
@@ -147,7 +144,7 @@ class GeminiService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(prompt)
             import json
             return json.loads(response.text.strip())
         except Exception as e:
@@ -181,7 +178,7 @@ class GeminiService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(prompt)
             import json
             return json.loads(response.text.strip())
         except Exception as e:
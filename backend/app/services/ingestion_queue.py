@@ -0,0 +1,409 @@
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Iterator
+import logging
+from app.core.config import settings
+from app.services.vectorstore_registry import DEFAULT_NAMESPACE
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running", "retrying")
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue is at its configured depth"""
+
+class IngestionError(Exception):
+    """Job failure; ``retryable=False`` fails the job without further attempts"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+class IngestionJobStore:
+    """Persistent ingestion job records in SQLite
+
+    Jobs survive restarts. Workers (threads, tasks or separate processes
+    sharing the file) claim jobs with a lease; a job whose worker died is
+    claimed again once its lease expires.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or settings.INGESTION_JOB_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    id TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    file_paths TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    error TEXT,
+                    worker_id TEXT,
+                    lease_expires_at REAL,
+                    next_attempt_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    kind TEXT NOT NULL DEFAULT 'ingest'
+                )
+                """
+            )
+            # Job files created before records had a kind
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(ingestion_jobs)")}
+            if "kind" not in columns:
+                connection.execute("ALTER TABLE ingestion_jobs ADD COLUMN kind TEXT NOT NULL DEFAULT 'ingest'")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_ingestion_jobs_status ON ingestion_jobs (status, next_attempt_at)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Autocommit connection per call; multi-statement updates use BEGIN IMMEDIATE
+        connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["file_paths"] = json.loads(job["file_paths"])
+        job["progress"] = json.loads(job["progress"])
+        return job
+
+    def create(self, file_paths: List[str], namespace: str, max_attempts: int, max_depth: int) -> Dict[str, Any]:
+        """Insert a queued job, or raise QueueFullError if ``max_depth`` active jobs exist"""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        progress = {"stage": "queued", "total_files": len(file_paths), "processed_files": 0, "failed_files": [], "chunks_added": 0}
+
+        with self._lock, self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            depth = connection.execute(
+                f"SELECT COUNT(*) FROM ingestion_jobs WHERE status IN ({','.join('?' * len(ACTIVE_STATUSES))})",
+                ACTIVE_STATUSES
+            ).fetchone()[0]
+            if depth >= max_depth:
+                connection.execute("ROLLBACK")
+                raise QueueFullError(f"Ingestion queue is full ({depth} active jobs)")
+
+            connection.execute(
+                """
+                INSERT INTO ingestion_jobs
+                    (id, namespace, file_paths, status, max_attempts, progress, next_attempt_at, created_at, updated_at)
+                VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)
+                """,
+                (job_id, namespace, json.dumps(file_paths), max_attempts, json.dumps(progress), now, now, now)
+            )
+            connection.execute("COMMIT")
+
+        return self.get(job_id)
+
+    def record(self, namespace: str, kind: str, progress: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Record work done on a namespace outside the queue (e.g. a rebuild) as a succeeded job
+
+        The API process's sync loop picks it up through ``completed_since`` and
+        reloads the namespace from disk.
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._connect() as connection:
+            connection.execute(
+                """
+                INSERT INTO ingestion_jobs
+                    (id, namespace, file_paths, status, attempts, max_attempts, progress, next_attempt_at, created_at, updated_at, kind)
+                VALUES (?, ?, '[]', 'succeeded', 1, 1, ?, ?, ?, ?, ?)
+                """,
+                (job_id, namespace, json.dumps(progress or {}), now, now, now, kind)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM ingestion_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def depth(self) -> int:
+        """Number of queued, retrying and running jobs"""
+        with self._connect() as connection:
+            return connection.execute(
+                f"SELECT COUNT(*) FROM ingestion_jobs WHERE status IN ({','.join('?' * len(ACTIVE_STATUSES))})",
+                ACTIVE_STATUSES
+            ).fetchone()[0]
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest runnable job (or one whose lease expired)"""
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # A job whose worker died on its last attempt is not run again
+            connection.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = 'failed', error = 'Worker stopped during the final attempt', worker_id = NULL, updated_at = ?
+                WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts
+                """,
+                (now, now)
+            )
+            row = connection.execute(
+                """
+                SELECT id FROM ingestion_jobs
+                WHERE (status IN ('queued', 'retrying') AND next_attempt_at <= ?)
+                   OR (status = 'running' AND lease_expires_at < ?)
+                ORDER BY created_at
+                LIMIT 1
+                """,
+                (now, now)
+            ).fetchone()
+            if not row:
+                connection.execute("COMMIT")
+                return None
+
+            connection.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = 'running', attempts = attempts + 1, worker_id = ?, lease_expires_at = ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (worker_id, now + lease_seconds, now, row["id"])
+            )
+            connection.execute("COMMIT")
+
+        return self.get(row["id"])
+
+    def update_progress(self, job_id: str, progress: Dict[str, Any], lease_seconds: float):
+        """Record progress and extend the job's lease"""
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE ingestion_jobs SET progress = ?, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(progress), now + lease_seconds, now, job_id)
+            )
+
+    def finish(self, job_id: str, status: str, error: str = None, next_attempt_at: float = None):
+        """Mark a job succeeded, failed, or retrying at ``next_attempt_at``"""
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = ?, error = ?, worker_id = NULL, lease_expires_at = NULL,
+                    next_attempt_at = COALESCE(?, next_attempt_at), updated_at = ?
+                WHERE id = ?
+                """,
+                (status, error, next_attempt_at, now, job_id)
+            )
+
+    def completed_since(self, since: float) -> List[Dict[str, Any]]:
+        """Jobs that succeeded after ``since`` (used to refresh other processes' indexes)"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT * FROM ingestion_jobs WHERE status = 'succeeded' AND updated_at > ? ORDER BY updated_at",
+                (since,)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as connection:
+            rows = connection.execute("SELECT status, COUNT(*) FROM ingestion_jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+def ingest_files(job: Dict[str, Any], report: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+    """Load, index and save a job's files in its namespace, reporting progress per stage
+
+    Content the namespace already holds is skipped, and content already
+    embedded for another namespace is linked in with its existing vectors.
+    """
+    from app.services.content_store import content_store
+    from app.services.rag_pipeline import rag_pipeline
+
+    namespace = job["namespace"]
+    dedup = settings.CONTENT_DEDUP_ENABLED
+    progress = dict(job["progress"], stage="loading", processed_files=0, failed_files=[], deduplicated_files=[], reused_files=[])
+    report(progress)
+
+    batches = []
+    contents = []
+    for file_path in job["file_paths"]:
+        if not Path(file_path).exists():
+            progress["failed_files"].append(file_path)
+        else:
+            content_sha256 = content_store.sha256_of(file_path)
+            if dedup and rag_pipeline.content_index.is_linked(namespace, content_sha256):
+                progress["deduplicated_files"].append(file_path)
+            else:
+                embedded, reused = rag_pipeline.prepare_content(
+                    content_sha256, lambda path=file_path: rag_pipeline.add_documents_from_files([path]), namespace
+                )
+                if embedded:
+                    batches.append(embedded)
+                    contents.append(content_sha256)
+                    if reused:
+                        progress["reused_files"].append(file_path)
+                else:
+                    progress["failed_files"].append(file_path)
+        progress["processed_files"] += 1
+        report(progress)
+
+    if not batches:
+        if progress["deduplicated_files"]:
+            progress["stage"] = "done"
+            progress["chunks_added"] = 0
+            return progress
+        raise IngestionError("No documents could be loaded", retryable=False)
+
+    progress["stage"] = "indexing"
+    report(progress)
+    progress["chunks_added"] = rag_pipeline.add_embedded(batches, namespace, contents=contents)
+
+    progress["stage"] = "saving"
+    report(progress)
+    rag_pipeline.save_vectorstore(namespace=namespace)
+    if dedup:
+        for content_sha256 in contents:
+            rag_pipeline.content_index.link(namespace, content_sha256)
+
+    progress["stage"] = "done"
+    return progress
+
+class IngestionQueue:
+    """Bounded, persistent ingestion queue with a pool of async workers
+
+    ``submit`` raises QueueFullError once ``max_depth`` jobs are active (the
+    upload endpoint turns that into a 429). Workers run jobs off the event
+    loop; a failed attempt is retried with exponential backoff and jitter up
+    to ``max_attempts``. The same queue can be served by ``start()`` inside the
+    API process or by separate ``ingestion_worker.py`` processes.
+    """
+
+    def __init__(
+        self,
+        store: IngestionJobStore = None,
+        workers: int = None,
+        max_depth: int = None,
+        max_attempts: int = None,
+        backoff_seconds: float = None,
+        lease_seconds: float = None,
+        poll_seconds: float = None,
+        handler: Callable[[Dict[str, Any], Callable], Dict[str, Any]] = None
+    ):
+        self._store = store
+        self.workers = workers or settings.INGESTION_WORKERS
+        self.max_depth = max_depth or settings.INGESTION_MAX_QUEUE_DEPTH
+        self.max_attempts = max_attempts or settings.INGESTION_MAX_ATTEMPTS
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else settings.INGESTION_RETRY_BACKOFF_SECONDS
+        self.lease_seconds = lease_seconds or settings.INGESTION_LEASE_SECONDS
+        self.poll_seconds = poll_seconds or settings.INGESTION_POLL_SECONDS
+        self.handler = handler or ingest_files
+        self.worker_prefix = uuid.uuid4().hex[:8]
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def store(self) -> IngestionJobStore:
+        # Opened on first use so importing the router does not touch the filesystem
+        if self._store is None:
+            self._store = IngestionJobStore()
+        return self._store
+
+    def has_capacity(self) -> bool:
+        return self.store.depth() < self.max_depth
+
+    def submit(self, file_paths: List[str], namespace: str = DEFAULT_NAMESPACE) -> Dict[str, Any]:
+        """Persist a job for the files and wake a worker"""
+        job = self.store.create(file_paths, namespace, self.max_attempts, self.max_depth)
+        if self._wakeup:
+            # submit() may run in a thread; the event belongs to the workers' loop
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        logger.info(f"Queued ingestion job {job['id']} with {len(file_paths)} files for namespace {namespace}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def _backoff(self, attempts: int) -> float:
+        delay = self.backoff_seconds * (2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _run(self, job: Dict[str, Any]):
+        """Run one claimed job to completion or failure (in a worker thread)"""
+        def report(progress: Dict[str, Any]):
+            self.store.update_progress(job["id"], progress, self.lease_seconds)
+
+        try:
+            progress = self.handler(job, report)
+            report(progress)
+            self.store.finish(job["id"], "succeeded")
+            logger.info(f"Ingestion job {job['id']} succeeded")
+        except Exception as e:
+            retryable = getattr(e, "retryable", True)
+            if retryable and job["attempts"] < job["max_attempts"]:
+                delay = self._backoff(job["attempts"])
+                self.store.finish(job["id"], "retrying", str(e), time.time() + delay)
+                logger.warning(f"Ingestion job {job['id']} attempt {job['attempts']} failed: {e}, retrying in {delay:.1f}s")
+            else:
+                self.store.finish(job["id"], "failed", str(e))
+                logger.error(f"Ingestion job {job['id']} failed: {e}")
+
+    async def _worker(self, index: int):
+        worker_id = f"{self.worker_prefix}-{index}"
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim, worker_id, self.lease_seconds)
+                if job:
+                    await asyncio.to_thread(self._run, job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker {worker_id} error: {e}")
+
+            # Idle: wait for a submit in this process or poll for jobs from others
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                self._wakeup.clear()
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, workers: int = None):
+        """Start the worker pool on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(workers or self.workers)]
+        logger.info(f"Started {len(self._tasks)} ingestion workers")
+
+    async def stop(self):
+        """Stop the worker pool; a job interrupted mid-run is picked up again after its lease expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": settings.INGESTION_MODE,
+            "workers": len(self._tasks),
+            "depth": self.store.depth(),
+            "max_depth": self.max_depth,
+            "jobs": self.store.counts()
+        }
+
+# Global ingestion queue instance
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,195 @@
+import re
+from dataclasses import dataclass
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import logging
+from langchain_core.documents import Document
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+SENTENCE_END = re.compile(r"(?<! v\.)(?<=[.!?;])\s+(?=[A-Z(\"'\[])")
+
+# Boundaries between the parts of an opinion; the name is stored as the chunk's "division"
+DIVISION_PATTERNS = [
+    ("syllabus", re.compile(r"^\s*syllabus\b", re.IGNORECASE)),
+    ("opinion", re.compile(r"^\s*(opinion(\s+of\s+the\s+court)?\s*$|((chief\s+)?justice|judge)\s+[\w.' -]{1,60}\bdelivered the opinion\b)", re.IGNORECASE)),
+    ("concurrence", re.compile(r"^\s*(((chief\s+)?justice|judge)\s+[\w.' -]{1,60},?\s+(with whom .{0,120})?concurring|concurring(\s+opinion)?\s*$|concurrence\s*$)", re.IGNORECASE)),
+    ("dissent", re.compile(r"^\s*(((chief\s+)?justice|judge)\s+[\w.' -]{1,60},?\s+(with whom .{0,120})?dissenting|dissenting(\s+opinion)?\s*$|dissent\s*$)", re.IGNORECASE)),
+    ("footnotes", re.compile(r"^\s*(foot\s?notes|notes)\s*:?\s*$", re.IGNORECASE)),
+]
+HEADING_PATTERNS = [
+    re.compile(r"^\s*(section|sec\.|§+|article|art\.|part|chapter|title|rule)\s*[\dIVXLC]+[A-Za-z]?(\.|:|\s|$)", re.IGNORECASE),
+    re.compile(r"^\s*[IVXLC]+\.(\s|$)"),
+    re.compile(r"^\s*[A-Z]\.\s+[A-Z]"),
+    re.compile(r"^\s*\d+(\.\d+)*\.\s+[A-Z]"),
+]
+FOOTNOTE_PATTERN = re.compile(r"^\s*(\[\d+\]|\d+\)|FN\d+\.?|\*\d+)\s")
+
+@dataclass
+class _Span:
+    start: int
+    end: int
+    division: str
+    section: str
+
+class LegalStructureSplitter:
+    """Split legal text at its structural boundaries, recording character offsets
+
+    One pass over the paragraphs of each document detects syllabus, opinion,
+    concurrence, dissent and footnote divisions, headings and numbered
+    sections, and footnotes. Chunks never cross a section boundary; within a
+    section whole paragraphs are packed up to ``chunk_size`` characters, and
+    paragraphs that are too long are cut at sentence ends. Each chunk is an
+    exact ``[start_offset, end_offset)`` span of the source text, with
+    ``chunk_overlap`` (default none) characters repeated between neighbours.
+
+    Exposes ``split_text``/``split_documents`` like LangChain's splitters.
+    """
+
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = 0, min_chunk_size: int = 100):
+        self.chunk_size = chunk_size or settings.CHUNK_SIZE
+        self.chunk_overlap = chunk_overlap
+        self.min_chunk_size = min_chunk_size
+
+    @staticmethod
+    def _paragraphs(text: str) -> Iterator[Tuple[int, int]]:
+        """Yield (start, end) of non-blank paragraphs"""
+        position = 0
+        for match in PARAGRAPH_BREAK.finditer(text):
+            if text[position:match.start()].strip():
+                yield position, match.start()
+            position = match.end()
+        if text[position:].strip():
+            yield position, len(text)
+
+    @staticmethod
+    def _classify(first_line: str) -> Tuple[Optional[str], bool, bool]:
+        """Return (division, is_heading, is_footnote) for a paragraph's first line"""
+        for division, pattern in DIVISION_PATTERNS:
+            if pattern.match(first_line):
+                return division, True, False
+        if FOOTNOTE_PATTERN.match(first_line):
+            return None, False, True
+        if any(pattern.match(first_line) for pattern in HEADING_PATTERNS):
+            return None, True, False
+        # Short all-caps lines ("ARGUMENT", "STATEMENT OF FACTS")
+        stripped = first_line.strip()
+        if 3 <= len(stripped) <= 80 and stripped.isupper() and not stripped.endswith(","):
+            return None, True, False
+        return None, False, False
+
+    def _sentence_cuts(self, text: str, start: int, end: int, lead: int = 0) -> Iterator[Tuple[int, int]]:
+        """Cut a paragraph into spans of at most ``chunk_size`` at sentence (or word) ends
+
+        The first span is shortened by ``lead`` characters already in the chunk.
+        """
+        while end - start > self.chunk_size - lead:
+            limit = start + self.chunk_size - lead
+            cut = None
+            for match in SENTENCE_END.finditer(text, start + self.min_chunk_size, limit):
+                cut = match.start()
+            if cut is None:
+                space = text.rfind(" ", start + self.min_chunk_size, limit)
+                cut = space if space > start else limit
+            yield start, cut
+            lead = 0
+            start = cut
+            while start < end and text[start].isspace():
+                start += 1
+        if start < end:
+            yield start, end
+
+    def iter_spans(self, text: str) -> Iterator[_Span]:
+        """Single pass over ``text`` yielding chunk spans in order"""
+        division = "body"
+        section = ""
+        chunk_start = chunk_end = None
+        chunk_has_body = False
+        chunk_division, chunk_section = division, section
+
+        for para_start, para_end in self._paragraphs(text):
+            first_line = text[para_start:para_end].lstrip().split("\n", 1)[0]
+            new_division, is_heading, is_footnote = self._classify(first_line)
+            heading_only = is_heading and para_end - para_start < self.min_chunk_size
+
+            boundary = is_heading or is_footnote
+            if new_division:
+                division = new_division
+            if is_heading:
+                section = first_line.strip()[:120]
+            elif is_footnote:
+                section = first_line.strip().split()[0]
+
+            lead = 0
+            if chunk_start is not None:
+                if chunk_has_body and (boundary or para_end - chunk_start > self.chunk_size):
+                    yield _Span(chunk_start, chunk_end, chunk_division, chunk_section)
+                    chunk_start = None
+                else:
+                    # Headings without body text are carried into the section they introduce
+                    lead = para_start - chunk_start
+                    if boundary:
+                        chunk_division, chunk_section = division, section
+
+            for piece_start, piece_end in self._sentence_cuts(text, para_start, para_end, lead):
+                if chunk_start is None:
+                    chunk_start = piece_start
+                    chunk_division, chunk_section = division, section
+                    chunk_has_body = False
+                elif piece_end - chunk_start > self.chunk_size:
+                    yield _Span(chunk_start, chunk_end, chunk_division, chunk_section)
+                    chunk_start = piece_start
+                    chunk_has_body = False
+                chunk_end = piece_end
+                chunk_has_body = chunk_has_body or not heading_only
+
+        if chunk_start is not None:
+            yield _Span(chunk_start, chunk_end, chunk_division, chunk_section)
+
+    def _with_overlap(self, text: str, span: _Span) -> int:
+        """Start offset of a chunk extended back by ``chunk_overlap`` characters (to a word start)"""
+        if not self.chunk_overlap:
+            return span.start
+        start = max(0, span.start - self.chunk_overlap)
+        space = text.find(" ", start, span.start)
+        return space + 1 if space != -1 else start
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[self._with_overlap(text, span):span.end] for span in self.iter_spans(text)]
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Split documents; chunk metadata adds offsets into the source ``page_content``"""
+        chunks = []
+        for document in documents:
+            text = document.page_content
+            for index, span in enumerate(self.iter_spans(text)):
+                start = self._with_overlap(text, span)
+                metadata: Dict[str, Any] = {
+                    **document.metadata,
+                    "start_offset": start,
+                    "end_offset": span.end,
+                    "chunk_index": index,
+                    "division": span.division,
+                    "section": span.section
+                }
+                chunks.append(Document(page_content=text[start:span.end], metadata=metadata))
+        return chunks
+
+def create_text_splitter(name: str = None):
+    """Create the configured text splitter (legal structure-aware, or LangChain's recursive splitter)"""
+    name = (name or settings.TEXT_SPLITTER).lower()
+
+    if name == "recursive":
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        return RecursiveCharacterTextSplitter(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            separators=["\n\n", "\n", ". ", " ", ""],
+            add_start_index=True
+        )
+    if name != "legal":
+        logger.warning(f"Unknown text splitter {name}, using legal")
+
+    return LegalStructureSplitter()
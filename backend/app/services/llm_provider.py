@@ -0,0 +1,353 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
+import logging
+from langchain_core.callbacks import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CASE_NAME_PATTERN = re.compile(r"\b([A-Z][A-Za-z.&']+(?: [A-Z][A-Za-z.&']+)*) v\. ([A-Z][A-Za-z.&']+(?: [A-Z][A-Za-z.&']+)*)")
+# Do not end a sentence at the "v." of a case name
+SENTENCE_PATTERN = re.compile(r"(?<! v\.)(?<=[.!?])\s+")
+CASE_NAME_PREFIXES = {"In", "See", "The", "Cf.", "And", "But"}
+
+class LLMProvider(ABC):
+    """Source of the LLM clients used by the RAG pipeline and GeminiService
+
+    ``chat_model`` is the LangChain chat model behind chains and agents;
+    ``generative_model`` exposes the ``generate_content``/``generate_content_async``
+    interface of ``google.generativeai.GenerativeModel`` used by GeminiService.
+    Either returns None when the provider is not configured.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def chat_model(self) -> Optional[BaseChatModel]:
+        ...
+
+    @abstractmethod
+    def generative_model(self):
+        ...
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini via langchain-google-genai and google-generativeai"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str = None, model_name: str = None):
+        self.api_key = api_key or settings.GOOGLE_API_KEY
+        self.model_name = model_name or settings.GEMINI_MODEL
+
+    def chat_model(self) -> Optional[BaseChatModel]:
+        if not self.api_key:
+            logger.warning("No Google API key provided, RAG pipeline will have limited functionality")
+            return None
+
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=self.model_name,
+            google_api_key=self.api_key,
+            temperature=0.1
+        )
+
+    def generative_model(self):
+        if not self.api_key:
+            logger.warning("GOOGLE_API_KEY not set. Gemini service will use mock responses.")
+            return None
+
+        import google.generativeai as genai
+
+        genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel(self.model_name)
+
+class LatencyModel:
+    """Seeded latency distribution for the fake LLM
+
+    ``distribution`` is one of fixed, uniform, normal or lognormal; ``mean_ms``
+    and ``jitter_ms`` are the location and spread. Time to first token is
+    sampled per call and each further token costs ``1 / tokens_per_second``.
+    """
+
+    DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(
+        self,
+        distribution: str = None,
+        mean_ms: float = None,
+        jitter_ms: float = None,
+        tokens_per_second: float = None,
+        seed: int = None
+    ):
+        self.distribution = (distribution or settings.FAKE_LLM_LATENCY_DISTRIBUTION).lower()
+        if self.distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+        self.mean_ms = mean_ms if mean_ms is not None else settings.FAKE_LLM_LATENCY_MS
+        self.jitter_ms = jitter_ms if jitter_ms is not None else settings.FAKE_LLM_LATENCY_JITTER_MS
+        self.tokens_per_second = tokens_per_second if tokens_per_second is not None else settings.FAKE_LLM_TOKENS_PER_SECOND
+        self._random = random.Random(seed if seed is not None else settings.FAKE_LLM_SEED)
+        self._lock = threading.Lock()
+
+    def first_token_seconds(self) -> float:
+        """Sample the time to first token"""
+        with self._lock:
+            if self.distribution == "fixed":
+                ms = self.mean_ms
+            elif self.distribution == "uniform":
+                ms = self._random.uniform(self.mean_ms - self.jitter_ms, self.mean_ms + self.jitter_ms)
+            elif self.distribution == "normal":
+                ms = self._random.gauss(self.mean_ms, self.jitter_ms)
+            else:
+                # Parameterized so the median is mean_ms; jitter_ms widens the tail
+                sigma = self.jitter_ms / self.mean_ms if self.mean_ms else 0.0
+                ms = self.mean_ms * self._random.lognormvariate(0.0, sigma)
+        return max(ms, 0.0) / 1000
+
+    def token_seconds(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+class FakeResponder:
+    """Deterministic responses to the prompts this backend sends
+
+    The output depends only on the prompt. Analysis, conflict, citation and
+    drafting prompts get valid JSON in the shape GeminiService parses; agent
+    prompts get a final ReAct answer; anything else (QA) gets an answer built
+    from the question and the first context sentence.
+    """
+
+    @staticmethod
+    def _digest(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+
+    @staticmethod
+    def _field(prompt: str, label: str) -> str:
+        match = re.search(rf"{label}:\s*(.*)", prompt)
+        return match.group(1).strip() if match else ""
+
+    @staticmethod
+    def _case_names(text: str) -> List[str]:
+        names = []
+        for plaintiff, defendant in CASE_NAME_PATTERN.findall(text):
+            words = plaintiff.split()
+            while len(words) > 1 and words[0] in CASE_NAME_PREFIXES:
+                words.pop(0)
+            name = f"{' '.join(words)} v. {defendant}"
+            if name not in names:
+                names.append(name)
+        return names
+
+    @staticmethod
+    def _first_sentence(text: str) -> str:
+        text = " ".join(text.split())
+        return SENTENCE_PATTERN.split(text, maxsplit=1)[0][:300] if text else ""
+
+    def respond(self, prompt: str) -> str:
+        if "Analyze this legal document" in prompt:
+            return json.dumps(self._analysis(prompt))
+        if "Identify conflicts" in prompt:
+            return json.dumps(self._conflicts(prompt))
+        if "legal citation expert" in prompt:
+            return json.dumps(self._citation(prompt))
+        if "legal writing expert" in prompt:
+            return json.dumps(self._document(prompt))
+        if "optimized legal search query" in prompt:
+            return self._field(prompt, "User Query")
+        if "Do I need to use a tool?" in prompt:
+            question = prompt.rsplit("New input:", 1)[-1].strip().splitlines()[0] if "New input:" in prompt else ""
+            return f"Do I need to use a tool? No\nAI: {self._answer(question, '', prompt)}"
+        return self._qa(prompt)
+
+    def _analysis(self, prompt: str) -> Dict[str, Any]:
+        content = prompt.split("Document Content:", 1)[-1].split("Analysis Type:", 1)[0]
+        analysis_type = self._field(prompt, "Analysis Type") or "general"
+        return {
+            "key_holdings": [self._first_sentence(content) or "No holding identified"],
+            "legal_issues": [analysis_type.replace("_", " ").title()],
+            "precedents_mentioned": self._case_names(content)[:5],
+            "legal_principles": [f"Principle {self._digest(content)}"],
+            "summary": f"{analysis_type} analysis of a {len(content.split())}-word document."
+        }
+
+    def _conflicts(self, prompt: str) -> Dict[str, Any]:
+        case_ids = re.findall(r"^\s*Case (\S+):", prompt, re.MULTILINE)
+        conflicts = []
+        # Flag every other adjacent pair so results are stable but not empty
+        for first, second in list(zip(case_ids, case_ids[1:]))[::2]:
+            conflicts.append({
+                "doc1": first,
+                "doc2": second,
+                "conflict_type": "different_interpretation",
+                "description": f"{first} and {second} interpret the same provision differently",
+                "severity": "medium"
+            })
+        return {"conflicts": conflicts}
+
+    def _citation(self, prompt: str) -> Dict[str, Any]:
+        citation = self._field(prompt, "Citation")
+        return {
+            "formatted_citation": " ".join(citation.split()),
+            "citation_errors": [] if CASE_NAME_PATTERN.search(citation) else ["Case name not recognized"]
+        }
+
+    def _document(self, prompt: str) -> Dict[str, Any]:
+        template_type = re.search(r"Generate a (\S+) document", prompt)
+        template_type = template_type.group(1) if template_type else "document"
+        arguments = self._field(prompt, "Key Arguments")
+        cases = self._field(prompt, "Supporting Cases")
+        body = "\n\n".join([
+            template_type.upper(),
+            f"Case Information: {self._field(prompt, 'Case Information')}",
+            f"ARGUMENT\n\n{arguments or 'No arguments provided.'}",
+            f"AUTHORITIES\n\n{cases or 'None cited.'}"
+        ])
+        return {
+            "document": body,
+            "suggestions": ["Add more supporting precedents"] if not cases else [],
+            "word_count": len(body.split())
+        }
+
+    def _answer(self, question: str, context: str, prompt: str) -> str:
+        evidence = self._first_sentence(context)
+        answer = f"Regarding '{question or 'the question'}': "
+        answer += evidence if evidence else "no supporting context was provided."
+        return f"{answer} [ref {self._digest(prompt)}]"
+
+    def _qa(self, prompt: str) -> str:
+        # The "stuff" QA prompt is the system context followed by the question
+        context, _, question = prompt.rpartition("\n")
+        if "----------------" in context:
+            context = context.split("----------------", 1)[1]
+        return self._answer(question.strip(), context, prompt)
+
+class FakeChatModel(BaseChatModel):
+    """Local LangChain chat model with deterministic output and simulated latency"""
+
+    latency: Any
+    responder: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-legal"
+
+    @staticmethod
+    def _prompt(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", text)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        text = self.responder.respond(self._prompt(messages))
+        time.sleep(self.latency.first_token_seconds() + self.latency.token_seconds() * len(self._tokens(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        text = self.responder.respond(self._prompt(messages))
+        await asyncio.sleep(self.latency.first_token_seconds() + self.latency.token_seconds() * len(self._tokens(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        text = self.responder.respond(self._prompt(messages))
+        time.sleep(self.latency.first_token_seconds())
+        for index, token in enumerate(self._tokens(text)):
+            if index:
+                time.sleep(self.latency.token_seconds())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        text = self.responder.respond(self._prompt(messages))
+        await asyncio.sleep(self.latency.first_token_seconds())
+        for index, token in enumerate(self._tokens(text)):
+            if index:
+                await asyncio.sleep(self.latency.token_seconds())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+class FakeGenerativeModel:
+    """Stand-in for ``google.generativeai.GenerativeModel`` backed by the fake responder"""
+
+    def __init__(self, latency: LatencyModel, responder: FakeResponder):
+        self.latency = latency
+        self.responder = responder
+
+    def _delay(self, text: str) -> float:
+        return self.latency.first_token_seconds() + self.latency.token_seconds() * len(text.split())
+
+    def generate_content(self, prompt: str):
+        text = self.responder.respond(prompt)
+        time.sleep(self._delay(text))
+        return SimpleNamespace(text=text)
+
+    async def generate_content_async(self, prompt: str):
+        text = self.responder.respond(prompt)
+        await asyncio.sleep(self._delay(text))
+        return SimpleNamespace(text=text)
+
+class FakeProvider(LLMProvider):
+    """Offline provider for load and latency testing (LLM_PROVIDER=fake)"""
+
+    name = "fake"
+
+    def __init__(self, latency: LatencyModel = None):
+        self.latency = latency or LatencyModel()
+        self.responder = FakeResponder()
+
+    def chat_model(self) -> BaseChatModel:
+        return FakeChatModel(latency=self.latency, responder=self.responder)
+
+    def generative_model(self) -> FakeGenerativeModel:
+        return FakeGenerativeModel(self.latency, self.responder)
+
+def get_llm_provider(name: str = None) -> LLMProvider:
+    """Create the configured LLM provider"""
+    name = (name or settings.LLM_PROVIDER).lower()
+
+    if name == "fake":
+        logger.info("Using the local fake LLM provider")
+        return FakeProvider()
+    if name != "gemini":
+        logger.warning(f"Unknown LLM provider {name}, using gemini")
+
+    return GeminiProvider()
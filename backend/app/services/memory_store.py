@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class MemoryBackend(ABC):
+    """Persistence backend for session conversation histories"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        ...
+
+    @abstractmethod
+    def save(self, session_id: str, turns: List[Dict[str, str]], ttl_seconds: int):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+class InProcessMemoryBackend(MemoryBackend):
+    """No external persistence; histories live only in the store's LRU"""
+
+    def load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        return None
+
+    def save(self, session_id: str, turns: List[Dict[str, str]], ttl_seconds: int):
+        pass
+
+    def delete(self, session_id: str):
+        pass
+
+class RedisMemoryBackend(MemoryBackend):
+    """Persist histories in Redis (or any Redis-compatible server) with key expiry"""
+
+    def __init__(self, url: str = None, key_prefix: str = "rag:memory:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+        self.key_prefix = key_prefix
+
+    def load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        data = self.client.get(self.key_prefix + session_id)
+        return json.loads(data) if data else None
+
+    def save(self, session_id: str, turns: List[Dict[str, str]], ttl_seconds: int):
+        self.client.setex(self.key_prefix + session_id, ttl_seconds, json.dumps(turns))
+
+    def delete(self, session_id: str):
+        self.client.delete(self.key_prefix + session_id)
+
+class SessionMemoryStore:
+    """Session-keyed, windowed conversation histories with LRU and TTL eviction
+
+    Each session keeps its last ``window_turns`` question/answer pairs. At most
+    ``max_sessions`` histories are held in process; idle sessions expire after
+    ``ttl_seconds``. A backend can persist histories beyond the process.
+    """
+
+    def __init__(
+        self,
+        backend: MemoryBackend = None,
+        window_turns: int = None,
+        max_sessions: int = None,
+        ttl_seconds: int = None
+    ):
+        self.backend = backend or InProcessMemoryBackend()
+        self.window_turns = window_turns or settings.MEMORY_WINDOW_TURNS
+        self.max_sessions = max_sessions or settings.MEMORY_MAX_SESSIONS
+        self.ttl_seconds = ttl_seconds or settings.MEMORY_SESSION_TTL_SECONDS
+
+        # session_id -> (last_access, turns)
+        self._sessions: "OrderedDict[str, Tuple[float, List[Dict[str, str]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _evict(self, now: float):
+        """Drop expired sessions, then least recently used ones over capacity (caller holds the lock)"""
+        expired = [
+            session_id for session_id, (last_access, _) in self._sessions.items()
+            if now - last_access > self.ttl_seconds
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
+            self.evictions += 1
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        """Get the windowed history of a session, oldest turn first"""
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.get(session_id)
+            if entry:
+                self._sessions[session_id] = (now, entry[1])
+                self._sessions.move_to_end(session_id)
+                return list(entry[1])
+
+        try:
+            turns = self.backend.load(session_id) or []
+        except Exception as e:
+            logger.warning(f"Could not load memory for session {session_id}: {e}")
+            turns = []
+
+        if turns:
+            with self._lock:
+                self._sessions[session_id] = (now, turns[-self.window_turns:])
+                self._evict(now)
+
+        return turns[-self.window_turns:]
+
+    def append_turn(self, session_id: str, question: str, answer: str):
+        """Record a question/answer pair for a session"""
+        turns = self.get_history(session_id)
+        turns.append({"question": question, "answer": answer})
+        turns = turns[-self.window_turns:]
+        now = time.monotonic()
+
+        with self._lock:
+            self._sessions[session_id] = (now, turns)
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+        try:
+            self.backend.save(session_id, turns, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Could not persist memory for session {session_id}: {e}")
+
+    def clear(self, session_id: str):
+        """Clear a single session's history"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+        try:
+            self.backend.delete(session_id)
+        except Exception as e:
+            logger.warning(f"Could not delete memory for session {session_id}: {e}")
+
+    @staticmethod
+    def as_chat_history(turns: List[Dict[str, str]]) -> List[Tuple[str, str]]:
+        """Format turns for ConversationalRetrievalChain"""
+        return [(turn["question"], turn["answer"]) for turn in turns]
+
+    @staticmethod
+    def as_transcript(turns: List[Dict[str, str]]) -> str:
+        """Format turns for the conversational ReAct agent prompt"""
+        return "\n".join(f"Human: {turn['question']}\nAI: {turn['answer']}" for turn in turns)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get memory store statistics"""
+        return {
+            "backend": type(self.backend).__name__,
+            "active_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "window_turns": self.window_turns,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions
+        }
+
+def create_memory_backend(name: str = None) -> MemoryBackend:
+    """Create the configured memory backend, falling back to in-process storage"""
+    name = (name or settings.MEMORY_BACKEND).lower()
+
+    if name == "redis":
+        try:
+            return RedisMemoryBackend()
+        except Exception as e:
+            logger.warning(f"Could not initialize Redis memory backend: {e}, using in-process memory")
+
+    return InProcessMemoryBackend()
@@ -0,0 +1,273 @@
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import logging
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATES_FILE = "near_duplicates.sqlite"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+HASH_SHIFT = np.uint64(32)
+TOKEN_CACHE_SIZE = 200_000
+SHINGLE_MULTIPLIER = np.uint64(1_000_003)
+# Band keys are kept within SQLite's signed 64-bit integers
+BAND_KEY_MASK = np.uint64((1 << 62) - 1)
+
+# Metadata copied into a provenance record for each collapsed copy of a chunk
+PROVENANCE_KEYS = ("source", "page", "doc_id", "start_offset", "end_offset", "chunk_index", "division", "section", "content_sha256")
+
+class MinHasher:
+    """MinHash signatures of word shingles
+
+    Texts are lowercased and reduced to alphanumeric tokens, so differences in
+    punctuation, whitespace and pagination do not count. The fraction of equal
+    signature positions estimates the Jaccard similarity of two texts' shingle
+    sets. Permutations are seeded multiply-shift hashes, so signatures are
+    stable across processes and can be persisted. Integer arithmetic wraps
+    modulo 2**64 by design.
+    """
+
+    def __init__(self, num_perm: int = None, shingle_size: int = None, seed: int = 1):
+        self.num_perm = num_perm or settings.MINHASH_PERMUTATIONS
+        self.shingle_size = shingle_size or settings.NEAR_DUPLICATE_SHINGLE_SIZE
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, np.iinfo(np.int64).max, size=self.num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, np.iinfo(np.int64).max, size=self.num_perm, dtype=np.int64).astype(np.uint64)
+        # Legal vocabulary is small and repetitive; hashing each distinct token once saves most of the work
+        self._token_hashes: Dict[str, int] = {}
+
+    def _token_hash(self, token: str) -> int:
+        value = self._token_hashes.get(token)
+        if value is None:
+            value = zlib.crc32(token.encode("utf-8"))
+            if len(self._token_hashes) < TOKEN_CACHE_SIZE:
+                self._token_hashes[token] = value
+        return value
+
+    def shingle_hashes(self, text: str) -> Optional[np.ndarray]:
+        """Distinct hashes of the text's word shingles, or None if it is shorter than one shingle
+
+        Tokens are hashed once and each shingle's hash is a polynomial over its
+        tokens' hashes, computed for all shingles at once. Texts with fewer
+        than ``shingle_size`` tokens (separators, headings, symbols) have no
+        meaningful shingles and are never matched.
+        """
+        words = TOKEN_PATTERN.findall(text.lower())
+        values = list(map(self._token_hashes.get, words))
+        if None in values:
+            values = [self._token_hash(word) if value is None else value for word, value in zip(words, values)]
+        tokens = np.array(values, dtype=np.uint64)
+        width = self.shingle_size
+        if len(tokens) < width:
+            return None
+        count = len(tokens) - width + 1
+        hashes = tokens[:count].copy()
+        for offset in range(1, width):
+            hashes *= SHINGLE_MULTIPLIER
+            hashes += tokens[offset:offset + count]
+        return np.unique(hashes)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of the text, or None if it is too short to compare"""
+        shingles = self.shingle_hashes(text)
+        if shingles is None:
+            return None
+        permuted = np.multiply.outer(self._a, shingles)
+        permuted += self._b[:, None]
+        permuted >>= HASH_SHIFT
+        return permuted.min(axis=1).astype(np.uint32)
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        return float(np.mean(first == second))
+
+class NearDuplicateIndex:
+    """Persisted MinHash LSH index over one namespace's representative chunks
+
+    Signatures are split into ``bands`` bands; chunks sharing any band bucket
+    are candidates and are confirmed by estimated similarity against
+    ``threshold``. Lives in ``near_duplicates.sqlite`` beside the namespace's
+    FAISS index and is keyed by docstore id.
+    """
+
+    _open: Dict[str, "NearDuplicateIndex"] = {}
+    _open_lock = threading.Lock()
+
+    def __init__(self, path: str, hasher: MinHasher = None, bands: int = None, threshold: float = None):
+        self.path = Path(path)
+        self.hasher = hasher or MinHasher()
+        self.bands = bands or settings.LSH_BANDS
+        if self.hasher.num_perm % self.bands:
+            raise ValueError(f"{self.hasher.num_perm} permutations cannot be split into {self.bands} bands")
+        self.rows = self.hasher.num_perm // self.bands
+        self.threshold = threshold if threshold is not None else settings.NEAR_DUPLICATE_THRESHOLD
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str) -> "NearDuplicateIndex":
+        """Shared index for a file (one per namespace)"""
+        key = str(Path(path).resolve())
+        with cls._open_lock:
+            if key not in cls._open:
+                cls._open[key] = cls(key)
+            return cls._open[key]
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                "CREATE TABLE IF NOT EXISTS signatures (chunk_id TEXT PRIMARY KEY, signature BLOB NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER NOT NULL, band INTEGER NOT NULL, chunk_id TEXT NOT NULL, "
+                "PRIMARY KEY (bucket, band, chunk_id)) WITHOUT ROWID;"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        rows = signature.reshape(self.bands, self.rows).astype(np.uint64)
+        keys = rows[:, 0].copy()
+        for row in range(1, self.rows):
+            keys *= SHINGLE_MULTIPLIER
+            keys += rows[:, row]
+        return (keys & BAND_KEY_MASK).tolist()
+
+    def _stored_candidates(self, band_keys: List[Optional[List[int]]]) -> List[Dict[str, np.ndarray]]:
+        """Stored chunks sharing a bucket with each of a batch of signatures (None: none), in one query"""
+        candidates: List[Dict[str, np.ndarray]] = [{} for _ in band_keys]
+        with self._lock:
+            connection = self.connection
+            connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS probe (bucket INTEGER NOT NULL, band INTEGER NOT NULL, position INTEGER NOT NULL)"
+            )
+            try:
+                connection.executemany(
+                    "INSERT INTO probe (bucket, band, position) VALUES (?, ?, ?)",
+                    [
+                        (bucket, band, position)
+                        for position, keys in enumerate(band_keys) if keys is not None
+                        for band, bucket in enumerate(keys)
+                    ]
+                )
+                rows = connection.execute(
+                    "SELECT DISTINCT p.position, s.chunk_id, s.signature FROM probe p CROSS "
+                    "JOIN buckets b ON b.bucket = p.bucket AND b.band = p.band "
+                    "JOIN signatures s ON s.chunk_id = b.chunk_id"
+                ).fetchall()
+            finally:
+                connection.execute("DELETE FROM probe")
+                connection.commit()
+        for position, chunk_id, signature in rows:
+            candidates[position][chunk_id] = np.frombuffer(signature, dtype=np.uint32)
+        return candidates
+
+    def assign(
+        self,
+        signatures: List[Optional[np.ndarray]],
+        ids: List[str],
+        exists: Callable[[str], bool] = None
+    ) -> List[Optional[str]]:
+        """Representative id for each new chunk that duplicates another, else None
+
+        New chunks are compared with each other and, when ``exists`` is given,
+        with stored representatives for which it returns True (stale entries
+        for vectors no longer in the index are ignored). Chunks without a
+        signature are always kept.
+        """
+        batch_buckets: Dict[Tuple[int, int], List[int]] = {}
+        assigned: List[Optional[str]] = []
+        all_band_keys = [None if signature is None else self._band_keys(signature) for signature in signatures]
+        stored = self._stored_candidates(all_band_keys) if exists is not None else None
+
+        for position, signature in enumerate(signatures):
+            band_keys = all_band_keys[position]
+            if band_keys is None:
+                assigned.append(None)
+                continue
+            best_id, best_similarity = None, self.threshold
+
+            candidates = {
+                ids[other]: signatures[other]
+                for band, bucket in enumerate(band_keys)
+                for other in batch_buckets.get((band, bucket), [])
+            }
+            if stored is not None:
+                for chunk_id, candidate in stored[position].items():
+                    if exists(chunk_id):
+                        candidates.setdefault(chunk_id, candidate)
+
+            for chunk_id, candidate in candidates.items():
+                similarity = self.hasher.similarity(signature, candidate)
+                if similarity >= best_similarity:
+                    best_id, best_similarity = chunk_id, similarity
+
+            assigned.append(best_id)
+            if best_id is None:
+                for band, bucket in enumerate(band_keys):
+                    batch_buckets.setdefault((band, bucket), []).append(position)
+
+        return assigned
+
+    def add(self, items: List[Tuple[str, Optional[np.ndarray]]]):
+        """Index representative chunks by id (chunks without a signature are skipped)"""
+        items = [(chunk_id, signature) for chunk_id, signature in items if signature is not None]
+        if not items:
+            return
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO signatures (chunk_id, signature) VALUES (?, ?)",
+                [(chunk_id, signature.tobytes()) for chunk_id, signature in items]
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO buckets (band, bucket, chunk_id) VALUES (?, ?, ?)",
+                [
+                    (band, bucket, chunk_id)
+                    for chunk_id, signature in items
+                    for band, bucket in enumerate(self._band_keys(signature))
+                ]
+            )
+
+    def remove(self, chunk_ids: List[str]):
+        with self._lock, self.connection:
+            placeholders = ",".join("?" * len(chunk_ids))
+            rows = self.connection.execute(
+                f"SELECT chunk_id, signature FROM signatures WHERE chunk_id IN ({placeholders})", chunk_ids
+            ).fetchall()
+            self.connection.executemany(
+                "DELETE FROM buckets WHERE bucket = ? AND band = ? AND chunk_id = ?",
+                [
+                    (bucket, band, chunk_id)
+                    for chunk_id, signature in rows
+                    for band, bucket in enumerate(self._band_keys(np.frombuffer(signature, dtype=np.uint32)))
+                ]
+            )
+            self.connection.executemany("DELETE FROM signatures WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+
+    def clear(self):
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM buckets")
+            self.connection.execute("DELETE FROM signatures")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = self.connection.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+        return {"path": str(self.path), "representatives": count, "threshold": self.threshold}
+
+def provenance_record(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Where one copy of a chunk came from"""
+    return {key: metadata[key] for key in PROVENANCE_KEYS if key in metadata}
+
+def with_provenance(metadata: Dict[str, Any], duplicates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Representative metadata extended with provenance records for its collapsed copies"""
+    provenance = list(metadata.get("provenance") or [provenance_record(metadata)])
+    provenance.extend(provenance_record(duplicate) for duplicate in duplicates)
+    return {**metadata, "provenance": provenance, "duplicate_count": len(provenance) - 1}
@@ -1,28 +1,70 @@
-# LangChain imports for RAG pipeline
-from langchain.chains import RetrievalQA, ConversationalRetrievalChain
-from langchain_community.embeddings import HuggingFaceEmbeddings
+# LangChain imports for RAG pipeline. Chains, agents, loaders, Gemini and the
+# embedding model are imported where first used so that importing this
+# module (e.g. from init_db.py or a worker) stays cheap.
 from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredWordDocumentLoader
 from langchain_core.documents import Document
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.tools import Tool
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.utilities import WikipediaAPIWrapper
-from langchain.agents import initialize_agent, AgentType
-from langchain.memory import ConversationBufferMemory
-import google.generativeai as genai
-from typing import List, Dict, Any, Optional
+from langchain_core.prompts import format_document
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple, Callable, Set
 import logging
+import numpy as np
 import os
 import tempfile
+import threading
+import time
+import uuid
 from pathlib import Path
 import asyncio
+from dataclasses import dataclass, field
 from datetime import datetime
 from app.core.config import settings
+from app.services.agent_budget import AgentBudget, AgentBudgetExceeded, AgentMetrics, AgentTrace, EXECUTOR_STOPPED_OUTPUT
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.chunk_store import ChunkDocstore, ChunkStore, CHUNK_STORE_FILE, chunk_span, parent_spans
+from app.services.content_store import ContentIndex, ContentStore, ExtractedTextCache, CONTENT_INDEX_FILE, Embedded
+from app.services.context_builder import ContextBuilder
+from app.services.legal_splitter import create_text_splitter
+from app.services.llm_provider import LLMProvider, GeminiProvider, get_llm_provider
+from app.services.memory_store import SessionMemoryStore, create_memory_backend
+from app.services.near_duplicates import NearDuplicateIndex, NEAR_DUPLICATES_FILE, with_provenance
+from app.services.reference_index import reference_index, REFERENCE_TOOL_NAME, REFERENCE_TOOL_DESCRIPTION
+from app.services.tool_cache import tool_cache
+from app.services.vectorstore_registry import VectorStoreRegistry, DEFAULT_NAMESPACE
 
 logger = logging.getLogger(__name__)
 
+# Loader version per file type; bumping one re-parses only files of that type.
+# Plain text is read directly and not cached.
+PARSER_VERSIONS = {
+    ".pdf": "pypdf-1",
+    ".doc": "unstructured-1",
+    ".docx": "unstructured-1"
+}
+
+@dataclass
+class RetrievalContext:
+    """Per-request retrieval state shared by the stages of a single query
+    
+    The question is embedded once and searched once; the answer cache, the QA
+    chain and the API response all read from the same context.
+    """
+    question: str
+    k: int = 5
+    namespace: str = DEFAULT_NAMESPACE
+    corpus_version: int = 0
+    query_embedding: Optional[List[float]] = None
+    docs_and_scores: List[Tuple[Document, float]] = field(default_factory=list)
+    retrieved: bool = False
+    # Documents actually placed in the prompt (compressed to the token budget)
+    prompt_documents: Optional[List[Document]] = None
+    
+    @property
+    def documents(self) -> List[Document]:
+        return [doc for doc, _ in self.docs_and_scores]
+    
+    @property
+    def search_results(self) -> List[Dict[str, Any]]:
+        return LegalRAGPipeline._format_search_results(self.docs_and_scores)
+
 class GeminiLLM:
     """Wrapper for Google Gemini using ChatGoogleGenerativeAI"""
     
@@ -34,6 +76,8 @@ class GeminiLLM:
     def get_llm(self):
         """Get the LangChain LLM instance"""
         if self._llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            
             try:
                 self._llm = ChatGoogleGenerativeAI(
                     model=self.model_name,
@@ -48,53 +92,161 @@ class GeminiLLM:
 class LegalRAGPipeline:
     """Advanced Legal RAG Pipeline with LangChain"""
     
-    def __init__(self, google_api_key: str = None):
-        api_key = google_api_key or settings.GOOGLE_API_KEY
-        
-        if api_key:
-            # Use ChatGoogleGenerativeAI directly
-            try:
-                self.llm = ChatGoogleGenerativeAI(
-                    model="gemini-pro",
-                    google_api_key=api_key,
-                    temperature=0.1
-                )
-            except Exception as e:
-                logger.warning(f"Failed to initialize ChatGoogleGenerativeAI: {e}, falling back to custom wrapper")
-                self.llm = GeminiLLM(api_key=api_key).get_llm()
-        else:
-            logger.warning("No Google API key provided, RAG pipeline will have limited functionality")
-            self.llm = None
+    def __init__(self, google_api_key: str = None, llm_provider: LLMProvider = None):
+        # The LLM, embedding model, tools and chains are built on first use
+        self._api_key = google_api_key or settings.GOOGLE_API_KEY
+        self.llm_provider = llm_provider or (GeminiProvider(api_key=google_api_key) if google_api_key else get_llm_provider())
+        self._llm = None
+        self._llm_loaded = False
+        self._embeddings = None
+        self._embeddings_loaded = False
+        self._tools = None
+        self._init_lock = threading.RLock()
+        self.warmup_seconds: Optional[float] = None
             
-        # Initialize embeddings
+        # Chunks carry start/end offsets into their source document
+        self.text_splitter = create_text_splitter()
+        # Vector stores are namespaced per user or matter and loaded on first use
+        self.stores = VectorStoreRegistry(embeddings_provider=lambda: self.embeddings)
+        self._content_index: Optional[ContentIndex] = None
+        # Deleted chunk ids per namespace, filtered from searches until compaction
+        self._tombstones: Dict[str, Set[str]] = {}
+        # Extracted text of parsed uploads, so rebuilds skip PDF/DOCX parsing
+        self.text_cache = ExtractedTextCache() if settings.EXTRACTED_TEXT_CACHE_ENABLED else None
+        self.qa_chain = None
+        # Conversation histories are kept per session, not in the chains
+        self.memory_store = SessionMemoryStore(backend=create_memory_backend())
+        self.agent = None
+        # Steps, tokens and latency of agent runs, in place of the agent's verbose output
+        self.agent_metrics = AgentMetrics()
+        self.answer_cache = SemanticAnswerCache() if settings.ANSWER_CACHE_ENABLED else None
+        self.context_builder = ContextBuilder() if settings.CONTEXT_COMPRESSION_ENABLED else None
+    
+    @property
+    def llm(self):
+        """Chat model from the LLM provider, created on first access (None if unconfigured)"""
+        if not self._llm_loaded:
+            with self._init_lock:
+                if not self._llm_loaded:
+                    self._llm = self._create_llm()
+                    self._llm_loaded = True
+        return self._llm
+    
+    @llm.setter
+    def llm(self, value):
+        with self._init_lock:
+            self._llm = value
+            self._llm_loaded = True
+            self.qa_chain = None
+            self.agent = None
+    
+    def _create_llm(self):
+        try:
+            return self.llm_provider.chat_model()
+        except Exception as e:
+            if not isinstance(self.llm_provider, GeminiProvider):
+                raise
+            logger.warning(f"Failed to initialize ChatGoogleGenerativeAI: {e}, falling back to custom wrapper")
+            return GeminiLLM(api_key=self._api_key).get_llm()
+    
+    @property
+    def embeddings(self):
+        """Sentence-transformers embedding model, loaded on first access"""
+        if not self._embeddings_loaded:
+            with self._init_lock:
+                if not self._embeddings_loaded:
+                    self._embeddings = self._create_embeddings()
+                    self._embeddings_loaded = True
+        return self._embeddings
+    
+    @embeddings.setter
+    def embeddings(self, value):
+        with self._init_lock:
+            self._embeddings = value
+            self._embeddings_loaded = True
+    
+    def _create_embeddings(self):
         try:
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2"
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            
+            return HuggingFaceEmbeddings(
+                model_name=settings.EMBEDDING_MODEL
             )
         except Exception as e:
             logger.error(f"Failed to initialize embeddings: {e}")
-            self.embeddings = None
-            
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        self.vectorstore = None
-        self.qa_chain = None
-        self.conversational_chain = None
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
-        self.agent = None
-        self._setup_tools()
+            return None
+    
+    @property
+    def tools(self) -> list:
+        """Agent tools, set up on first access"""
+        if self._tools is None:
+            with self._init_lock:
+                if self._tools is None:
+                    self._setup_tools()
+        return self._tools
+    
+    def _ensure_chains(self):
+        """Build the QA chain and agent on first use once an LLM is available"""
+        if self.qa_chain is None and self.llm is not None:
+            with self._init_lock:
+                if self.qa_chain is None:
+                    self._setup_chains()
+    
+    def warm_up(self):
+        """Load the embedding model, LLM client, default index and chains ahead of the first request"""
+        started = time.perf_counter()
+        _ = self.embeddings
+        self.stores.get(DEFAULT_NAMESPACE)
+        self._ensure_chains()
+        self.warmup_seconds = time.perf_counter() - started
+        logger.info(f"RAG pipeline warmed up in {self.warmup_seconds:.2f}s")
+    
+    def get_readiness(self) -> Dict[str, Any]:
+        """Report which heavy components are loaded, without loading them"""
+        embeddings_ready = self._embeddings_loaded and self._embeddings is not None
+        return {
+            "ready": embeddings_ready and self.warmup_seconds is not None,
+            "embeddings_loaded": embeddings_ready,
+            "llm_provider": self.llm_provider.name,
+            "llm_configured": (
+                self._llm is not None if self._llm_loaded
+                else self.llm_provider.name != "gemini" or bool(self._api_key)
+            ),
+            "chains_initialized": self.qa_chain is not None,
+            "default_index_loaded": DEFAULT_NAMESPACE in self.stores.loaded_namespaces(),
+            "warmup_seconds": self.warmup_seconds
+        }
+    
+    @property
+    def vectorstore(self) -> Optional[FAISS]:
+        """Vector store of the default namespace"""
+        return self.stores.get(DEFAULT_NAMESPACE)
+    
+    @property
+    def corpus_version(self) -> int:
+        """Corpus version of the default namespace"""
+        return self.stores.version(DEFAULT_NAMESPACE)
         
     def _setup_tools(self):
         """Setup LangChain tools for the agent"""
-        # Wikipedia tool for legal research
-        wikipedia = WikipediaAPIWrapper()
-        wikipedia_tool = WikipediaQueryRun(api_wrapper=wikipedia)
+        from langchain_core.tools import Tool
+        from langchain_community.tools import WikipediaQueryRun
+        from langchain_community.utilities import WikipediaAPIWrapper
+        
+        # Wikipedia tool for legal research: the local reference index when one has been
+        # built, else live Wikipedia. Lookups are shared through the tool cache.
+        if reference_index.available:
+            lookup = reference_index.run
+            logger.info(f"Wikipedia tool uses the local reference index at {reference_index.path}")
+        else:
+            lookup = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper()).run
+        wikipedia_tool = Tool(
+            name=REFERENCE_TOOL_NAME,
+            description=REFERENCE_TOOL_DESCRIPTION,
+            func=lambda query: tool_cache.get_or_compute(
+                REFERENCE_TOOL_NAME, query, lambda: lookup(query), timeout=settings.AGENT_MAX_SECONDS
+            )
+        )
         
         # Legal case search tool
         def search_legal_cases(query: str) -> str:
@@ -102,7 +254,11 @@ class LegalRAGPipeline:
             try:
                 # This would integrate with legal databases like Westlaw, LexisNexis
                 # For demo, we'll use a mock implementation
-                return f"Found relevant legal cases for: {query}\n- Case 1: Sample Case Name\n- Case 2: Another Case Name"
+                return tool_cache.get_or_compute(
+                    "Legal Case Search", query,
+                    lambda: f"Found relevant legal cases for: {query}\n- Case 1: Sample Case Name\n- Case 2: Another Case Name",
+                    timeout=settings.AGENT_MAX_SECONDS
+                )
             except Exception as e:
                 return f"Error searching legal cases: {e}"
         
@@ -116,7 +272,11 @@ class LegalRAGPipeline:
         def search_statutes(query: str) -> str:
             """Search for statutes and regulations"""
             try:
-                return f"Found relevant statutes for: {query}\n- Statute 1: Sample Statute\n- Regulation 1: Sample Regulation"
+                return tool_cache.get_or_compute(
+                    "Statute Search", query,
+                    lambda: f"Found relevant statutes for: {query}\n- Statute 1: Sample Statute\n- Regulation 1: Sample Regulation",
+                    timeout=settings.AGENT_MAX_SECONDS
+                )
             except Exception as e:
                 return f"Error searching statutes: {e}"
         
@@ -141,62 +301,435 @@ class LegalRAGPipeline:
             func=format_legal_citation
         )
         
-        self.tools = [
+        self._tools = [
             wikipedia_tool,
             legal_search_tool,
             statute_search_tool,
             citation_tool
         ]
         
-    def initialize_vectorstore(self, documents: List[Document]):
-        """Initialize vector store with documents"""
+    def initialize_vectorstore(self, documents: List[Document], namespace: str = DEFAULT_NAMESPACE):
+        """Initialize a namespace's vector store with documents"""
         try:
-            # Split documents into chunks
-            chunks = self.text_splitter.split_documents(documents)
+            # Split and embed outside the namespace's writer lock
+            chunks = self._split_documents(documents, namespace)
+            embedded = self._embed_chunks(chunks)
             
-            # Create vector store
-            self.vectorstore = FAISS.from_documents(chunks, self.embeddings)
+            # Create vector store and publish it as the namespace's next generation
+            self.stores.update(namespace, lambda _: self._build_vectorstore(embedded, namespace))
+            self._ensure_chains()
             
-            # Setup QA chain
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=self.vectorstore.as_retriever(
-                    search_type="similarity",
-                    search_kwargs={"k": 5}
-                )
-            )
+            self._bump_corpus_version(namespace)
+            logger.info(f"Initialized RAG namespace {namespace} with {len(chunks)} document chunks")
             
-            # Setup conversational chain
-            self.conversational_chain = ConversationalRetrievalChain.from_llm(
-                llm=self.llm,
-                retriever=self.vectorstore.as_retriever(search_kwargs={"k": 5}),
-                memory=self.memory
+        except Exception as e:
+            logger.error(f"Error initializing vectorstore: {e}")
+            raise
+    
+    def _setup_chains(self):
+        """Build the QA chain and agent
+        
+        Neither is bound to a vector store (retrieval happens per namespace) or
+        owns a memory (chat history is passed in per call from the session
+        memory store).
+        """
+        from langchain.chains.question_answering import load_qa_chain
+        from langchain.agents import initialize_agent, AgentType
+        
+        # Setup QA chain over already retrieved documents
+        self.qa_chain = load_qa_chain(self.llm, chain_type="stuff")
+        
+        # Setup agent with tools; the executor's limits back up the per-request budgets
+        self.agent = initialize_agent(
+            self.tools,
+            self.llm,
+            agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
+            max_iterations=settings.AGENT_MAX_STEPS,
+            max_execution_time=settings.AGENT_MAX_SECONDS,
+            early_stopping_method="force"
+        )
+    
+    def _conversational_chain(self, vectorstore: FAISS, namespace: str = DEFAULT_NAMESPACE):
+        """Build a conversational chain over one namespace's vector store"""
+        from langchain.chains import ConversationalRetrievalChain
+        
+        return ConversationalRetrievalChain.from_llm(
+            llm=self.llm,
+            retriever=vectorstore.as_retriever(search_kwargs=self._search_kwargs(namespace, 5))
+        )
+    
+    @property
+    def content_index(self) -> ContentIndex:
+        """Chunks and vectors of ingested content, shared across namespaces (next to the indexes)"""
+        if self._content_index is None:
+            self._content_index = ContentIndex(self.stores.base_path / CONTENT_INDEX_FILE)
+        return self._content_index
+    
+    def _embed_chunks(self, chunks: List[Document]) -> Embedded:
+        """Embed chunk texts, returning (text, vector) pairs and their metadata"""
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = self.embeddings.embed_documents(texts)
+        return list(zip(texts, vectors)), [chunk.metadata for chunk in chunks]
+    
+    def _chunk_store_path(self, namespace: str) -> Path:
+        return self.stores.path_for(namespace) / CHUNK_STORE_FILE
+    
+    def _split_documents(self, documents: List[Document], namespace: str = DEFAULT_NAMESPACE) -> List[Document]:
+        """Split documents into chunks
+        
+        With the chunk store enabled, each source text is stored once in the
+        namespace's chunk store and chunks record its ``doc_id``, their exact
+        span and their parent-section span, so the index can drop chunk text.
+        """
+        if not settings.CHUNK_STORE_ENABLED:
+            return self.text_splitter.split_documents(documents)
+        
+        store = ChunkStore.open(self._chunk_store_path(namespace))
+        chunks = []
+        for document in documents:
+            document_chunks = self.text_splitter.split_documents([document])
+            doc_id = store.add_document(document.page_content, document.metadata.get("source"))
+            parents = parent_spans(document_chunks, len(document.page_content), settings.PARENT_CONTEXT_MAX_CHARS)
+            for chunk, parent in zip(document_chunks, parents):
+                span = chunk_span(chunk)
+                if span:
+                    chunk.metadata.update({
+                        "doc_id": doc_id,
+                        "start_offset": span[0],
+                        "end_offset": span[1],
+                        "parent_start": parent[0],
+                        "parent_end": parent[1]
+                    })
+                chunks.append(chunk)
+        return chunks
+    
+    def _build_vectorstore(self, embedded: Embedded, namespace: str = DEFAULT_NAMESPACE, ids: List[str] = None) -> FAISS:
+        text_embeddings, metadatas = embedded
+        vectorstore = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
+        if settings.CHUNK_STORE_ENABLED:
+            docstore = ChunkDocstore(store_path=str(self._chunk_store_path(namespace)))
+            docstore.add(vectorstore.docstore._dict)
+            vectorstore.docstore = docstore
+        return vectorstore
+    
+    def add_documents(self, documents: List[Document], namespace: str = DEFAULT_NAMESPACE):
+        """Split documents and add them to a namespace's vector store, creating it if needed
+        
+        Readers keep searching the previous generation until the updated copy
+        is published.
+        """
+        chunks = self._split_documents(documents, namespace)
+        self.add_embedded([self._embed_chunks(chunks)], namespace)
+    
+    def near_duplicate_index(self, namespace: str = DEFAULT_NAMESPACE) -> NearDuplicateIndex:
+        return NearDuplicateIndex.open(self.stores.path_for(namespace) / NEAR_DUPLICATES_FILE)
+    
+    def add_embedded(
+        self,
+        batches: List[Embedded],
+        namespace: str = DEFAULT_NAMESPACE,
+        replace: bool = False,
+        contents: List[str] = None
+    ) -> int:
+        """Add already split and embedded chunks to a namespace in one update; returns the vector count
+        
+        With ``replace`` the chunks become the namespace's whole index. With
+        near-duplicate detection enabled, a chunk that nearly matches one
+        already indexed (or earlier in the batch) adds no vector; it is
+        recorded in the representative's ``provenance`` metadata instead.
+        ``contents`` gives the content hash of each batch; the chunk ids each
+        one lands in are recorded so ``delete_content`` can remove them.
+        """
+        text_embeddings = [pair for batch in batches for pair in batch[0]]
+        if not text_embeddings:
+            return 0
+        
+        content_of = [content for batch, content in zip(batches, contents or [None] * len(batches)) for _ in batch[0]]
+        ids = [uuid.uuid4().hex for _ in text_embeddings]
+        metadatas = [
+            dict(metadata, chunk_id=chunk_id, **({"content_sha256": content} if content else {}))
+            for metadata, chunk_id, content in zip(
+                (metadata for batch in batches for metadata in batch[1]), ids, content_of
             )
+        ]
+        duplicates_index = self.near_duplicate_index(namespace) if settings.NEAR_DUPLICATE_ENABLED else None
+        # Chunks too short to shingle get no signature and are always kept
+        signatures = [duplicates_index.hasher.signature(text) for text, _ in text_embeddings] if duplicates_index else None
+        kept: List[int] = list(range(len(text_embeddings)))
+        representatives: List[Optional[str]] = [None] * len(text_embeddings)
+        dead = self.tombstones(namespace)
+        
+        def apply(vectorstore: Optional[FAISS]) -> FAISS:
+            nonlocal kept, representatives
+            fresh = vectorstore is None or replace
+            collapsed: Dict[str, List[Dict]] = {}
+            if duplicates_index:
+                # Decided under the namespace's writer lock against the exact snapshot being updated
+                exists = None if fresh else (
+                    lambda chunk_id: chunk_id in vectorstore.docstore._dict and chunk_id not in dead
+                )
+                representatives = duplicates_index.assign(signatures, ids, exists)
+                kept = [position for position, representative in enumerate(representatives) if representative is None]
+                for position, representative in enumerate(representatives):
+                    if representative is not None:
+                        collapsed.setdefault(representative, []).append(metadatas[position])
             
-            # Setup agent with tools
-            self.agent = initialize_agent(
-                self.tools,
-                self.llm,
-                agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
-                memory=self.memory,
-                verbose=True
+            new_metadatas = {ids[position]: metadatas[position] for position in kept}
+            for representative, duplicates in collapsed.items():
+                if representative in new_metadatas:
+                    new_metadatas[representative] = with_provenance(new_metadatas[representative], duplicates)
+                else:
+                    document = vectorstore.docstore._dict[representative]
+                    vectorstore.docstore._dict[representative] = Document(
+                        page_content=document.page_content,
+                        metadata=with_provenance(document.metadata, duplicates)
+                    )
+            
+            kept_embeddings = [text_embeddings[position] for position in kept]
+            kept_ids = [ids[position] for position in kept]
+            kept_metadatas = [new_metadatas[chunk_id] for chunk_id in kept_ids]
+            if settings.CHUNK_STORE_ENABLED:
+                # Compaction may have dropped a text stored before this update took the lock
+                missing = ChunkStore.open(self._chunk_store_path(namespace)).missing(
+                    [metadata["doc_id"] for metadata in kept_metadatas if "doc_id" in metadata]
+                )
+                if missing:
+                    raise RuntimeError(f"Text of {len(missing)} documents was removed from the chunk store; retry the ingestion")
+            if fresh:
+                return self._build_vectorstore((kept_embeddings, kept_metadatas), namespace, kept_ids)
+            if kept_embeddings:
+                vectorstore.add_embeddings(kept_embeddings, metadatas=kept_metadatas, ids=kept_ids)
+            return vectorstore
+        
+        self.stores.update(namespace, apply)
+        if replace:
+            self.content_index.reset_namespace(namespace)
+            self._tombstones[namespace] = set()
+        if contents:
+            self.content_index.track_chunks(namespace, [
+                (content, representative or chunk_id)
+                for content, chunk_id, representative in zip(content_of, ids, representatives)
+                if content
+            ])
+        if duplicates_index:
+            if replace:
+                duplicates_index.clear()
+            duplicates_index.add([(ids[position], signatures[position]) for position in kept])
+        self._ensure_chains()
+        self._bump_corpus_version(namespace)
+        
+        collapsed_count = len(text_embeddings) - len(kept)
+        logger.info(
+            f"Added {len(kept)} document chunks to RAG namespace {namespace}"
+            + (f" ({collapsed_count} near-duplicates collapsed)" if collapsed_count else "")
+        )
+        return len(kept)
+    
+    def _content_key(self, content_sha256: str) -> str:
+        # Vectors are only reusable under the same chunking and embedding configuration
+        embeddings = self.embeddings
+        model = getattr(embeddings, "model_name", None) or type(embeddings).__name__
+        return ":".join([
+            content_sha256, model, settings.TEXT_SPLITTER, str(settings.CHUNK_SIZE),
+            str(settings.CHUNK_OVERLAP), "chunkstore" if settings.CHUNK_STORE_ENABLED else "inline"
+        ])
+    
+    def prepare_content(
+        self,
+        content_sha256: str,
+        load: Callable[[], List[Document]],
+        namespace: str = DEFAULT_NAMESPACE
+    ) -> Tuple[Optional[Embedded], bool]:
+        """Split and embed one file's content for a namespace, reusing earlier work on the same bytes
+        
+        Returns (embedded chunks, reused). ``load`` parses the file and is only
+        called when the content has not been embedded before; the result is
+        None if it yields no documents.
+        """
+        content_key = self._content_key(content_sha256)
+        cached = self.content_index.get(content_key) if settings.CONTENT_DEDUP_ENABLED else None
+        if cached:
+            sources, embedded = cached
+            if settings.CHUNK_STORE_ENABLED:
+                store = ChunkStore.open(self._chunk_store_path(namespace))
+                for text, source in sources:
+                    store.add_document(text, source)
+            return embedded, True
+        
+        documents = load()
+        if not documents:
+            return None, False
+        embedded = self._embed_chunks(self._split_documents(documents, namespace))
+        if settings.CONTENT_DEDUP_ENABLED:
+            self.content_index.put(
+                content_key, [(document.page_content, document.metadata.get("source")) for document in documents], embedded
             )
+        return embedded, False
+    
+    def _bump_corpus_version(self, namespace: str = DEFAULT_NAMESPACE):
+        """Mark a namespace's corpus as changed and drop answers cached for older versions"""
+        version = self.stores.bump_version(namespace)
+        if self.answer_cache:
+            self.answer_cache.invalidate(version, namespace)
+    
+    def tombstones(self, namespace: str = DEFAULT_NAMESPACE) -> Set[str]:
+        """Ids of a namespace's deleted chunks whose vectors are still in the index"""
+        dead = self._tombstones.get(namespace)
+        if dead is None:
+            dead = self._tombstones.setdefault(namespace, set(self.content_index.tombstones(namespace)))
+        return dead
+    
+    def _search_kwargs(self, namespace: str, k: int) -> Dict[str, Any]:
+        """Search arguments for ``k`` live results, over-fetching past deleted chunks"""
+        dead = self.tombstones(namespace)
+        if not dead:
+            return {"k": k}
+        return {
+            "k": k,
+            "filter": lambda metadata: metadata.get("chunk_id") not in dead,
+            "fetch_k": k + min(len(dead), settings.VECTORSTORE_COMPACTION_MAX_TOMBSTONES)
+        }
+    
+    def delete_content(self, content_sha256: str, namespace: str = DEFAULT_NAMESPACE) -> int:
+        """Remove a piece of content's chunks from a namespace's search results; returns the chunks removed
+        
+        Chunks are tombstoned: searches skip them at once and ``compact``
+        later drops their vectors. Chunks that other content in the namespace
+        was collapsed into, or collapsed into, stay searchable.
+        """
+        chunk_ids = self.content_index.remove_content(namespace, content_sha256)
+        if not chunk_ids:
+            return 0
+        
+        self.content_index.add_tombstones(namespace, chunk_ids)
+        self.tombstones(namespace).update(chunk_ids)
+        if settings.NEAR_DUPLICATE_ENABLED:
+            self.near_duplicate_index(namespace).remove(chunk_ids)
+        self._bump_corpus_version(namespace)
+        logger.info(f"Tombstoned {len(chunk_ids)} chunks of content {content_sha256[:12]} in RAG namespace {namespace}")
+        return len(chunk_ids)
+    
+    def reload_namespace(self, namespace: str = DEFAULT_NAMESPACE):
+        """Drop a namespace's in-memory state after another process rewrote it on disk
+
+        The index is unloaded without saving, so the stale copy can never be
+        written over the new files, and is loaded again on next use.
+        """
+        self.stores.discard(namespace)
+        self._tombstones.pop(namespace, None)
+        self._bump_corpus_version(namespace)
+    
+    def tombstone_ratio(self, namespace: str = DEFAULT_NAMESPACE) -> float:
+        """Fraction of a namespace's vectors that belong to deleted chunks"""
+        dead = self.tombstones(namespace)
+        vectorstore = self.stores.get(namespace) if dead else None
+        if not vectorstore or not vectorstore.index.ntotal:
+            return 0.0
+        return len(dead) / vectorstore.index.ntotal
+    
+    def needs_compaction(self, namespace: str = DEFAULT_NAMESPACE) -> bool:
+        dead = self.tombstones(namespace)
+        return bool(dead) and (
+            len(dead) >= settings.VECTORSTORE_COMPACTION_MAX_TOMBSTONES
+            or self.tombstone_ratio(namespace) >= settings.VECTORSTORE_COMPACTION_RATIO
+        )
+    
+    def compact(self, namespace: str = DEFAULT_NAMESPACE) -> int:
+        """Drop deleted chunks' vectors and docstore entries from a namespace and save it; returns the count
+        
+        Runs as a copy-on-write update, so searches continue on the previous
+        generation (with deleted chunks filtered) until the compacted copy is
+        published. Provenance records of deleted content are pruned from the
+        chunks that remain, and source texts no remaining chunk refers to are
+        removed from the chunk store.
+        """
+        dead = set(self.tombstones(namespace))
+        if not dead:
+            return 0
+        live_contents = set(self.content_index.contents(namespace))
+        removed = 0
+        texts_removed = 0
+        
+        def apply(vectorstore: Optional[FAISS]) -> Optional[FAISS]:
+            nonlocal removed, texts_removed
+            if vectorstore is None:
+                return vectorstore
+            dead_doc_ids = {
+                vectorstore.docstore._dict[chunk_id].metadata.get("doc_id")
+                for chunk_id in dead if chunk_id in vectorstore.docstore._dict
+            }
+            positions = [position for position, chunk_id in vectorstore.index_to_docstore_id.items() if chunk_id in dead]
+            if positions:
+                vectorstore.index.remove_ids(np.array(positions, dtype=np.int64))
+                remaining = [
+                    chunk_id for _, chunk_id in sorted(vectorstore.index_to_docstore_id.items()) if chunk_id not in dead
+                ]
+                vectorstore.index_to_docstore_id = dict(enumerate(remaining))
             
-            logger.info(f"Initialized RAG pipeline with {len(chunks)} document chunks")
+            documents = vectorstore.docstore._dict
+            for chunk_id in dead:
+                documents.pop(chunk_id, None)
+            for chunk_id, document in list(documents.items()):
+                provenance = document.metadata.get("provenance")
+                if not provenance:
+                    continue
+                pruned = [
+                    record for record in provenance
+                    if record.get("content_sha256") is None or record["content_sha256"] in live_contents
+                ]
+                if len(pruned) != len(provenance):
+                    documents[chunk_id] = Document(
+                        page_content=document.page_content,
+                        metadata={**document.metadata, "provenance": pruned, "duplicate_count": max(len(pruned) - 1, 0)}
+                    )
+            removed = len(positions)
             
-        except Exception as e:
-            logger.error(f"Error initializing vectorstore: {e}")
-            raise
+            # Under the writer lock, so no update can add chunks of these texts meanwhile
+            dead_doc_ids.discard(None)
+            if dead_doc_ids and settings.CHUNK_STORE_ENABLED:
+                dead_doc_ids.difference_update(document.metadata.get("doc_id") for document in documents.values())
+                texts_removed = ChunkStore.open(self._chunk_store_path(namespace)).delete(list(dead_doc_ids))
+            return vectorstore
+        
+        if self.stores.get(namespace) is None:
+            return 0
+        self.stores.update(namespace, apply)
+        self.save_vectorstore(namespace=namespace)
+        self.content_index.clear_tombstones(namespace, list(dead))
+        self.tombstones(namespace).difference_update(dead)
+        logger.info(
+            f"Compacted RAG namespace {namespace}: removed {removed} deleted chunk vectors and {texts_removed} source texts"
+        )
+        return removed
+    
+    def compact_pending(self) -> Dict[str, int]:
+        """Compact every namespace whose deleted chunks passed the compaction thresholds"""
+        compacted = {}
+        for namespace in self.content_index.tombstone_counts():
+            if self.needs_compaction(namespace):
+                compacted[namespace] = self.compact(namespace)
+        return compacted
     
     def add_documents_from_files(self, file_paths: List[str]) -> List[Document]:
         """Load documents from various file formats"""
+        from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredWordDocumentLoader
+        
         documents = []
         
         for file_path in file_paths:
             try:
                 file_path = Path(file_path)
                 
+                # Reuse text extracted by the current parser version
+                parser = PARSER_VERSIONS.get(file_path.suffix.lower()) if self.text_cache else None
+                if parser:
+                    content_sha256 = ContentStore.sha256_of(str(file_path))
+                    cached = self.text_cache.get(content_sha256, parser)
+                    if cached is not None:
+                        documents.extend(Document(**document) for document in cached)
+                        logger.info(f"Loaded {len(cached)} cached documents for {file_path.name}")
+                        continue
+                
                 if file_path.suffix.lower() == '.pdf':
                     loader = PyPDFLoader(str(file_path))
                 elif file_path.suffix.lower() == '.txt':
@@ -211,11 +744,48 @@ class LegalRAGPipeline:
                 documents.extend(docs)
                 logger.info(f"Loaded {len(docs)} documents from {file_path.name}")
                 
+                if parser:
+                    self.text_cache.put(
+                        content_sha256, file_path.suffix.lower(), parser,
+                        [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+                    )
+                
             except Exception as e:
                 logger.error(f"Error loading file {file_path}: {e}")
                 
         return documents
     
+    def rebuild_namespace(self, file_paths: List[str], namespace: str = DEFAULT_NAMESPACE) -> Dict[str, Any]:
+        """Rebuild a namespace's index from its files and save it
+        
+        Text comes from the extracted-text cache and vectors from the content
+        index where they are still valid, so a rebuild only parses files whose
+        parser changed and only embeds content whose chunking or embedding
+        configuration changed.
+        """
+        batches = []
+        contents = []
+        reused = failed = 0
+        for file_path in file_paths:
+            content_sha256 = ContentStore.sha256_of(file_path)
+            embedded, was_reused = self.prepare_content(
+                content_sha256, lambda path=file_path: self.add_documents_from_files([path]), namespace
+            )
+            if not embedded:
+                failed += 1
+                continue
+            batches.append(embedded)
+            contents.append(content_sha256)
+            reused += int(was_reused)
+        
+        chunks = self.add_embedded(batches, namespace, replace=True, contents=contents)
+        if chunks:
+            self.save_vectorstore(namespace=namespace)
+            for content_sha256 in contents:
+                self.content_index.link(namespace, content_sha256)
+        
+        return {"namespace": namespace, "files": len(file_paths), "failed_files": failed, "reused_files": reused, "chunks": chunks}
+    
     def add_text_documents(self, texts: List[str], metadatas: List[Dict] = None) -> List[Document]:
         """Add text documents to the pipeline"""
         documents = []
@@ -227,31 +797,214 @@ class LegalRAGPipeline:
             
         return documents
     
-    def query(self, question: str, use_conversation: bool = False) -> Dict[str, Any]:
-        """Query the RAG pipeline"""
+    def retrieve(self, question: str, k: int = 5, namespace: str = DEFAULT_NAMESPACE) -> RetrievalContext:
+        """Embed the question once and run a single scored search for it"""
+        return self._search_context(self._embed_context(question, k, namespace))
+    
+    async def aretrieve(self, question: str, k: int = 5, namespace: str = DEFAULT_NAMESPACE) -> RetrievalContext:
+        """Embed the question once and run a single scored search for it, asynchronously"""
+        return await self._asearch_context(await self._aembed_context(question, k, namespace))
+    
+    def _embed_context(self, question: str, k: int = 5, namespace: str = DEFAULT_NAMESPACE) -> RetrievalContext:
+        """Start a retrieval context with the question embedded"""
+        context = RetrievalContext(
+            question=question, k=k, namespace=namespace, corpus_version=self.stores.version(namespace)
+        )
+        if self.embeddings:
+            context.query_embedding = self.embeddings.embed_query(question)
+        return context
+    
+    async def _aembed_context(self, question: str, k: int = 5, namespace: str = DEFAULT_NAMESPACE) -> RetrievalContext:
+        """Start a retrieval context with the question embedded, asynchronously"""
+        context = RetrievalContext(
+            question=question, k=k, namespace=namespace, corpus_version=self.stores.version(namespace)
+        )
+        if self.embeddings:
+            context.query_embedding = await self.embeddings.aembed_query(question)
+        return context
+    
+    def _search_context(self, context: RetrievalContext) -> RetrievalContext:
+        """Fill a retrieval context with scored documents unless already retrieved"""
+        vectorstore = self.stores.get(context.namespace)
+        if vectorstore and not context.retrieved:
+            if context.query_embedding is not None:
+                context.docs_and_scores = vectorstore.similarity_search_with_score_by_vector(
+                    context.query_embedding, **self._search_kwargs(context.namespace, context.k)
+                )
+            else:
+                context.docs_and_scores = vectorstore.similarity_search_with_score(
+                    context.question, **self._search_kwargs(context.namespace, context.k)
+                )
+            context.retrieved = True
+        return context
+    
+    async def _asearch_context(self, context: RetrievalContext) -> RetrievalContext:
+        """Fill a retrieval context with scored documents unless already retrieved, asynchronously"""
+        vectorstore = self.stores.get(context.namespace)
+        if vectorstore and not context.retrieved:
+            if context.query_embedding is not None:
+                context.docs_and_scores = await vectorstore.asimilarity_search_with_score_by_vector(
+                    context.query_embedding, **self._search_kwargs(context.namespace, context.k)
+                )
+            else:
+                context.docs_and_scores = await vectorstore.asimilarity_search_with_score(
+                    context.question, **self._search_kwargs(context.namespace, context.k)
+                )
+            context.retrieved = True
+        return context
+    
+    def _parent_documents(self, context: RetrievalContext) -> List[Tuple[Document, float]]:
+        """Replace retrieved chunks with their parent sections, once per parent"""
+        vectorstore = self.stores.get(context.namespace)
+        docstore = vectorstore.docstore if vectorstore else None
+        if not settings.PARENT_CONTEXT_MAX_CHARS or not isinstance(docstore, ChunkDocstore):
+            return context.docs_and_scores
+        
+        parents: List[Tuple[Document, float]] = []
+        seen = set()
+        for doc, score in context.docs_and_scores:
+            key = (doc.metadata.get("doc_id"), doc.metadata.get("parent_start"), doc.metadata.get("parent_end"))
+            if key in seen:
+                continue
+            seen.add(key)
+            parents.append((docstore.read_parent(doc) or doc, score))
+        return parents
+    
+    def _prompt_documents(self, context: RetrievalContext) -> List[Document]:
+        """Documents to place in the QA prompt (parent sections of the retrieved chunks
+        when available), compressed to the token budget when enabled"""
+        if context.prompt_documents is None:
+            docs_and_scores = self._parent_documents(context)
+            if self.context_builder:
+                context.prompt_documents = self.context_builder.build(context.question, docs_and_scores)
+            else:
+                context.prompt_documents = [doc for doc, _ in docs_and_scores]
+        return context.prompt_documents
+    
+    def _lookup_cached_answer(self, context: RetrievalContext) -> Optional[Dict[str, Any]]:
+        """Return a cached answer for the context's query embedding and k, if any"""
+        if not self.answer_cache or context.query_embedding is None:
+            return None
+        return self.answer_cache.lookup(
+            context.query_embedding, context.corpus_version, context.namespace, context.k
+        )
+    
+    def _qa_result(self, context: RetrievalContext, answer: str) -> Dict[str, Any]:
+        """Build the QA response for an answered context and cache it"""
+        result = {
+            "answer": answer,
+            "source_documents": context.documents,
+            "search_results": context.search_results
+        }
+        if self.answer_cache and context.query_embedding is not None:
+            self.answer_cache.store(
+                context.question, context.query_embedding, context.corpus_version, result,
+                context.namespace, context.k
+            )
+        return result
+    
+    def query(
+        self,
+        question: str,
+        use_conversation: bool = False,
+        session_id: Optional[str] = None,
+        namespace: str = DEFAULT_NAMESPACE
+    ) -> Dict[str, Any]:
+        """Query the RAG pipeline
+        
+        A conversational query without a session_id is stateless: no history
+        is read or recorded.
+        """
         try:
-            if not self.vectorstore:
+            self._ensure_chains()
+            vectorstore = self.stores.get(namespace)
+            if not vectorstore or not self.qa_chain:
                 return {
                     "answer": "No documents have been indexed yet. Please upload documents first.",
                     "source_documents": [],
                     "error": "No vectorstore initialized"
                 }
             
-            if use_conversation and self.conversational_chain:
+            if use_conversation:
                 # Use conversational chain for context-aware responses
-                response = self.conversational_chain({"question": question})
+                history = self.memory_store.get_history(session_id) if session_id else []
+                response = self._conversational_chain(vectorstore, namespace).invoke({
+                    "question": question,
+                    "chat_history": self.memory_store.as_chat_history(history)
+                })
+                if session_id:
+                    self.memory_store.append_turn(session_id, question, response["answer"])
+                    history = self.memory_store.get_history(session_id)
                 return {
                     "answer": response["answer"],
                     "source_documents": response.get("source_documents", []),
-                    "chat_history": response.get("chat_history", [])
+                    "chat_history": history
                 }
             else:
-                # Use simple QA chain
-                response = self.qa_chain({"query": question})
+                # Near-identical questions against the same corpus are served from cache
+                context = self._embed_context(question, namespace=namespace)
+                cached = self._lookup_cached_answer(context)
+                if cached:
+                    return cached
+                
+                # Retrieve once and answer over those documents, compressed to the token budget
+                self._search_context(context)
+                response = self.qa_chain.invoke(
+                    {"input_documents": self._prompt_documents(context), "question": question}
+                )
+                return self._qa_result(context, response["output_text"])
+                
+        except Exception as e:
+            logger.error(f"Error querying RAG pipeline: {e}")
+            return {
+                "answer": f"Error processing query: {str(e)}",
+                "source_documents": [],
+                "error": str(e)
+            }
+    
+    async def aquery(
+        self,
+        question: str,
+        use_conversation: bool = False,
+        session_id: Optional[str] = None,
+        namespace: str = DEFAULT_NAMESPACE
+    ) -> Dict[str, Any]:
+        """Query the RAG pipeline without blocking the event loop"""
+        try:
+            self._ensure_chains()
+            vectorstore = self.stores.get(namespace)
+            if not vectorstore or not self.qa_chain:
                 return {
-                    "answer": response["result"],
-                    "source_documents": response.get("source_documents", [])
+                    "answer": "No documents have been indexed yet. Please upload documents first.",
+                    "source_documents": [],
+                    "error": "No vectorstore initialized"
                 }
+            
+            if use_conversation:
+                history = self.memory_store.get_history(session_id) if session_id else []
+                response = await self._conversational_chain(vectorstore, namespace).ainvoke({
+                    "question": question,
+                    "chat_history": self.memory_store.as_chat_history(history)
+                })
+                if session_id:
+                    self.memory_store.append_turn(session_id, question, response["answer"])
+                    history = self.memory_store.get_history(session_id)
+                return {
+                    "answer": response["answer"],
+                    "source_documents": response.get("source_documents", []),
+                    "chat_history": history
+                }
+            else:
+                context = await self._aembed_context(question, namespace=namespace)
+                cached = self._lookup_cached_answer(context)
+                if cached:
+                    return cached
+                
+                await self._asearch_context(context)
+                response = await self.qa_chain.ainvoke(
+                    {"input_documents": self._prompt_documents(context), "question": question}
+                )
+                return self._qa_result(context, response["output_text"])
                 
         except Exception as e:
             logger.error(f"Error querying RAG pipeline: {e}")
@@ -261,58 +1014,237 @@ class LegalRAGPipeline:
                 "error": str(e)
             }
     
-    def agent_query(self, question: str) -> Dict[str, Any]:
-        """Query using the agent with tools"""
+    async def astream_query(
+        self,
+        question: str,
+        k: int = 5,
+        namespace: str = DEFAULT_NAMESPACE
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a QA answer: retrieved sources first, then answer tokens as they are generated
+        
+        Yields events of type ``sources``, ``token``, ``done`` or ``error``. Closing the
+        generator early (e.g. on client disconnect) cancels the upstream LLM stream.
+        """
+        self._ensure_chains()
+        if not self.stores.get(namespace) or not self.qa_chain:
+            yield {
+                "type": "error",
+                "error": "No vectorstore initialized",
+                "answer": "No documents have been indexed yet. Please upload documents first."
+            }
+            return
+        
+        try:
+            context = await self._aembed_context(question, k, namespace)
+            cached = self._lookup_cached_answer(context)
+            if cached:
+                yield {"type": "sources", "source_documents": cached["search_results"]}
+                yield {"type": "token", "content": cached["answer"]}
+                yield {"type": "done", "answer": cached["answer"], "cached": True}
+                return
+            
+            await self._asearch_context(context)
+            yield {"type": "sources", "source_documents": context.search_results}
+            
+            # Build the same "stuff" prompt the QA chain would send, then stream it
+            stuff_chain = self.qa_chain
+            prompt_context = stuff_chain.document_separator.join(
+                format_document(doc, stuff_chain.document_prompt) for doc in self._prompt_documents(context)
+            )
+            prompt = stuff_chain.llm_chain.prompt.format_prompt(
+                **{stuff_chain.document_variable_name: prompt_context, "question": question}
+            )
+            
+            answer_parts = []
+            async for chunk in self.llm.astream(prompt):
+                token = getattr(chunk, "content", chunk)
+                if token:
+                    answer_parts.append(token)
+                    yield {"type": "token", "content": token}
+            
+            answer = "".join(answer_parts)
+            self._qa_result(context, answer)
+            yield {"type": "done", "answer": answer}
+            
+        except Exception as e:
+            logger.error(f"Error streaming RAG query: {e}")
+            yield {"type": "error", "error": str(e), "answer": f"Error processing query: {str(e)}"}
+    
+    
+    def _agent_trace(self, budget: Optional[AgentBudget]) -> AgentTrace:
+        count_tokens = self.context_builder.count_tokens if self.context_builder else lambda text: max(1, len(text) // 4)
+        return AgentTrace(budget or AgentBudget(), count_tokens)
+    
+    def _agent_result(self, trace: AgentTrace, output: Optional[str]) -> Dict[str, Any]:
+        """Agent response with its trace, falling back to a partial answer if the run was stopped"""
+        if output is None or output.strip() == EXECUTOR_STOPPED_OUTPUT:
+            if trace.stop_reason is None:
+                trace.stop_reason = "max_steps" if len(trace.steps) >= trace.budget.max_steps else "max_seconds"
+            output = trace.partial_answer()
+        self.agent_metrics.record(trace)
+        return {
+            "answer": output,
+            "agent_type": "conversational_react",
+            "tools_used": list(dict.fromkeys(step.tool for step in trace.steps)),
+            "stopped_reason": trace.stop_reason,
+            "trace": trace.summary()
+        }
+    
+    def agent_query(self, question: str, session_id: Optional[str] = None, budget: AgentBudget = None) -> Dict[str, Any]:
+        """Query using the agent with tools, within a step, time and token budget
+        
+        A run that exhausts its budget returns a partial answer from the tool
+        results gathered so far. Without a session_id the call is stateless:
+        no history is read or recorded.
+        """
+        trace = None
         try:
+            self._ensure_chains()
             if not self.agent:
                 return {
                     "answer": "Agent not initialized. Please initialize with documents first.",
                     "error": "No agent available"
                 }
             
-            response = self.agent.run(question)
+            trace = self._agent_trace(budget)
+            history = self.memory_store.get_history(session_id) if session_id else []
+            try:
+                output = self.agent.invoke(
+                    {"input": question, "chat_history": self.memory_store.as_transcript(history)},
+                    config={"callbacks": [trace]}
+                )["output"]
+            except AgentBudgetExceeded as e:
+                logger.info(f"Agent query stopped early: {e.reason}")
+                output = None
+            result = self._agent_result(trace, output)
+            if session_id:
+                self.memory_store.append_turn(session_id, question, result["answer"])
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error with agent query: {e}")
+            if trace is not None:
+                trace.stop_reason = "error"
+                self.agent_metrics.record(trace)
             return {
-                "answer": response,
-                "agent_type": "conversational_react",
-                "tools_used": [tool.name for tool in self.tools]
+                "answer": f"Error with agent query: {str(e)}",
+                "error": str(e)
             }
+    
+    async def aagent_query(self, question: str, session_id: Optional[str] = None, budget: AgentBudget = None) -> Dict[str, Any]:
+        """Query using the agent with tools without blocking the event loop, within a budget"""
+        trace = None
+        try:
+            self._ensure_chains()
+            if not self.agent:
+                return {
+                    "answer": "Agent not initialized. Please initialize with documents first.",
+                    "error": "No agent available"
+                }
+            
+            trace = self._agent_trace(budget)
+            history = self.memory_store.get_history(session_id) if session_id else []
+            try:
+                # The callbacks only stop a run between steps; the deadline also cuts off a slow LLM or tool call
+                output = (await asyncio.wait_for(
+                    self.agent.ainvoke(
+                        {"input": question, "chat_history": self.memory_store.as_transcript(history)},
+                        config={"callbacks": [trace]}
+                    ),
+                    timeout=trace.budget.max_seconds
+                ))["output"]
+            except AgentBudgetExceeded as e:
+                logger.info(f"Agent query stopped early: {e.reason}")
+                output = None
+            except asyncio.TimeoutError:
+                logger.info("Agent query stopped early: max_seconds")
+                trace.stop_reason = "max_seconds"
+                output = None
+            result = self._agent_result(trace, output)
+            if session_id:
+                self.memory_store.append_turn(session_id, question, result["answer"])
+            return result
             
         except Exception as e:
             logger.error(f"Error with agent query: {e}")
+            if trace is not None:
+                trace.stop_reason = "error"
+                self.agent_metrics.record(trace)
             return {
                 "answer": f"Error with agent query: {str(e)}",
                 "error": str(e)
             }
     
-    def similarity_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Perform similarity search on documents"""
+    async def arun_tool(self, name: str, tool_input: str) -> str:
+        """Run one of the agent's tools directly, without the agent choosing it"""
+        for tool in self.tools:
+            if tool.name == name:
+                return await tool.arun(tool_input)
+        raise ValueError(f"Unknown tool: {name}")
+    
+    async def agenerate(self, prompt: str) -> Dict[str, Any]:
+        """Answer a self-contained prompt with one LLM call, without retrieval or tools"""
+        try:
+            if self.llm is None:
+                return {"answer": "LLM not configured.", "error": "No LLM available"}
+            response = await self.llm.ainvoke(prompt)
+            return {"answer": getattr(response, "content", response)}
+            
+        except Exception as e:
+            logger.error(f"Error generating answer: {e}")
+            return {
+                "answer": f"Error generating answer: {str(e)}",
+                "error": str(e)
+            }
+    
+    def similarity_search(self, query: str, k: int = 5, namespace: str = DEFAULT_NAMESPACE) -> List[Dict[str, Any]]:
+        """Perform similarity search on a namespace's documents"""
         try:
-            if not self.vectorstore:
+            vectorstore = self.stores.get(namespace)
+            if not vectorstore:
                 return []
             
-            docs = self.vectorstore.similarity_search_with_score(query, k=k)
+            docs = vectorstore.similarity_search_with_score(query, **self._search_kwargs(namespace, k))
+            return self._format_search_results(docs)
             
-            results = []
-            for doc, score in docs:
-                results.append({
-                    "content": doc.page_content,
-                    "metadata": doc.metadata,
-                    "similarity_score": float(score)
-                })
-                
-            return results
+        except Exception as e:
+            logger.error(f"Error in similarity search: {e}")
+            return []
+    
+    async def asimilarity_search(self, query: str, k: int = 5, namespace: str = DEFAULT_NAMESPACE) -> List[Dict[str, Any]]:
+        """Perform similarity search on a namespace's documents without blocking the event loop"""
+        try:
+            vectorstore = self.stores.get(namespace)
+            if not vectorstore:
+                return []
+            
+            docs = await vectorstore.asimilarity_search_with_score(query, **self._search_kwargs(namespace, k))
+            return self._format_search_results(docs)
             
         except Exception as e:
             logger.error(f"Error in similarity search: {e}")
             return []
     
-    def get_relevant_documents(self, query: str, k: int = 5) -> List[Document]:
+    @staticmethod
+    def _format_search_results(docs_and_scores: List[Tuple[Document, float]]) -> List[Dict[str, Any]]:
+        """Convert (document, score) pairs into API search results"""
+        results = []
+        for doc, score in docs_and_scores:
+            results.append({
+                "content": doc.page_content,
+                "metadata": doc.metadata,
+                "similarity_score": float(score)
+            })
+        return results
+    
+    def get_relevant_documents(self, query: str, k: int = 5, namespace: str = DEFAULT_NAMESPACE) -> List[Document]:
         """Get relevant documents for a query"""
         try:
-            if not self.vectorstore:
+            vectorstore = self.stores.get(namespace)
+            if not vectorstore:
                 return []
             
-            retriever = self.vectorstore.as_retriever(search_kwargs={"k": k})
+            retriever = vectorstore.as_retriever(search_kwargs=self._search_kwargs(namespace, k))
             docs = retriever.get_relevant_documents(query)
             return docs
             
@@ -320,43 +1252,27 @@ class LegalRAGPipeline:
             logger.error(f"Error getting relevant documents: {e}")
             return []
     
-    def save_vectorstore(self, path: str):
-        """Save the vector store to disk"""
+    def save_vectorstore(self, path: str = None, namespace: str = DEFAULT_NAMESPACE):
+        """Save a namespace's vector store to disk (its registry location unless a path is given)"""
         try:
-            if self.vectorstore:
-                self.vectorstore.save_local(path)
-                logger.info(f"Vector store saved to {path}")
+            if namespace in self.stores.loaded_namespaces():
+                self.stores.save(namespace, path)
+                logger.info(f"Vector store {namespace} saved to {path or self.stores.path_for(namespace)}")
         except Exception as e:
             logger.error(f"Error saving vector store: {e}")
             raise
     
     def load_vectorstore(self, path: str):
-        """Load vector store from disk"""
+        """Load the default namespace's vector store from disk"""
         try:
             if os.path.exists(path):
-                self.vectorstore = FAISS.load_local(path, self.embeddings)
+                vectorstore = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+                self.stores.set(DEFAULT_NAMESPACE, vectorstore, dirty=False)
                 
                 # Reinitialize chains
-                self.qa_chain = RetrievalQA.from_chain_type(
-                    llm=self.llm,
-                    chain_type="stuff",
-                    retriever=self.vectorstore.as_retriever(search_kwargs={"k": 5})
-                )
-                
-                self.conversational_chain = ConversationalRetrievalChain.from_llm(
-                    llm=self.llm,
-                    retriever=self.vectorstore.as_retriever(search_kwargs={"k": 5}),
-                    memory=self.memory
-                )
-                
-                self.agent = initialize_agent(
-                    self.tools,
-                    self.llm,
-                    agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
-                    memory=self.memory,
-                    verbose=True
-                )
+                self._ensure_chains()
                 
+                self._bump_corpus_version()
                 logger.info(f"Vector store loaded from {path}")
             else:
                 logger.warning(f"Vector store path does not exist: {path}")
@@ -365,17 +1281,16 @@ class LegalRAGPipeline:
             logger.error(f"Error loading vector store: {e}")
             raise
     
-    def clear_memory(self):
-        """Clear conversation memory"""
-        self.memory.clear()
-        logger.info("Conversation memory cleared")
+    def clear_memory(self, session_id: str):
+        """Clear one session's conversation memory"""
+        self.memory_store.clear(session_id)
+        logger.info(f"Conversation memory cleared for session {session_id}")
     
     def get_stats(self) -> Dict[str, Any]:
         """Get pipeline statistics"""
         stats = {
             "vectorstore_initialized": self.vectorstore is not None,
             "qa_chain_initialized": self.qa_chain is not None,
-            "conversational_chain_initialized": self.conversational_chain is not None,
             "agent_initialized": self.agent is not None,
             "tools_available": len(self.tools),
             "tool_names": [tool.name for tool in self.tools]
@@ -383,6 +1298,21 @@ class LegalRAGPipeline:
         
         if self.vectorstore:
             stats["total_documents"] = self.vectorstore.index.ntotal
+        
+        stats["corpus_version"] = self.corpus_version
+        if self.context_builder:
+            stats["context_builder"] = self.context_builder.get_stats()
+        stats["memory"] = self.memory_store.get_stats()
+        if self.answer_cache:
+            stats["answer_cache"] = self.answer_cache.get_stats()
+        stats["vectorstores"] = self.stores.get_stats()
+        if self._content_index:
+            stats["content_index"] = self._content_index.get_stats()
+        if self.text_cache:
+            stats["extracted_text_cache"] = self.text_cache.get_stats()
+        stats["tool_cache"] = tool_cache.get_stats()
+        stats["agent"] = self.agent_metrics.get_stats()
+        stats["reference_index"] = reference_index.get_stats()
             
         return stats
 
@@ -0,0 +1,266 @@
+import bz2
+import gzip
+import json
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+from xml.etree import ElementTree
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Same name and description as LangChain's WikipediaQueryRun, so the agent's prompt is unchanged
+REFERENCE_TOOL_NAME = "wikipedia"
+REFERENCE_TOOL_DESCRIPTION = (
+    "A wrapper around Wikipedia. Useful for when you need to answer general questions about "
+    "people, places, companies, facts, historical events, or other subjects. Input should be a search query."
+)
+NO_RESULT = "No good Wikipedia Search Result was found"
+
+FTS_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Title matches count for more than body matches in full-text ranking
+TITLE_WEIGHT = 10.0
+
+# Wikitext markup reduced to plain text before indexing
+WIKI_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+WIKI_REF = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+WIKI_TEMPLATE = re.compile(r"\{\{[^{}]*\}\}")
+WIKI_TABLE = re.compile(r"\{\|.*?\|\}", re.DOTALL)
+WIKI_FILE_LINK = re.compile(r"\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]", re.IGNORECASE)
+WIKI_LINK = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]+)\]\]")
+WIKI_EXTERNAL_LINK = re.compile(r"\[https?://[^\s\]]+\s?([^\]]*)\]")
+WIKI_HTML_TAG = re.compile(r"</?[a-zA-Z][^>]*>")
+WIKI_EMPHASIS = re.compile(r"'{2,}")
+WIKI_HEADING = re.compile(r"^=+\s*(.*?)\s*=+\s*$", re.MULTILINE)
+BLANK_LINES = re.compile(r"\n{3,}")
+
+def clean_wikitext(text: str) -> str:
+    """Plain text of a wikitext article (templates, references, tables and markup removed)"""
+    text = WIKI_COMMENT.sub("", text)
+    text = WIKI_REF.sub("", text)
+    # Templates nest; strip innermost first until none are left
+    previous = None
+    while previous != text:
+        previous, text = text, WIKI_TEMPLATE.sub("", text)
+    text = WIKI_TABLE.sub("", text)
+    text = WIKI_FILE_LINK.sub("", text)
+    text = WIKI_LINK.sub(r"\1", text)
+    text = WIKI_EXTERNAL_LINK.sub(r"\1", text)
+    text = WIKI_HTML_TAG.sub("", text)
+    text = WIKI_EMPHASIS.sub("", text)
+    text = WIKI_HEADING.sub(r"\n\1\n", text)
+    return BLANK_LINES.sub("\n\n", text).strip()
+
+def _open_dump(path: str):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+def iter_mediawiki_dump(path: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """(title, plain text, redirect target) of main-namespace pages in a MediaWiki XML export
+
+    The dump is streamed and each page is released once read, so memory use
+    does not grow with the dump.
+    """
+    with _open_dump(path) as dump:
+        root = None
+        for event, element in ElementTree.iterparse(dump, events=("start", "end")):
+            if root is None:
+                root = element
+            if event != "end" or (not element.tag.endswith("}page") and element.tag != "page"):
+                continue
+            namespace = title = text = redirect = None
+            for child in element.iter():
+                tag = child.tag.rsplit("}", 1)[-1]
+                if tag == "ns":
+                    namespace = child.text
+                elif tag == "title":
+                    title = child.text
+                elif tag == "redirect":
+                    redirect = child.get("title")
+                elif tag == "text":
+                    text = child.text or ""
+            root.clear()
+            if title and namespace in (None, "0"):
+                yield title, "" if redirect else clean_wikitext(text or ""), redirect
+
+def iter_jsonl_dump(path: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """(title, text, redirect target) from JSON lines with ``title`` and ``text`` (optional ``redirect``)"""
+    with _open_dump(path) as dump:
+        for line in dump:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield record["title"], record.get("text", ""), record.get("redirect")
+
+class ReferenceIndex:
+    """Offline reference corpus (a Wikipedia or legal encyclopedia dump) with title and full-text lookup
+
+    Article text is stored zlib-compressed; an FTS5 index (contentless, so
+    the text is not stored twice) ranks articles by BM25 with title matches
+    weighted up, and a normalized-title table answers exact titles and
+    redirects. ``run`` returns results in the format of LangChain's
+    WikipediaAPIWrapper, so the tool is a drop-in replacement.
+    """
+
+    def __init__(self, path: str = None, top_k: int = None, max_chars: int = None, summary_chars: int = None):
+        self.path = Path(path or settings.REFERENCE_INDEX_PATH)
+        self.top_k = top_k or settings.REFERENCE_TOP_K
+        self.max_chars = max_chars or settings.REFERENCE_MAX_CHARS
+        self.summary_chars = summary_chars or settings.REFERENCE_SUMMARY_CHARS
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.path.exists()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                "CREATE TABLE IF NOT EXISTS articles ("
+                "id INTEGER PRIMARY KEY, title TEXT NOT NULL, body BLOB NOT NULL, text_bytes INTEGER NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS titles (title_key TEXT PRIMARY KEY, article_id INTEGER NOT NULL) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS redirects (title_key TEXT PRIMARY KEY, target TEXT NOT NULL) WITHOUT ROWID;"
+                "CREATE VIRTUAL TABLE IF NOT EXISTS article_search USING fts5("
+                "title, body, content='', tokenize='porter unicode61');"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def title_key(title: str) -> str:
+        return " ".join(title.replace("_", " ").lower().split())
+
+    def add_articles(self, records: Iterable[Tuple[str, str, Optional[str]]], batch_size: int = 1000) -> Dict[str, int]:
+        """Ingest (title, text, redirect target) records; returns article and redirect counts"""
+        counts = {"articles": 0, "redirects": 0, "skipped": 0}
+        batch: List[Tuple[str, str, Optional[str]]] = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self._add_batch(batch, counts)
+                batch = []
+        if batch:
+            self._add_batch(batch, counts)
+        return counts
+
+    def _add_batch(self, batch: List[Tuple[str, str, Optional[str]]], counts: Dict[str, int]):
+        with self._lock, self.connection:
+            connection = self.connection
+            for title, text, redirect in batch:
+                key = self.title_key(title)
+                if redirect:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO redirects (title_key, target) VALUES (?, ?)", (key, redirect)
+                    )
+                    counts["redirects"] += 1
+                    continue
+                if not text.strip() or connection.execute(
+                    "SELECT 1 FROM titles WHERE title_key = ?", (key,)
+                ).fetchone():
+                    counts["skipped"] += 1
+                    continue
+                raw = text.encode("utf-8")
+                article_id = connection.execute(
+                    "INSERT INTO articles (title, body, text_bytes) VALUES (?, ?, ?)",
+                    (title, zlib.compress(raw, 6), len(raw))
+                ).lastrowid
+                connection.execute("INSERT INTO titles (title_key, article_id) VALUES (?, ?)", (key, article_id))
+                connection.execute(
+                    "INSERT INTO article_search (rowid, title, body) VALUES (?, ?, ?)", (article_id, title, text)
+                )
+                counts["articles"] += 1
+
+    def optimize(self):
+        """Merge the full-text index's segments after a bulk load"""
+        with self._lock, self.connection:
+            self.connection.execute("INSERT INTO article_search (article_search) VALUES ('optimize')")
+
+    def _article(self, article_id: int) -> Dict[str, Any]:
+        title, body = self.connection.execute(
+            "SELECT title, body FROM articles WHERE id = ?", (article_id,)
+        ).fetchone()
+        return {"title": title, "text": zlib.decompress(body).decode("utf-8")}
+
+    def _exact(self, query: str) -> Optional[int]:
+        key = self.title_key(query)
+        row = self.connection.execute(
+            "SELECT target FROM redirects WHERE title_key = ?", (key,)
+        ).fetchone()
+        if row:
+            key = self.title_key(row[0])
+        row = self.connection.execute("SELECT article_id FROM titles WHERE title_key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, query: str, k: int = None) -> List[Dict[str, Any]]:
+        """Best matching articles: an exact title (or redirect) first, then full-text matches by BM25"""
+        k = k or self.top_k
+        tokens = FTS_TOKEN_PATTERN.findall(query)
+        with self._lock:
+            ids = []
+            exact = self._exact(query)
+            if exact is not None:
+                ids.append(exact)
+            # Articles with every query token first, then any; quoting keeps FTS syntax in the query literal
+            quoted = [f'"{token}"' for token in tokens]
+            for match in (" AND ".join(quoted), " OR ".join(quoted)) if tokens else ():
+                if len(ids) >= k:
+                    break
+                rows = self.connection.execute(
+                    "SELECT rowid FROM article_search WHERE article_search MATCH ? "
+                    f"ORDER BY bm25(article_search, {TITLE_WEIGHT}, 1.0) LIMIT ?",
+                    (match, k + len(ids))
+                ).fetchall()
+                ids.extend(row[0] for row in rows if row[0] not in ids)
+            return [self._article(article_id) for article_id in ids[:k]]
+
+    def summary(self, text: str) -> str:
+        """Lead section of an article, cut at a sentence end within ``summary_chars``"""
+        lead = text.split("\n\n", 1)[0]
+        if len(lead) < 200:
+            lead = text
+        if len(lead) <= self.summary_chars:
+            return lead
+        cut = lead[:self.summary_chars]
+        end = cut.rfind(". ")
+        return cut[:end + 1] if end > self.summary_chars // 2 else cut
+
+    def run(self, query: str) -> str:
+        """Tool output for a query, formatted like WikipediaAPIWrapper.run"""
+        articles = self.lookup(query)
+        if not articles:
+            return NO_RESULT
+        summaries = [f"Page: {article['title']}\nSummary: {self.summary(article['text'])}" for article in articles]
+        return "\n\n".join(summaries)[:self.max_chars]
+
+    def get_stats(self) -> Dict[str, Any]:
+        if not self.available:
+            return {"path": str(self.path), "available": False}
+        with self._lock:
+            articles, text_bytes = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(text_bytes), 0) FROM articles"
+            ).fetchone()
+            redirects = self.connection.execute("SELECT COUNT(*) FROM redirects").fetchone()[0]
+        return {
+            "path": str(self.path),
+            "available": True,
+            "articles": articles,
+            "redirects": redirects,
+            "text_bytes": text_bytes,
+            "file_bytes": self.path.stat().st_size
+        }
+
+# Global reference index instance
+reference_index = ReferenceIndex()
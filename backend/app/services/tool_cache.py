@@ -0,0 +1,194 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Callable, Awaitable, Tuple
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]
+
+class ToolResultCache:
+    """Results of agent tool calls shared across requests, keyed by tool and normalized input
+
+    Inputs are compared lowercased with whitespace collapsed, together with
+    any parameters. Entries expire after ``ttl_seconds`` and the least
+    recently used entry is evicted once ``max_entries`` is reached.
+    Concurrent calls for the same key are coalesced: the first computes and
+    the others wait for its result, from threads (LangChain tools) or
+    coroutines alike. Failures are not cached, nor are results that
+    ``cache_if`` rejects. A thread that waits longer than its ``timeout`` for
+    another's call stops waiting and computes the result itself.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None, enabled: bool = None):
+        self.max_entries = max_entries or settings.TOOL_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or settings.TOOL_CACHE_TTL_SECONDS
+        self.enabled = settings.TOOL_CACHE_ENABLED if enabled is None else enabled
+
+        # key -> (expires_at, result)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, Future] = {}
+        self._lock = threading.Lock()
+        # tool -> {"hits", "misses", "coalesced"}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+
+    @staticmethod
+    def key(tool: str, tool_input: Any, params: Dict[str, Any] = None) -> CacheKey:
+        normalized = " ".join(str(tool_input).lower().split())
+        params = {name: value for name, value in (params or {}).items() if value is not None}
+        if params:
+            normalized += " " + json.dumps(params, sort_keys=True, default=str)
+        return tool, normalized
+
+    def _count(self, tool: str, outcome: str):
+        """Record a lookup outcome (caller holds the lock)"""
+        stats = self._stats.setdefault(tool, {"hits": 0, "misses": 0, "coalesced": 0, "wait_timeouts": 0})
+        stats[outcome] += 1
+
+    def _claim(self, key: CacheKey) -> Tuple[str, Any]:
+        """("hit", result), ("wait", future of the call in flight) or ("lead", future to settle)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._count(key[0], "hits")
+                return "hit", entry[1]
+            if entry:
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self._count(key[0], "coalesced")
+                return "wait", future
+
+            future = Future()
+            self._inflight[key] = future
+            self._count(key[0], "misses")
+            return "lead", future
+
+    def _settle(
+        self,
+        key: CacheKey,
+        future: Future,
+        result: Any = None,
+        error: BaseException = None,
+        cache_if: Callable[[Any], bool] = None
+    ):
+        """Publish the leader's outcome to waiters and cache it if it succeeded"""
+        with self._lock:
+            self._inflight.pop(key, None)
+            if error is None and (cache_if is None or cache_if(result)):
+                self._entries[key] = (time.time() + self.ttl_seconds, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        if future.done():
+            return
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # A cancelled leader must not cancel the callers waiting on it
+            future.set_exception(RuntimeError(f"{key[0]} call was cancelled"))
+
+    def get_or_compute(
+        self,
+        tool: str,
+        tool_input: Any,
+        compute: Callable[[], Any],
+        cache_if: Callable[[Any], bool] = None,
+        timeout: float = None,
+        **params
+    ) -> Any:
+        """Cached result of a tool call, computing it once for concurrent callers
+
+        A caller waits at most ``timeout`` seconds (default
+        ``AGENT_TOOL_TIMEOUT_SECONDS``) for a call in flight, so a hung call
+        does not hold every caller past its own deadline.
+        """
+        if not self.enabled:
+            return compute()
+
+        key = self.key(tool, tool_input, params)
+        state, value = self._claim(key)
+        if state == "hit":
+            return value
+        if state == "wait":
+            try:
+                return value.result(timeout=timeout or settings.AGENT_TOOL_TIMEOUT_SECONDS)
+            except FutureTimeoutError:
+                with self._lock:
+                    self._count(tool, "wait_timeouts")
+                logger.warning(f"Timed out waiting for a shared {tool} call, running it directly")
+                return compute()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            self._settle(key, value, error=e)
+            raise
+        self._settle(key, value, result, cache_if=cache_if)
+        return result
+
+    async def aget_or_compute(
+        self,
+        tool: str,
+        tool_input: Any,
+        compute: Callable[[], Awaitable[Any]],
+        cache_if: Callable[[Any], bool] = None,
+        **params
+    ) -> Any:
+        """Cached result of an async tool call, computing it once for concurrent callers"""
+        if not self.enabled:
+            return await compute()
+
+        key = self.key(tool, tool_input, params)
+        state, value = self._claim(key)
+        if state == "hit":
+            return value
+        if state == "wait":
+            # Shielded so a waiter's timeout does not cancel the shared call
+            return await asyncio.shield(asyncio.wrap_future(value))
+
+        try:
+            result = await compute()
+        except BaseException as e:
+            self._settle(key, value, error=e)
+            raise
+        self._settle(key, value, result, cache_if=cache_if)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tools = {}
+            for tool, stats in self._stats.items():
+                lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+                tools[tool] = {
+                    **stats,
+                    "hit_rate": (stats["hits"] + stats["coalesced"] - stats["wait_timeouts"]) / lookups if lookups else 0.0
+                }
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "in_flight": len(self._inflight),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+                "tools": tools
+            }
+
+# Global tool result cache instance
+tool_cache = ToolResultCache()
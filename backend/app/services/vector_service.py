@@ -4,7 +4,6 @@ import os
 import json
 import pickle
 from typing import List, Dict, Any, Tuple
-from sentence_transformers import SentenceTransformer
 from app.core.config import settings
 import logging
 
@@ -25,7 +24,8 @@ class VectorService:
             # Create vector DB directory if it doesn't exist
             os.makedirs(self.vector_db_path, exist_ok=True)
             
-            # Load embedding model
+            # Load embedding model (sentence_transformers pulls in torch, so import it here)
+            from sentence_transformers import SentenceTransformer
             self.embedding_model = SentenceTransformer(self.embedding_model_name)
             
             # Load or create FAISS index
@@ -0,0 +1,318 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import logging
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE = "default"
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,100}$")
+
+@dataclass
+class _LoadedStore:
+    # Published snapshot; never mutated once readers can see it
+    vectorstore: FAISS
+    last_access: float
+    size_bytes: int
+    dirty: bool = False
+    generation: int = 0
+
+class VectorStoreRegistry:
+    """Namespaced FAISS vector stores, loaded on first use and spilled to disk
+
+    Each namespace (a user or a matter) has its own index under
+    ``base_path``; the default namespace keeps the original top-level layout.
+    Loaded stores are kept in an LRU bounded by ``ram_budget_mb`` (estimated
+    from vector and chunk text sizes) and are saved and unloaded when evicted
+    or idle for ``idle_seconds``.
+
+    Updates are copy-on-write: a writer clones the current snapshot, applies
+    its change to the private copy and publishes it as a new generation with
+    a single reference swap. Readers take whatever snapshot is current without
+    locking and keep a consistent view for the rest of their request; writers
+    to the same namespace are serialized. A write briefly holds two copies of
+    the namespace in memory.
+
+    Indexes are written to disk outside the registry lock, so a save or spill
+    of one namespace does not stall loads and updates of the others. A
+    spilled namespace stays reachable until its save finishes; a ``get``
+    meanwhile takes it back instead of loading the older copy on disk.
+    """
+
+    def __init__(
+        self,
+        embeddings_provider: Callable[[], Any] = None,
+        base_path: str = None,
+        ram_budget_mb: int = None,
+        idle_seconds: int = None
+    ):
+        # Called only when an index has to be loaded, so the embedding model stays lazy
+        self.embeddings_provider = embeddings_provider or (lambda: None)
+        self.base_path = Path(base_path or settings.VECTORSTORE_PATH)
+        self.ram_budget_bytes = (ram_budget_mb or settings.VECTORSTORE_RAM_BUDGET_MB) * 1024 * 1024
+        self.idle_seconds = idle_seconds or settings.VECTORSTORE_IDLE_SECONDS
+
+        self._stores: "OrderedDict[str, _LoadedStore]" = OrderedDict()
+        # Per-namespace corpus versions survive spills so cached answers stay scoped
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._writer_locks: Dict[str, threading.Lock] = {}
+        # Unloaded namespaces whose save is still being written
+        self._spilling: Dict[str, _LoadedStore] = {}
+        self._save_locks: Dict[str, threading.Lock] = {}
+
+        self.loads = 0
+        self.spills = 0
+
+    @staticmethod
+    def validate_namespace(namespace: str) -> str:
+        if not NAMESPACE_PATTERN.match(namespace or ""):
+            raise ValueError(f"Invalid vectorstore namespace: {namespace!r}")
+        return namespace
+
+    def path_for(self, namespace: str) -> Path:
+        """On-disk location of a namespace's index"""
+        if namespace == DEFAULT_NAMESPACE:
+            return self.base_path
+        return self.base_path / "namespaces" / self.validate_namespace(namespace)
+
+    @staticmethod
+    def _estimate_size(vectorstore: FAISS) -> int:
+        """Approximate resident size: float32 vectors plus docstore text"""
+        index = vectorstore.index
+        size = index.ntotal * index.d * 4
+        for doc in getattr(vectorstore.docstore, "_dict", {}).values():
+            size += len(getattr(doc, "page_content", ""))
+        return size
+
+    @staticmethod
+    def _clone(vectorstore: FAISS) -> FAISS:
+        """Private copy of a snapshot that a writer may mutate"""
+        docstore = vectorstore.docstore
+        return FAISS(
+            embedding_function=vectorstore.embedding_function,
+            index=faiss.clone_index(vectorstore.index),
+            docstore=docstore.copy() if hasattr(docstore, "copy") else InMemoryDocstore(dict(docstore._dict)),
+            index_to_docstore_id=dict(vectorstore.index_to_docstore_id),
+            relevance_score_fn=vectorstore.override_relevance_score_fn,
+            normalize_L2=vectorstore._normalize_L2,
+            distance_strategy=vectorstore.distance_strategy
+        )
+
+    def get(self, namespace: str = DEFAULT_NAMESPACE) -> Optional[FAISS]:
+        """Get the current snapshot of a namespace's vector store, loading it on first use"""
+        # Lock-free fast path: published snapshots are immutable
+        entry = self._stores.get(namespace)
+        if entry:
+            entry.last_access = time.monotonic()
+            return entry.vectorstore
+
+        with self._lock:
+            entry = self._stores.get(namespace)
+            if entry:
+                return entry.vectorstore
+
+            # Still being written out: the snapshot in memory is newer than the files
+            entry = self._spilling.pop(namespace, None)
+            if entry:
+                entry.last_access = time.monotonic()
+                self._stores[namespace] = entry
+            else:
+                path = self.path_for(namespace)
+                if not (path / "index.faiss").exists():
+                    return None
+
+                embeddings = self.embeddings_provider()
+                if embeddings is None:
+                    return None
+
+                vectorstore = FAISS.load_local(str(path), embeddings, allow_dangerous_deserialization=True)
+                # Docstores that keep text outside the index re-attach to the copy saved alongside it
+                if hasattr(vectorstore.docstore, "bind"):
+                    vectorstore.docstore.bind(path)
+                self.loads += 1
+                logger.info(f"Loaded vectorstore namespace {namespace} from {path}")
+
+                entry = _LoadedStore(vectorstore, time.monotonic(), self._estimate_size(vectorstore))
+                self._stores[namespace] = entry
+            spilled = self._enforce_budget(keep=namespace)
+
+        self._finish_spills(spilled)
+        return entry.vectorstore
+
+    def set(self, namespace: str, vectorstore: FAISS, dirty: bool = True):
+        """Publish a vector store as the namespace's next generation"""
+        self.validate_namespace(namespace)
+        with self._lock:
+            previous = self._stores.get(namespace)
+            self._stores[namespace] = _LoadedStore(
+                vectorstore,
+                time.monotonic(),
+                self._estimate_size(vectorstore),
+                dirty,
+                previous.generation + 1 if previous else 0
+            )
+            self._stores.move_to_end(namespace)
+            self._spilling.pop(namespace, None)
+            spilled = self._enforce_budget(keep=namespace)
+        self._finish_spills(spilled)
+
+    def _writer_lock(self, namespace: str) -> threading.Lock:
+        with self._lock:
+            return self._writer_locks.setdefault(namespace, threading.Lock())
+
+    def update(self, namespace: str, mutate: Callable[[Optional[FAISS]], FAISS]) -> FAISS:
+        """Copy-on-write update of a namespace
+
+        ``mutate`` receives a private copy of the current snapshot (or None if
+        the namespace is empty) and returns the store to publish.
+        """
+        self.validate_namespace(namespace)
+        with self._writer_lock(namespace):
+            current = self.get(namespace)
+            updated = mutate(self._clone(current) if current is not None else None)
+            self.set(namespace, updated)
+            return updated
+
+    def generation(self, namespace: str = DEFAULT_NAMESPACE) -> Optional[int]:
+        entry = self._stores.get(namespace)
+        return entry.generation if entry else None
+
+    def _save_lock(self, namespace: str) -> threading.Lock:
+        with self._lock:
+            return self._save_locks.setdefault(namespace, threading.Lock())
+
+    def _is_current(self, namespace: str, entry: _LoadedStore) -> bool:
+        with self._lock:
+            return self._stores.get(namespace) is entry or self._spilling.get(namespace) is entry
+
+    def _write(self, namespace: str, entry: _LoadedStore, path: str = None):
+        """Write a snapshot to disk without holding the registry lock
+
+        Writes of one namespace are serialized, and a snapshot superseded by
+        a newer generation is not written over the namespace's files.
+        """
+        with self._save_lock(namespace):
+            if path is None and not self._is_current(namespace, entry):
+                return
+            target = Path(path) if path else self.path_for(namespace)
+            target.mkdir(parents=True, exist_ok=True)
+            entry.vectorstore.save_local(str(target))
+            entry.dirty = False
+
+    def save(self, namespace: str = DEFAULT_NAMESPACE, path: str = None):
+        """Persist a loaded namespace to disk"""
+        with self._lock:
+            entry = self._stores.get(namespace) or self._spilling.get(namespace)
+        if entry:
+            self._write(namespace, entry, path)
+
+    def _detach(self, namespace: str) -> Optional[Tuple[str, _LoadedStore]]:
+        """Unload a namespace, keeping it reachable until it is saved (caller holds the lock)"""
+        entry = self._stores.pop(namespace, None)
+        if not entry:
+            return None
+        self._spilling[namespace] = entry
+        self.spills += 1
+        return namespace, entry
+
+    def _finish_spills(self, spilled: List[Tuple[str, _LoadedStore]]):
+        """Save detached namespaces if modified and release them (caller does not hold the lock)"""
+        for namespace, entry in spilled:
+            try:
+                if entry.dirty:
+                    self._write(namespace, entry)
+            except Exception as e:
+                logger.error(f"Could not save vectorstore namespace {namespace}, keeping it loaded: {e}")
+                with self._lock:
+                    if self._spilling.get(namespace) is entry:
+                        self._stores[namespace] = self._spilling.pop(namespace)
+                continue
+            with self._lock:
+                if self._spilling.get(namespace) is entry:
+                    del self._spilling[namespace]
+            logger.info(f"Spilled vectorstore namespace {namespace} to disk")
+
+    def spill(self, namespace: str):
+        """Save a namespace if modified and unload it from memory"""
+        with self._lock:
+            detached = self._detach(namespace)
+        if detached:
+            self._finish_spills([detached])
+
+    def discard(self, namespace: str):
+        """Unload a namespace without saving it (another process wrote a newer copy to disk)"""
+        with self._lock:
+            self._stores.pop(namespace, None)
+            self._spilling.pop(namespace, None)
+
+    def spill_idle(self):
+        """Unload namespaces that have not been used for ``idle_seconds``"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                namespace for namespace, entry in self._stores.items()
+                if now - entry.last_access > self.idle_seconds
+            ]
+            spilled = [self._detach(namespace) for namespace in idle]
+        self._finish_spills(spilled)
+
+    def _enforce_budget(self, keep: str = None) -> List[Tuple[str, _LoadedStore]]:
+        """Detach least recently used namespaces until within the RAM budget (caller holds the lock)
+
+        Returns the detached namespaces; the caller saves them with
+        ``_finish_spills`` once it has released the lock.
+        """
+        spilled = []
+        by_last_access = sorted(self._stores.items(), key=lambda item: item[1].last_access)
+        for namespace, _ in by_last_access:
+            if self.total_bytes() <= self.ram_budget_bytes:
+                break
+            if namespace != keep:
+                spilled.append(self._detach(namespace))
+        return spilled
+
+    def total_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._stores.values())
+
+    def version(self, namespace: str = DEFAULT_NAMESPACE) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace: str = DEFAULT_NAMESPACE) -> int:
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            return self._versions[namespace]
+
+    def loaded_namespaces(self) -> List[str]:
+        return list(self._stores.keys())
+
+    def flush(self):
+        """Save every modified namespace (e.g. at shutdown)"""
+        with self._lock:
+            dirty = [
+                (namespace, entry) for namespace, entry in list(self._stores.items()) + list(self._spilling.items())
+                if entry.dirty
+            ]
+        for namespace, entry in dirty:
+            self._write(namespace, entry)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get registry statistics"""
+        with self._lock:
+            return {
+                "loaded_namespaces": self.loaded_namespaces(),
+                "generations": {namespace: entry.generation for namespace, entry in self._stores.items()},
+                "resident_bytes": self.total_bytes(),
+                "ram_budget_bytes": self.ram_budget_bytes,
+                "idle_seconds": self.idle_seconds,
+                "loads": self.loads,
+                "spills": self.spills
+            }
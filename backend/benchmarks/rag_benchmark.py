@@ -0,0 +1,263 @@
+"""End-to-end RAG benchmark
+
+For each corpus size this generates a synthetic legal corpus, ingests it
+through ``LegalRAGPipeline`` and measures:
+
+- ``add_documents_from_files`` throughput (files, chunks and MB per second)
+- embedding rate and index build/insert time inside ``add_documents``
+- ``similarity_search`` latency percentiles
+- ``/api/documents/query`` latency percentiles and throughput, served by the
+  documents router in-process against the local fake LLM provider
+
+Results are written as JSON (with the git commit) so runs can be compared
+across commits:
+
+    python -m benchmarks.rag_benchmark --sizes 1k,100k --output bench.json
+    python -m benchmarks.rag_benchmark --sizes 1k --embeddings fake --llm-latency-ms 0 --llm-tokens-per-second 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Callable
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    return SIZES[value] if value in SIZES else int(value)
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of latencies in seconds, reported in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "max_ms": ordered[-1] * 1000
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+class PhaseTimer:
+    """Accumulates wall time spent in wrapped pipeline methods"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    def wrap(self, name: str, function: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - started
+        return timed
+
+def build_pipeline(args, workdir: str):
+    from app.services.llm_provider import FakeProvider, LatencyModel
+    from app.services.rag_pipeline import LegalRAGPipeline
+    from app.services.vectorstore_registry import VectorStoreRegistry
+
+    latency = LatencyModel(
+        distribution=args.llm_latency_distribution,
+        mean_ms=args.llm_latency_ms,
+        jitter_ms=args.llm_latency_jitter_ms,
+        tokens_per_second=args.llm_tokens_per_second
+    )
+    pipeline = LegalRAGPipeline(llm_provider=FakeProvider(latency))
+    if args.embeddings == "fake":
+        from langchain_community.embeddings import DeterministicFakeEmbedding
+        pipeline.embeddings = DeterministicFakeEmbedding(size=args.embedding_dim)
+    pipeline.stores = VectorStoreRegistry(
+        embeddings_provider=lambda: pipeline.embeddings,
+        base_path=os.path.join(workdir, "vectorstore"),
+        ram_budget_mb=1024 * 1024
+    )
+    if pipeline.text_cache:
+        from app.services.content_store import ExtractedTextCache
+        pipeline.text_cache = ExtractedTextCache(os.path.join(workdir, "extracted_text.sqlite"))
+    if not args.answer_cache:
+        pipeline.answer_cache = None
+    # Build the chains now so their one-off setup is not charged to the first batch
+    pipeline._ensure_chains()
+    return pipeline
+
+def ingest(pipeline, file_paths: List[str], batch_files: int) -> Dict[str, Any]:
+    """Ingest files in batches the way the upload background task does"""
+    timer = PhaseTimer()
+    pipeline.text_splitter.split_documents = timer.wrap("split", pipeline.text_splitter.split_documents)
+    pipeline._embed_chunks = timer.wrap("embed", pipeline._embed_chunks)
+
+    load_seconds = add_seconds = 0.0
+    total_bytes = sum(os.path.getsize(path) for path in file_paths)
+
+    for start in range(0, len(file_paths), batch_files):
+        batch = file_paths[start:start + batch_files]
+
+        started = time.perf_counter()
+        documents = pipeline.add_documents_from_files(batch)
+        load_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        pipeline.add_documents(documents)
+        add_seconds += time.perf_counter() - started
+
+    del pipeline.text_splitter.split_documents
+    del pipeline._embed_chunks
+
+    chunks = pipeline.vectorstore.index.ntotal
+    embed_seconds = timer.seconds.get("embed", 0.0)
+    split_seconds = timer.seconds.get("split", 0.0)
+    index_seconds = add_seconds - embed_seconds - split_seconds
+    total_seconds = load_seconds + add_seconds
+
+    return {
+        "files": len(file_paths),
+        "chunks": chunks,
+        "bytes": total_bytes,
+        "load_seconds": load_seconds,
+        "split_seconds": split_seconds,
+        "embed_seconds": embed_seconds,
+        "index_build_seconds": index_seconds,
+        "total_seconds": total_seconds,
+        "load_files_per_second": len(file_paths) / load_seconds if load_seconds else None,
+        "load_mb_per_second": total_bytes / 1e6 / load_seconds if load_seconds else None,
+        "embedding_chunks_per_second": chunks / embed_seconds if embed_seconds else None,
+        "ingest_chunks_per_second": chunks / total_seconds if total_seconds else None
+    }
+
+def bench_similarity_search(pipeline, queries: List[str], k: int) -> Dict[str, Any]:
+    # One untimed query so lazy initialization is not counted
+    pipeline.similarity_search(queries[0], k=k)
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        pipeline.similarity_search(query, k=k)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+async def bench_query_endpoint(pipeline, queries: List[str], concurrency: int) -> Dict[str, Any]:
+    """Drive /api/documents/query in-process over ASGI with bounded concurrency"""
+    import httpx
+    from fastapi import FastAPI
+    from app.routers import documents
+
+    documents.rag_pipeline = pipeline
+    app = FastAPI()
+    app.include_router(documents.router, prefix="/api/documents")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        async def one(query: str):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/documents/query", json={"query": query})
+                elapsed = time.perf_counter() - started
+            if response.status_code != 200 or response.json().get("error"):
+                errors += 1
+            else:
+                samples.append(elapsed)
+
+        await one(queries[0])
+        samples.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(query) for query in queries))
+        wall = time.perf_counter() - started
+
+    return {
+        **percentiles(samples),
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_second": len(queries) / wall if wall else None
+    }
+
+def run_size(args, chunks: int) -> Dict[str, Any]:
+    from benchmarks.synthetic_corpus import SyntheticLegalCorpus
+
+    corpus = SyntheticLegalCorpus(chunks, seed=args.seed)
+    with tempfile.TemporaryDirectory(prefix="rag_bench_") as workdir:
+        started = time.perf_counter()
+        file_paths = corpus.write(os.path.join(workdir, "corpus"))
+        generate_seconds = time.perf_counter() - started
+        print(f"[{chunks} chunks] generated {len(file_paths)} files in {generate_seconds:.1f}s", file=sys.stderr)
+
+        pipeline = build_pipeline(args, workdir)
+        ingestion = ingest(pipeline, file_paths, args.batch_files)
+        print(f"[{chunks} chunks] ingested in {ingestion['total_seconds']:.1f}s", file=sys.stderr)
+
+        queries = corpus.queries(args.queries)
+        search = bench_similarity_search(pipeline, queries, args.k)
+        endpoint = asyncio.run(bench_query_endpoint(pipeline, queries, args.concurrency))
+        print(f"[{chunks} chunks] search p95 {search['p95_ms']:.1f}ms, query p95 {endpoint.get('p95_ms', 0):.1f}ms", file=sys.stderr)
+
+    return {
+        "target_chunks": chunks,
+        "generate_seconds": generate_seconds,
+        "ingestion": ingestion,
+        "similarity_search": search,
+        "query_endpoint": endpoint
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end RAG ingestion and query benchmark")
+    parser.add_argument("--sizes", default="1k", help="Comma separated corpus sizes in chunks: 1k, 100k, 1m or a number")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per latency measurement")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent /query requests")
+    parser.add_argument("--k", type=int, default=5, help="Documents retrieved per search")
+    parser.add_argument("--batch-files", type=int, default=50, help="Files per add_documents call")
+    parser.add_argument("--embeddings", choices=["model", "fake"], default="model",
+                        help="model: the configured sentence-transformers model; fake: hashed random vectors")
+    parser.add_argument("--embedding-dim", type=int, default=384, help="Vector size for --embeddings fake")
+    parser.add_argument("--llm-latency-distribution", default="lognormal")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--llm-latency-jitter-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--answer-cache", action="store_true", help="Keep the semantic answer cache enabled")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "runs": [run_size(args, parse_size(size)) for size in args.sizes.split(",")]
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Deterministic synthetic legal corpus for benchmarks
+
+Documents look like opinions and statutes: numbered sections of roughly
+``section_chars`` characters with case names, reporter citations and U.S.C.
+references. Sections are separated by blank lines and sized so that the
+pipeline's splitter (chunk_size=1000) yields about one chunk per section, so
+``chunks`` is a good estimate of the resulting index size.
+"""
+import random
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+PARTIES = [
+    "Smith", "Jones", "Garcia", "Nguyen", "Patel", "Okafor", "Brown", "Miller", "Davis", "Wilson",
+    "Acme Corp.", "United States", "State", "Board of Education", "City of Springfield", "Johnson"
+]
+SUBJECTS = [
+    "contract formation", "consideration", "promissory estoppel", "negligence", "duty of care",
+    "proximate cause", "due process", "equal protection", "search and seizure", "the exclusionary rule",
+    "adverse possession", "easements", "fiduciary duty", "the business judgment rule", "personal jurisdiction",
+    "summary judgment", "hearsay", "qualified immunity", "copyright infringement", "trade secrets"
+]
+HOLDINGS = [
+    "the court held that {subject} requires a showing of {element}",
+    "the plaintiff failed to establish {element} and the claim for {subject} was dismissed",
+    "under {case}, {subject} turns on whether {element} was present",
+    "the defendant argued that {subject} did not apply absent {element}",
+    "the appellate court reversed, finding that {element} was sufficient to support {subject}",
+    "the statute codifies {subject} and conditions relief on {element}"
+]
+ELEMENTS = [
+    "actual reliance", "a bargained-for exchange", "reasonable foreseeability", "a protected interest",
+    "probable cause", "open and notorious use", "good faith", "minimum contacts", "a genuine dispute of material fact",
+    "clearly established law", "substantial similarity", "reasonable secrecy measures"
+]
+COURTS = ["U.S.", "F.3d", "F. Supp. 3d", "S. Ct.", "Cal. App. 4th", "N.E.2d"]
+
+class SyntheticLegalCorpus:
+    """Seeded generator of legal-looking text files"""
+
+    def __init__(self, chunks: int, sections_per_file: int = 100, section_chars: int = 800, seed: int = 1234):
+        self.chunks = chunks
+        self.sections_per_file = sections_per_file
+        self.section_chars = section_chars
+        self.seed = seed
+
+    def _case(self, rng: random.Random) -> str:
+        plaintiff, defendant = rng.sample(PARTIES, 2)
+        return f"{plaintiff} v. {defendant}, {rng.randint(1, 999)} {rng.choice(COURTS)} {rng.randint(1, 1500)} ({rng.randint(1950, 2024)})"
+
+    def _sentence(self, rng: random.Random) -> str:
+        holding = rng.choice(HOLDINGS).format(
+            subject=rng.choice(SUBJECTS),
+            element=rng.choice(ELEMENTS),
+            case=self._case(rng)
+        )
+        if rng.random() < 0.3:
+            holding += f"; see also {rng.randint(1, 50)} U.S.C. § {rng.randint(1, 9999)}"
+        return holding[0].upper() + holding[1:] + "."
+
+    def section(self, rng: random.Random, number: int) -> str:
+        """One numbered section of about ``section_chars`` characters"""
+        parts = [f"Section {number}. {rng.choice(SUBJECTS).title()}."]
+        length = len(parts[0])
+        while length < self.section_chars:
+            sentence = self._sentence(rng)
+            parts.append(sentence)
+            length += len(sentence) + 1
+        return " ".join(parts)
+
+    def documents(self) -> Iterator[Tuple[str, str]]:
+        """Yield (file name, text) pairs until ``chunks`` sections have been produced"""
+        rng = random.Random(self.seed)
+        remaining = self.chunks
+        index = 0
+        while remaining > 0:
+            count = min(self.sections_per_file, remaining)
+            title = f"{self._case(rng)}\n\n"
+            text = title + "\n\n".join(self.section(rng, number + 1) for number in range(count))
+            yield f"doc_{index:06d}.txt", text
+            remaining -= count
+            index += 1
+
+    def write(self, directory: str) -> List[str]:
+        """Write the corpus as .txt files and return their paths"""
+        target = Path(directory)
+        target.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for name, text in self.documents():
+            path = target / name
+            path.write_text(text, encoding="utf-8")
+            paths.append(str(path))
+        return paths
+
+    def queries(self, count: int) -> List[str]:
+        """Questions drawn from the corpus vocabulary"""
+        rng = random.Random(self.seed + 1)
+        templates = [
+            "What is required to establish {subject}?",
+            "Does {subject} require {element}?",
+            "How have courts treated {element} in {subject} cases?",
+            "What did {case} hold about {subject}?"
+        ]
+        return [
+            rng.choice(templates).format(
+                subject=rng.choice(SUBJECTS),
+                element=rng.choice(ELEMENTS),
+                case=self._case(rng).split(",")[0]
+            )
+            for _ in range(count)
+        ]
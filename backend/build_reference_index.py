@@ -0,0 +1,52 @@
+"""Build the offline reference index used by the agent's wikipedia tool
+
+Reads a MediaWiki XML export (e.g. enwiki-latest-pages-articles.xml.bz2) or
+JSON lines with ``title`` and ``text`` fields (e.g. a legal encyclopedia),
+optionally bz2 or gzip compressed, and appends its articles to the index at
+``REFERENCE_INDEX_PATH``. Once the index exists the tool answers from it
+instead of live Wikipedia.
+
+    python build_reference_index.py enwiki-latest-pages-articles.xml.bz2
+    python build_reference_index.py legal_encyclopedia.jsonl.gz --output ./reference_index.sqlite
+"""
+import argparse
+import json
+import logging
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.core.config import settings
+from app.services.reference_index import ReferenceIndex, iter_jsonl_dump, iter_mediawiki_dump
+
+logger = logging.getLogger(__name__)
+
+def build(dumps, output=None, dump_format="auto"):
+    index = ReferenceIndex(output)
+    results = []
+    for dump in dumps:
+        is_jsonl = dump_format == "jsonl" or (dump_format == "auto" and ".jsonl" in dump)
+        records = iter_jsonl_dump(dump) if is_jsonl else iter_mediawiki_dump(dump)
+
+        started = time.perf_counter()
+        counts = index.add_articles(records)
+        counts.update(dump=dump, seconds=round(time.perf_counter() - started, 3))
+        logger.info(f"Indexed {dump}: {counts}")
+        results.append(counts)
+
+    index.optimize()
+    return {"dumps": results, "index": index.get_stats()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline reference index from encyclopedia dumps")
+    parser.add_argument("dumps", nargs="+", help="MediaWiki XML or JSON lines dump (.bz2/.gz allowed)")
+    parser.add_argument("--output", default=None, help=f"Index file (default {settings.REFERENCE_INDEX_PATH})")
+    parser.add_argument("--format", choices=["auto", "mediawiki", "jsonl"], default="auto")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    print(json.dumps(build(args.dumps, args.output, args.format), indent=2))
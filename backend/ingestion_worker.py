@@ -0,0 +1,42 @@
+"""Run document ingestion workers in their own process
+
+Used with ``INGESTION_MODE=external``: the API only records jobs in the
+ingestion job database and this process claims and runs them, so parsing and
+embedding never compete with request handling. The API reloads a namespace
+after one of its jobs succeeds.
+
+    python ingestion_worker.py --workers 4
+"""
+import argparse
+import asyncio
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.core.config import settings
+from app.services.ingestion_queue import ingestion_queue
+
+logger = logging.getLogger(__name__)
+
+async def run_workers(workers: int):
+    """Run the worker pool until interrupted"""
+    ingestion_queue.start(workers)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await ingestion_queue.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued document ingestion jobs")
+    parser.add_argument("--workers", type=int, default=settings.INGESTION_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    try:
+        asyncio.run(run_workers(args.workers))
+    except KeyboardInterrupt:
+        logger.info("Ingestion worker stopped")
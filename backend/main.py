@@ -5,6 +5,8 @@ from fastapi.responses import JSONResponse
 import os
 from dotenv import load_dotenv
 import logging
+import asyncio
+import time
 from contextlib import asynccontextmanager
 
 # Load environment variables
@@ -18,6 +20,7 @@ from app.core.database import init_db, close_db
 from app.services.vector_service import vector_service
 from app.services.gemini_service import GeminiService
 from app.services.rag_pipeline import rag_pipeline
+from app.services.ingestion_queue import ingestion_queue
 
 # Initialize services
 gemini_service = GeminiService()
@@ -37,6 +40,50 @@ logger = logging.getLogger(__name__)
 # Global services are imported as instances
 # vector_service and gemini_service are already initialized
 
+async def spill_idle_vectorstores():
+    """Periodically unload vectorstore namespaces that have gone idle"""
+    interval = max(settings.VECTORSTORE_IDLE_SECONDS // 4, 30)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            rag_pipeline.stores.spill_idle()
+        except Exception as e:
+            logger.error(f"Error spilling idle vectorstores: {e}")
+
+async def compact_vectorstores():
+    """Periodically drop deleted chunks' vectors from namespaces with enough of them"""
+    while True:
+        await asyncio.sleep(settings.VECTORSTORE_COMPACTION_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(rag_pipeline.compact_pending)
+        except Exception as e:
+            logger.error(f"Error compacting vectorstores: {e}")
+
+async def sync_external_ingestion():
+    """Reload namespaces that another process (ingestion worker or index rebuild) has updated on disk"""
+    last_seen = time.time()
+    while True:
+        await asyncio.sleep(settings.INGESTION_POLL_SECONDS)
+        try:
+            jobs = await asyncio.to_thread(ingestion_queue.store.completed_since, last_seen)
+            for job in jobs:
+                last_seen = max(last_seen, job["updated_at"])
+                # Ingestion jobs run in this process already updated its in-memory index
+                if job["kind"] == "ingest" and settings.INGESTION_MODE != "external":
+                    continue
+                await asyncio.to_thread(rag_pipeline.reload_namespace, job["namespace"])
+                logger.info(f"Reloading namespace {job['namespace']} after {job['kind']} job {job['id']}")
+        except Exception as e:
+            logger.error(f"Error syncing external ingestion: {e}")
+
+async def warm_up_rag_pipeline():
+    """Load the RAG pipeline's heavy components off the event loop"""
+    try:
+        await asyncio.to_thread(rag_pipeline.warm_up)
+    except Exception as e:
+        logger.warning(f"Could not warm up RAG pipeline: {e}")
+        logger.info("RAG pipeline will be initialized on first use")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
@@ -51,17 +98,20 @@ async def lifespan(app: FastAPI):
         # Initialize vector database
         await vector_service.initialize()
         
-        # Initialize RAG pipeline
-        if settings.GOOGLE_API_KEY:
-            # Try to load existing vectorstore
-            try:
-                rag_pipeline.load_vectorstore(settings.VECTORSTORE_PATH)
-                logger.info("Loaded existing RAG vectorstore")
-            except Exception as e:
-                logger.warning(f"Could not load existing vectorstore: {e}")
-                logger.info("RAG pipeline will be initialized when documents are uploaded")
-        else:
+        # Warm up the RAG pipeline (embedding model, default index, chains) in
+        # the background so startup is not blocked; /ready reports when done
+        if not settings.GOOGLE_API_KEY:
             logger.warning("GOOGLE_API_KEY not set, RAG pipeline will have limited functionality")
+        warmup_task = asyncio.create_task(warm_up_rag_pipeline())
+        
+        spill_task = asyncio.create_task(spill_idle_vectorstores())
+        compaction_task = asyncio.create_task(compact_vectorstores())
+        
+        # Ingestion jobs run in this process, or in ingestion_worker.py; either way
+        # namespaces rebuilt or ingested by other processes are reloaded
+        sync_task = asyncio.create_task(sync_external_ingestion())
+        if settings.INGESTION_MODE != "external":
+            ingestion_queue.start()
         
         logger.info("Services initialized successfully")
         
@@ -74,6 +124,12 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down Legal Research API...")
     
+    warmup_task.cancel()
+    spill_task.cancel()
+    compaction_task.cancel()
+    sync_task.cancel()
+    await ingestion_queue.stop()
+    rag_pipeline.stores.flush()
     await vector_service.close()
     await close_db()
 
@@ -118,6 +174,16 @@ async def health_check():
         "environment": settings.ENVIRONMENT
     }
 
+# Readiness endpoint
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 503 until the embedding model and default index are warm"""
+    readiness = rag_pipeline.get_readiness()
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content=readiness
+    )
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -126,7 +192,8 @@ async def root():
         "message": "Legal Research Assistant API",
         "version": "1.0.0",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "ready": "/ready"
     }
 
 # Include routers
@@ -0,0 +1,72 @@
+"""Profile backend startup cost
+
+Runs ``python -X importtime`` on a module in a fresh interpreter, aggregates
+import time per top-level package and prints the most expensive
+ones. With ``--warm-up`` it also times RAG pipeline warm-up (embedding model,
+default index and chains).
+
+    python profile_startup.py                # import cost of main
+    python profile_startup.py --module app.services.rag_pipeline --top 15
+    python profile_startup.py --warm-up
+"""
+import argparse
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+def profile_imports(module: str) -> Tuple[List[Tuple[str, int]], int]:
+    """Return (package, microseconds) pairs and total wall time of importing ``module``"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    wall_us = int((time.perf_counter() - started) * 1_000_000)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    # Lines look like "import time:   self [us] | cumulative | imported package".
+    # Self time is attributed to the module's top-level package, so time spent
+    # importing e.g. torch on behalf of langchain is charged to torch
+    per_package: Dict[str, int] = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        per_package[name.strip().split(".")[0]] += int(self_us)
+
+    ranked = sorted(per_package.items(), key=lambda item: item[1], reverse=True)
+    return ranked, wall_us
+
+def profile_warm_up() -> float:
+    """Time RAG pipeline warm-up in this process"""
+    from app.services.rag_pipeline import rag_pipeline
+
+    started = time.perf_counter()
+    rag_pipeline.warm_up()
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile backend import and warm-up cost")
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=25, help="Number of packages to show")
+    parser.add_argument("--warm-up", action="store_true", help="Also time RAG pipeline warm-up")
+    args = parser.parse_args()
+
+    ranked, wall_us = profile_imports(args.module)
+    total_us = sum(cost for _, cost in ranked)
+
+    print(f"Import cost of {args.module}: {total_us / 1000:.0f} ms ({wall_us / 1000:.0f} ms wall incl. interpreter)")
+    print(f"{'package':<40}{'ms':>15}{'share':>8}")
+    for package, cost in ranked[:args.top]:
+        share = cost / total_us if total_us else 0.0
+        print(f"{package:<40}{cost / 1000:>15.1f}{share:>8.1%}")
+
+    if args.warm_up:
+        print(f"RAG pipeline warm-up: {profile_warm_up():.2f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Rebuild RAG namespace indexes from the content store
+
+Each namespace is rebuilt from the uploaded content it holds. Extracted text
+is read from the extracted-text cache, so only files whose parser version
+changed (or whose type is passed to ``--reparse``) are parsed again, and
+vectors are reused unless the chunking or embedding configuration changed.
+Each rebuilt namespace is recorded in the ingestion job store, so a running
+API reloads it from disk.
+
+    python rebuild_rag_index.py                       # every namespace
+    python rebuild_rag_index.py --namespace user_7
+    python rebuild_rag_index.py --reparse .pdf        # after upgrading the PDF parser
+"""
+import argparse
+import json
+import logging
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.core.config import settings
+from app.services.content_store import content_store
+from app.services.ingestion_queue import ingestion_queue
+from app.services.rag_pipeline import rag_pipeline
+
+logger = logging.getLogger(__name__)
+
+def rebuild(namespaces, reparse):
+    for file_type in reparse:
+        if rag_pipeline.text_cache:
+            dropped = rag_pipeline.text_cache.invalidate(file_type)
+            logger.info(f"Dropped {dropped} cached extractions for {file_type} files")
+
+    results = []
+    for namespace in namespaces or rag_pipeline.content_index.namespaces():
+        file_paths = []
+        for content_sha256 in rag_pipeline.content_index.contents(namespace):
+            path = content_store.find(content_sha256)
+            if path:
+                file_paths.append(str(path))
+            else:
+                logger.warning(f"Content {content_sha256} of namespace {namespace} is missing from the content store")
+
+        started = time.perf_counter()
+        result = rag_pipeline.rebuild_namespace(file_paths, namespace)
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(f"Rebuilt namespace {namespace}: {result}")
+        ingestion_queue.store.record(namespace, "rebuild", result)
+        results.append(result)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild RAG indexes from stored uploads")
+    parser.add_argument("--namespace", action="append", default=[], help="Namespace to rebuild (repeatable; default all)")
+    parser.add_argument("--reparse", action="append", default=[], help="File type to parse again, e.g. .pdf (repeatable)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    results = rebuild(args.namespace, args.reparse)
+    print(json.dumps({"namespaces": results, "extracted_text_cache": rag_pipeline.text_cache.get_stats() if rag_pipeline.text_cache else None}, indent=2))
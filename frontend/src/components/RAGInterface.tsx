@@ -67,6 +67,7 @@ const RAGInterface: React.FC = () => {
   const [settingsOpen, setSettingsOpen] = useState(false);
   const [workflowTemplates, setWorkflowTemplates] = useState<any[]>([]);
   const [selectedTemplate, setSelectedTemplate] = useState<string>('');
+  const [sessionId, setSessionId] = useState<string | undefined>();
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   const scrollToBottom = () => {
@@ -112,8 +113,12 @@ const RAGInterface: React.FC = () => {
         query: ragQuery,
         use_conversation: useConversation,
         use_agent: useAgent,
+        session_id: sessionId,
       });
 
+      if (response.session_id) {
+        setSessionId(response.session_id);
+      }
       setRagResponse(response);
       addToRagHistory(response);
       setRagQuery('');
@@ -65,6 +65,7 @@ export interface RAGQueryParams {
   query: string;
   use_conversation?: boolean;
   use_agent?: boolean;
+  session_id?: string;
 }
 
 export interface AgentToolParams {
@@ -336,9 +337,11 @@ class LegalApiService {
     }
   }
 
-  async clearRAGMemory(): Promise<any> {
+  async clearRAGMemory(sessionId: string): Promise<any> {
     try {
-      const response = await api.post('/api/documents/clear-memory');
+      const response = await api.post('/api/documents/clear-memory', null, {
+        params: { session_id: sessionId },
+      });
       return response.data;
     } catch (error) {
       console.error('Error clearing RAG memory:', error);